@@ -5,6 +5,7 @@
 #
 """Debug command actions"""
 import contextlib
+import json
 import os
 import platform
 import sys
@@ -17,6 +18,7 @@ import weeutil.config
 import weeutil.printer
 import weewx
 import weewx.manager
+import weewx.profiler
 import weewx.units
 import weewx.xtypes
 from weeutil.weeutil import timestamp_to_string, TimeSpan, bcolors
@@ -61,6 +63,8 @@ def debug(config_dict, output=None):
         generate_extension_info(config_dict['config_path'], config_dict, fd)
         # info about the archive database
         generate_archive_info(config_dict, fd)
+        # dispatch statistics from the running engine, if it has saved any
+        generate_profile_info(config_dict, fd)
         # generate our obfuscated weewx.conf
         generate_debug_conf(config_dict['config_path'], config_dict, fd)
 
@@ -180,6 +184,35 @@ def generate_archive_info(config_dict, fd):
         for k in database_dict:
             print(f"{k:>18s} {database_dict[k]:<20s}", file=fd)
 
+
+def generate_profile_info(config_dict, fd):
+    """Generate the service dispatch statistics saved by weewxd
+
+    Args:
+        config_dict (dict): Configuration dictionary.
+        fd (typing.TextIO): An open file-like object.
+    """
+
+    profile_path = os.path.join(config_dict.get('WEEWX_ROOT', ''),
+                                config_dict.get('profile_file', 'archive/dispatch_profile.json'))
+    print("\nService dispatch statistics", file=fd)
+    try:
+        with open(profile_path) as profile_fd:
+            profile_dict = json.load(profile_fd)
+    except FileNotFoundError:
+        print(f"  No statistics found at {profile_path}. Set option 'profile_dispatch'",
+              file=fd)
+        print("  to true to collect them.", file=fd)
+        return
+    except (OSError, ValueError) as e:
+        print(f"  Unable to read statistics from {profile_path}: {e}", file=fd)
+        return
+    print(f"  From {timestamp_to_string(profile_dict['start_ts'])} "
+          f"to {timestamp_to_string(profile_dict['stop_ts'])}", file=fd)
+    for line in weewx.profiler.format_profile(profile_dict):
+        print(" ", line, file=fd)
+
+
 def generate_debug_conf(config_path, config_dict, fd):
     """Generate a parsed and obfuscated weewx.conf and write to the open file descriptor 'fd'.
 
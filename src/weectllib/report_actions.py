@@ -13,6 +13,7 @@ import time
 import weewx
 import weewx.engine
 import weewx.manager
+import weewx.profiler
 import weewx.reportengine
 import weewx.station
 from weeutil.weeutil import bcolors, timestamp_to_string, to_bool
@@ -50,7 +51,8 @@ def list_reports(config_dict):
 def run_reports(config_dict,
                 epoch=None,
                 report_date=None, report_time=None,
-                reports=None):
+                reports=None,
+                profile=False):
     if reports:
         print(f"The following reports will be run: {', '.join(reports)}")
     else:
@@ -99,12 +101,25 @@ def run_reports(config_dict,
     # Instantiate the report engine with the retrieved record and required timestamp
     t = weewx.reportengine.StdReportEngine(config_dict, stn_info, record=record, gen_ts=ts)
 
+    # If asked, profile the reports. This runs the generators one after the other.
+    profiler = weewx.profiler.ReportProfiler() if profile else None
+
     try:
         # Although the report engine inherits from Thread, we can just run it in the main thread:
-        t.run(reports)
+        if profiler:
+            with profiler.activate():
+                t.run(reports)
+        else:
+            t.run(reports)
     except KeyError as e:
         print(f"Unknown report: {e}", file=sys.stderr)
 
+    if profiler:
+        print()
+        for line in weewx.profiler.format_report_profile(profiler.to_dict()):
+            print(line)
+        print()
+
     # Shut down any running services,
     engine.shutDown()
 
@@ -17,7 +17,8 @@ report_list_usage = f"""{bcolors.BOLD}weectl report list
 """
 report_run_usage = f"""  {bcolors.BOLD}weectl report run [NAME ...]
             [--config=FILENAME]
-            [--epoch=EPOCH_TIME | --date=YYYY-mm-dd --time=HH:MM]{bcolors.ENDC}
+            [--epoch=EPOCH_TIME | --date=YYYY-mm-dd --time=HH:MM]
+            [--profile]{bcolors.ENDC}
 """
 
 report_usage = '\n     '.join((report_list_usage, report_run_usage))
@@ -67,6 +68,9 @@ def add_subparser(subparsers):
     run_report_parser.add_argument("--time", metavar="HH:MM",
                                    type=lambda t: time.strptime(t, '%H:%M'),
                                    help="Time of day for the report")
+    run_report_parser.add_argument("--profile", action='store_true',
+                                   help="Show how long each report, generator, template and "
+                                        "image took, and which tags took the most time.")
     run_report_parser.add_argument('reports',
                                    nargs="*",
                                    metavar='NAME',
@@ -93,4 +97,5 @@ def run_reports(config_dict, namespace):
     weectllib.report_actions.run_reports(config_dict,
                                          epoch=namespace.epoch,
                                          report_date=namespace.date, report_time=namespace.time,
-                                         reports=namespace.reports)
+                                         reports=namespace.reports,
+                                         profile=namespace.profile)
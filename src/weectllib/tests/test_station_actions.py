@@ -243,7 +243,7 @@ class TestDriverConfig:
         weewx.drivers.vantage.confeditor_loader = weewx.drivers.vantage.hold
 
     def test_prompt_config_driver(self, config_dict, capsys, monkeypatch):
-        responses = iter(['6', '', '/dev/ttyS0'])
+        responses = iter(['7', '', '/dev/ttyS0'])
         monkeypatch.setattr('builtins.input', lambda _: next(responses))
         weectllib.station_actions.config_driver(config_dict)
         assert config_dict['Station']['station_type'] == 'Vantage'
@@ -17,6 +17,8 @@ Weedb generally follows the MySQL exception model. Specifically:
 """
 
 import importlib
+import threading
+import time
 
 
 # The exceptions that the weedb package can raise:
@@ -78,6 +80,50 @@ NoDatabase = NoDatabaseError
 CannotConnect = CannotConnectError
 
 
+# Statistics of the SQL statements executed by the drivers. Set to an instance of
+# StatementStats to collect them.
+statement_stats = None
+
+
+class StatementStats:
+    """Counts the SQL statements executed, and the time they took, by kind of statement (the
+    first word of the statement, such as 'select' or 'insert')."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Key is the kind of statement, value is a list [count, total seconds]
+        self.stats = {}
+
+    def add(self, sql_string, elapsed):
+        words = sql_string.split(None, 1)
+        kind = words[0].lower() if words else ''
+        with self.lock:
+            try:
+                stat = self.stats[kind]
+            except KeyError:
+                stat = self.stats[kind] = [0, 0.0]
+            stat[0] += 1
+            stat[1] += elapsed
+
+    def to_dict(self):
+        with self.lock:
+            return {kind: {'count': count, 'seconds': seconds}
+                    for kind, (count, seconds) in self.stats.items()}
+
+
+def timed_execute(fn, sql_string, *args):
+    """Call fn(sql_string, *args), adding the time it took to the statement statistics."""
+    # The statistics can be taken away by another thread at any time
+    stats = statement_stats
+    if stats is None:
+        return fn(sql_string, *args)
+    t0 = time.perf_counter()
+    try:
+        return fn(sql_string, *args)
+    finally:
+        stats.add(sql_string, time.perf_counter() - t0)
+
+
 # In what follows, the test whether a database dictionary has function "dict" is
 # to get around a bug in ConfigObj. It seems to be unable to unpack (using the
 # '**' notation) a ConfigObj dictionary into a function. By calling .dict() a
@@ -265,7 +265,10 @@ class Cursor(weedb.Cursor):
         # Convert sql_tuple to a plain old tuple, just in case it actually
         # derives from tuple, but overrides the string conversion (as is the
         # case with a TimeSpan object):
-        self.cursor.execute(updated_sql, tuple(sql_tuple))
+        if weedb.statement_stats is None:
+            self.cursor.execute(updated_sql, tuple(sql_tuple))
+        else:
+            weedb.timed_execute(self.cursor.execute, updated_sql, tuple(sql_tuple))
 
         return self
 
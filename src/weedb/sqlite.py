@@ -154,7 +154,10 @@ class Connection(weedb.Connection):
         of sqlite's ability to do an execute without a cursor."""
 
         with self.connection:
-            self.connection.execute(sql_string, sql_tuple)
+            if weedb.statement_stats is None:
+                self.connection.execute(sql_string, sql_tuple)
+            else:
+                weedb.timed_execute(self.connection.execute, sql_string, sql_tuple)
 
     @guard
     def tables(self):
@@ -246,7 +249,9 @@ class Cursor(sqlite3.Cursor, weedb.Cursor):
     # the sqlite exceptions into weedb exceptions.
     @guard
     def execute(self, *args, **kwargs):
-        return sqlite3.Cursor.execute(self, *args, **kwargs)
+        if weedb.statement_stats is None or kwargs:
+            return sqlite3.Cursor.execute(self, *args, **kwargs)
+        return weedb.timed_execute(super().execute, *args)
 
     @guard
     def fetchone(self):
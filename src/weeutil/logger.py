@@ -84,11 +84,16 @@ else:
     address = ('localhost', 514)
     facility = 'user'
 
+# The name of the process, as given to setup()
+log_label = None
+
 
 def setup(process_name, config_dict=None):
     """Set up the weewx logging facility"""
 
-    global address, facility
+    global address, facility, log_label
+
+    log_label = process_name
 
     # Create a ConfigObj from the default string. No interpolation (it interferes with the
     # interpolation directives embedded in the string).
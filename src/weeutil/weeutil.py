@@ -20,6 +20,7 @@ import re
 import shutil
 import time
 from collections import ChainMap
+from contextlib import contextmanager
 
 # importlib.resources is 3.7 or later, importlib_resources is the backport
 try:
@@ -1698,6 +1699,13 @@ def move_with_timestamp(path):
     return newpath
 
 
+@contextmanager
+def null_context(enter_result=None):
+    """A context manager that does nothing. The same as contextlib.nullcontext(), which is
+    not available before Python 3.7."""
+    yield enter_result
+
+
 class ListOfDicts(ChainMap):
     def extend(self, m):
         self.maps.append(m)
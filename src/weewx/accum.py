@@ -25,9 +25,10 @@ of a sequence of records."""
 #
 import logging
 import math
+from operator import itemgetter
 
 import weewx
-from weeutil.weeutil import ListOfDicts, to_float, timestamp_to_string
+from weeutil.weeutil import ListOfDicts, TimeSpan, to_float, timestamp_to_string
 import weeutil.config
 
 log = logging.getLogger(__name__)
@@ -98,7 +99,15 @@ DEFAULTS_INI = """
 """
 defaults_dict = weeutil.config.config_from_str(DEFAULTS_INI)
 
-accum_dict = ListOfDicts(defaults_dict['Accumulator'].dict())
+# The [Accumulator] section of the configuration. It comes ahead of the defaults, so it
+# overrides them.
+_config_accum = {}
+
+accum_dict = ListOfDicts(_config_accum, defaults_dict['Accumulator'].dict())
+
+
+# The maximum number of record shapes for which an accumulator will cache a plan
+MAX_PLANS = 32
 
 
 class OutOfSpan(ValueError):
@@ -114,6 +123,10 @@ class FirstLastAccum:
     It can only return the first and last value it has seen, along with their timestamps.
     """
 
+    # Backfilling the daily summaries can create a very large number of accumulators, so do
+    # without a per-instance __dict__.
+    __slots__ = ('first', 'firsttime', 'last', 'lasttime')
+
     default_init = (None, None, None, None, 0.0, 0, 0.0, 0)
 
     def __init__(self, stats_tuple=None):
@@ -162,6 +175,36 @@ class FirstLastAccum:
         """Add a scalar value to my running count."""
         pass
 
+    def addHiLoBatch(self, vals, times):
+        """Include a batch of values in my stats. Equivalent to calling addHiLo() for each
+        value in turn.
+        vals: A sequence of values of almost any type.
+        times: A sequence of timestamps, one for each value.
+        """
+        # Ties go to the earliest value for 'first', and the latest value for 'last'
+        if None not in vals:
+            # The usual case. Let the builtins do the work.
+            first_ts = min(times)
+            first = vals[times.index(first_ts)]
+            last_ts = max(times)
+            last = vals[len(times) - 1 - times[::-1].index(last_ts)]
+        else:
+            pairs = [(ts, val) for val, ts in zip(vals, times) if val is not None]
+            if not pairs:
+                return
+            first_ts, first = min(pairs, key=itemgetter(0))
+            last_ts, last = max(reversed(pairs), key=itemgetter(0))
+        if self.firsttime is None or first_ts < self.firsttime:
+            self.first = first
+            self.firsttime = first_ts
+        if self.lasttime is None or last_ts >= self.lasttime:
+            self.last = last
+            self.lasttime = last_ts
+
+    def addSumBatch(self, vals, weights):
+        """Add a batch of values to my running count."""
+        pass
+
 
 # ===============================================================================
 #                             ScalarStats
@@ -170,6 +213,8 @@ class FirstLastAccum:
 class ScalarStats(FirstLastAccum):
     """Accumulates statistics (min, max, average, etc.) for a scalar value."""
 
+    __slots__ = ('min', 'mintime', 'max', 'maxtime', 'sum', 'count', 'wsum', 'sumtime')
+
     def __init__(self, stats_tuple=None):
         # Call my superclass's version
         FirstLastAccum.__init__(self, stats_tuple)
@@ -248,6 +293,62 @@ class ScalarStats(FirstLastAccum):
             self.wsum += val * weight
             self.sumtime += weight
 
+    def addHiLoBatch(self, vals, times):
+        """Include a batch of scalar values in my highs and lows. Equivalent to calling
+        addHiLo() for each value in turn.
+        vals: A sequence of scalar values.
+        times: A sequence of timestamps, one for each value."""
+
+        # Call my superclass's version:
+        FirstLastAccum.addHiLoBatch(self, vals, times)
+
+        floats = _as_floats(vals)
+        # Ties go to the earliest value
+        if _all_valid(floats):
+            lo_val = min(floats)
+            lo_ts = times[floats.index(lo_val)]
+            hi_val = max(floats)
+            hi_ts = times[floats.index(hi_val)]
+        else:
+            # Skip None and NaN:
+            pairs = [(val, ts) for val, ts in zip(floats, times)
+                     if val is not None and val == val]
+            if not pairs:
+                return
+            lo_val, lo_ts = min(pairs, key=itemgetter(0))
+            hi_val, hi_ts = max(pairs, key=itemgetter(0))
+        if self.min is None or lo_val < self.min:
+            self.min = lo_val
+            self.mintime = lo_ts
+        if self.max is None or hi_val > self.max:
+            self.max = hi_val
+            self.maxtime = hi_ts
+
+    def addSumBatch(self, vals, weights):
+        """Add a batch of scalar values to my running sum and count. Equivalent to calling
+        addSum() for each value in turn.
+        vals: A sequence of scalar values.
+        weights: A sequence of weights, one for each value."""
+
+        floats = _as_floats(vals)
+        if _all_valid(floats) and weights.count(1) == len(weights):
+            # The usual case for LOOP packets. Adding val * 1 is the same as adding val.
+            self.sum = sum(floats, self.sum)
+            self.count += len(floats)
+            self.wsum = sum(floats, self.wsum)
+            self.sumtime += len(floats)
+            return
+
+        # Check for None and NaN:
+        pairs = [(val, weight) for val, weight in zip(floats, weights)
+                 if val is not None and val == val]
+        if not pairs:
+            return
+        self.sum = sum([val for val, _ in pairs], self.sum)
+        self.count += len(pairs)
+        self.wsum = sum([val * weight for val, weight in pairs], self.wsum)
+        self.sumtime = sum([weight for _, weight in pairs], self.sumtime)
+
     @property
     def avg(self):
         return self.wsum / self.sumtime if self.count else None
@@ -263,6 +364,10 @@ class VecStats:
     Property 'last' is the last non-None value seen. It is a two-way tuple (mag, dir).
     Property 'lasttime' is the time it was seen. """
 
+    __slots__ = ('min', 'mintime', 'max', 'maxtime', 'sum', 'count', 'wsum', 'sumtime',
+                 'max_dir', 'xsum', 'ysum', 'dirsumtime', 'squaresum', 'wsquaresum',
+                 'last', 'lasttime')
+
     default_init = (None, None, None, None,
                     0.0, 0, 0.0, 0, None, 0.0, 0.0, 0, 0.0, 0.0)
 
@@ -420,6 +525,8 @@ class Accum(dict):
         # first observation comes in for normal operation or pre-set if
         # obtaining a historical accumulator.
         self.unit_system = unit_system
+        # Cache of plans used by addRecord(), keyed by the shape of the record.
+        self._plans = {}
 
     def addRecord(self, record, add_hilo=True, weight=1):
         """Add a record to my running statistics. 
@@ -431,11 +538,115 @@ class Accum(dict):
             raise OutOfSpan("Attempt to add out-of-interval record (%s) to timespan (%s)"
                             % (timestamp_to_string(record['dateTime']), self.timespan))
 
+        # Records from the same source usually have the same shape, so the work of resolving
+        # the add function for each type need only be done once per shape.
+        shape = tuple(record)
+        try:
+            check_units, simple, special = self._plans[shape]
+        except KeyError:
+            check_units, simple, special = self._make_plan(record)
+            if len(self._plans) < MAX_PLANS:
+                self._plans[shape] = (check_units, simple, special)
+
+        if check_units:
+            self._check_units(record['usUnits'])
+
+        # Types that use the default adder can go directly to their stats
+        ts = record['dateTime']
+        if add_hilo:
+            for obs_type, stats in simple:
+                val = record[obs_type]
+                stats.addHiLo(val, ts)
+                stats.addSum(val, weight=weight)
+        else:
+            for obs_type, stats in simple:
+                stats.addSum(record[obs_type], weight=weight)
+
+        # Everything else gets its add function
+        for obs_type, func in special:
+            func(self, record, obs_type, add_hilo, weight)
+
+    def _make_plan(self, record):
+        """Make a plan for adding records with the same keys as 'record'.
+
+        Returns:
+            tuple[bool, list, list]: A 3-way tuple (check_units, simple, special). check_units is
+                True if the unit system must be checked. simple is a list of 2-way tuples
+                (obs_type, stats) for types that use the default adder, where stats is the
+                (initialized) accumulator for the type. special is a list of 2-way tuples
+                (obs_type, func) for all other types, where func is the add function.
+        """
+        check_units = False
+        simple = []
+        special = []
         for obs_type in record:
-            # Get the proper function ...
             func = get_add_function(obs_type)
-            # ... then call it.
-            func(self, record, obs_type, add_hilo, weight)
+            if func is Accum.add_value:
+                self._init_type(obs_type)
+                simple.append((obs_type, self[obs_type]))
+            elif func is Accum.check_units:
+                check_units = True
+            elif func is not Accum.noop:
+                special.append((obs_type, func))
+        return check_units, simple, special
+
+    def addRecords(self, columns, add_hilo=True, weights=1):
+        """Add a batch of records to my running statistics.
+
+        The batch is column-oriented. For types that use the default adder, the statistics
+        are updated a column at a time, rather than a value at a time. The results are the
+        same as adding each record in turn with addRecord().
+
+        Args:
+            columns (dict[str, list]): Key is an observation type, value is a list (or tuple)
+                holding the value of that type for each record. All must be the same length.
+                Must include 'dateTime' and 'usUnits'.
+            add_hilo (bool): True to include the values in the highs and lows.
+            weights (float|list[float]): Either the weight of each record, or a single weight
+                to be used for all records.
+        """
+        times = columns['dateTime']
+        if not len(times):
+            return
+
+        # Check to see if the records are within my observation timespan
+        for ts in (min(times), max(times)):
+            if not self.timespan.includesArchiveTime(ts):
+                raise OutOfSpan("Attempt to add out-of-interval record (%s) to timespan (%s)"
+                                % (timestamp_to_string(ts), self.timespan))
+
+        if not isinstance(weights, (list, tuple)):
+            weights = [weights] * len(times)
+
+        check_units, simple, special = self._make_plan(columns)
+
+        if check_units:
+            for unit_system in dict.fromkeys(columns['usUnits']):
+                self._check_units(unit_system)
+
+        for obs_type, stats in simple:
+            vals = columns[obs_type]
+            # Many types are never reported by a given station. Skip them.
+            if vals.count(None) == len(vals):
+                continue
+            if hasattr(stats, 'addSumBatch'):
+                if add_hilo:
+                    stats.addHiLoBatch(vals, times)
+                stats.addSumBatch(vals, weights)
+            else:
+                # Stats that do not know how to handle a batch get the values one at a time
+                for val, ts, weight in zip(vals, times, weights):
+                    if add_hilo:
+                        stats.addHiLo(val, ts)
+                    stats.addSum(val, weight=weight)
+
+        # Types with other adders need whole records
+        if special:
+            obs_types = list(columns)
+            for values, weight in zip(zip(*[columns[k] for k in obs_types]), weights):
+                record = dict(zip(obs_types, values))
+                for obs_type, func in special:
+                    func(self, record, obs_type, add_hilo, weight)
 
     def updateHiLo(self, accumulator):
         """Merge the high/low stats of another accumulator into me."""
@@ -476,6 +687,30 @@ class Accum(dict):
 
         return record
 
+    def get_state(self):
+        """Return my complete state as a dictionary. It can be serialized as JSON, then
+        used to recreate me with from_state()."""
+        return {'timespan': [self.timespan.start, self.timespan.stop],
+                'unit_system': self.unit_system,
+                'stats': {obs_type: _get_attributes(self[obs_type]) for obs_type in self}}
+
+    @classmethod
+    def from_state(cls, state):
+        """Recreate an accumulator from a state dictionary returned by get_state()."""
+        accum = cls(TimeSpan(*state['timespan']), state['unit_system'])
+        for obs_type, attributes in state['stats'].items():
+            accum._init_type(obs_type)
+            try:
+                for name, value in attributes.items():
+                    # JSON turns tuples, such as the last value of a vector, into lists.
+                    setattr(accum[obs_type], name, tuple(value) if isinstance(value, list)
+                            else value)
+            except AttributeError as e:
+                # The type of accumulator may have changed since the state was saved.
+                log.info("Discarding saved state of type '%s': %s", obs_type, e)
+                del accum[obs_type]
+        return accum
+
     def set_stats(self, obs_type, stats_tuple):
 
         self._init_type(obs_type)
@@ -625,6 +860,41 @@ class Accum(dict):
         return self.unit_system is None
 
 
+def _get_attributes(stats):
+    """Return the attributes of an accumulator for an observation type as a dictionary."""
+    attributes = dict(getattr(stats, '__dict__', {}))
+    for cls in type(stats).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            attributes[name] = getattr(stats, name)
+    return attributes
+
+
+def _as_float(val):
+    """Convert to float. Return None if not possible."""
+    try:
+        return to_float(val)
+    except ValueError:
+        return None
+
+
+def _all_valid(floats):
+    """Return True if a list of floats holds no None and no NaN."""
+    if None in floats:
+        return False
+    # The sum is NaN if any value is. It is also NaN if both infinities are present, in which
+    # case the caller takes the slow path, which is still correct.
+    total = sum(floats)
+    return total == total
+
+
+def _as_floats(vals):
+    """Convert a sequence of values to a list of floats. Values that cannot be converted
+    become None."""
+    return [val if val is None or type(val) is float
+            else float(val) if type(val) is int
+            else _as_float(val) for val in vals]
+
+
 # ===============================================================================
 #                            Configuration dictionaries
 # ===============================================================================
@@ -674,10 +944,12 @@ OBS_DEFAULTS = {
 
 
 def initialize(config_dict):
-    # Add the configuration dictionary to the beginning of the list of maps.
-    # This will cause it to override the defaults
-    global accum_dict
-    accum_dict.maps.insert(0, config_dict.get('Accumulator', {}))
+    # Put the [Accumulator] section of the configuration in place of the one from any earlier
+    # configuration. This will cause it to override the defaults
+    global accum_dict, _config_accum
+    new_accum = config_dict.get('Accumulator', {})
+    accum_dict.maps = [new_accum if m is _config_accum else m for m in accum_dict.maps]
+    _config_accum = new_accum
 
 
 def new_accumulator(obs_type):
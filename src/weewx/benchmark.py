@@ -0,0 +1,210 @@
+#
+#    Copyright (c) 2009-2024 Tom Keffer <tkeffer@gmail.com>
+#
+#    See the file LICENSE.txt for your full rights.
+#
+"""Measure how fast the engine processes data.
+
+The engine is run with the standard services against the replay driver, as fast as it will
+go. It reports how many LOOP packets and archive records it processed a second, then how much
+time each service took. The uploaders and the reports are left out.
+
+By default, the data are simulator data, the same every time. To replay recorded LOOP packets,
+or the archive of a database, use --file or --database.
+
+    python -m weewx.benchmark [--config=FILENAME] [--file=FILENAME | --database=NAME]
+                              [--packets=N] [--loop-batch] [--no-profile]
+"""
+
+# Python imports
+import argparse
+import json
+import os.path
+import random
+import tempfile
+import time
+
+import configobj
+
+# weewx imports:
+import weecfg
+import weeutil.config
+import weeutil.logger
+import weeutil.weeutil
+import weewx
+import weewx.drivers.simulator
+import weewx.engine
+import weewx.manager
+
+# Fixed, so that the simulator data are the same every run
+SIMULATOR_START = '2024-01-01T00:00'
+
+usage = """python -m weewx.benchmark [--config=FILENAME]
+                          [--file=FILENAME | --database=NAME]
+                          [--packets=N] [--loop-batch] [--no-profile]"""
+
+
+def main():
+    parser = argparse.ArgumentParser(usage=usage,
+                                     description="Measure how fast the engine processes "
+                                                 "LOOP packets and archive records.")
+    parser.add_argument('--config', metavar='FILENAME',
+                        help="Take the services and their options from this configuration "
+                             "file. Default is the configuration file that comes with WeeWX.")
+    parser.add_argument('--file', metavar='FILENAME',
+                        help="Replay the LOOP packets in this file, one JSON object per line.")
+    parser.add_argument('--database', metavar='NAME',
+                        help="Replay the archive records of this database in the "
+                             "configuration file, such as 'archive_sqlite'.")
+    parser.add_argument('--packets', type=int, default=20000,
+                        help="How many simulator packets to replay, if neither --file nor "
+                             "--database is given. Default is 20000.")
+    parser.add_argument('--loop-batch', action='store_true',
+                        help="Take the LOOP packets in batches.")
+    parser.add_argument('--no-profile', action='store_true',
+                        help="Do not measure the time taken by each service.")
+    namespace = parser.parse_args()
+
+    if namespace.config:
+        _, config_dict = weecfg.read_config(namespace.config)
+    else:
+        with weeutil.weeutil.get_resource_fd('weewx_data', 'weewx.conf') as fd:
+            config_dict = configobj.ConfigObj(fd, encoding='utf-8')
+        config_dict['WEEWX_ROOT'] = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if namespace.database:
+            replay_dict = {'database': namespace.database}
+        else:
+            path = namespace.file
+            if not path:
+                path = os.path.join(tmp_dir, 'packets.json')
+                write_simulator_packets(path, namespace.packets)
+            replay_dict = {'file': os.path.abspath(path)}
+
+        result = run_benchmark(config_dict, replay_dict, tmp_dir,
+                               loop_batch=namespace.loop_batch, profile=False)
+        for line in format_result(result):
+            print(line)
+
+        if not namespace.no_profile:
+            # Do it again, this time timing each service. This slows things down, so the
+            # throughput comes from the first run.
+            result = run_benchmark(config_dict, replay_dict, tmp_dir,
+                                   loop_batch=namespace.loop_batch, profile=True)
+            print()
+            for line in format_service_costs(result):
+                print(line)
+
+
+def write_simulator_packets(path, npackets):
+    """Write simulator LOOP packets to a file, one JSON object per line."""
+    random.seed(0)
+    start_ts = time.mktime(time.strptime(SIMULATOR_START, "%Y-%m-%dT%H:%M"))
+    station = weewx.drivers.simulator.Simulator(start_time=start_ts, mode='generator')
+    with open(path, 'w', encoding='utf-8') as fd:
+        for i, packet in zip(range(npackets), station.genLoopPackets()):
+            fd.write(json.dumps(packet) + '\n')
+
+
+def run_benchmark(config_dict, replay_dict, work_dir, loop_batch=False, profile=True):
+    """Run the engine against the replay driver, until the data run out.
+
+    Args:
+        config_dict (dict): The configuration dictionary. It is not modified.
+        replay_dict (dict): Options for the replay driver, saying where the data come from.
+        work_dir (str): Directory where the archive database and the profile are put. Any
+            archive database from an earlier run is removed.
+        loop_batch (bool): Whether to take LOOP packets in batches.
+        profile (bool): Whether to time each service.
+
+    Returns:
+        dict: The number of LOOP packets and archive records, how long they took in
+            seconds, and, if profiling, the dispatch profile.
+    """
+    bench_dict = weeutil.config.deep_copy(config_dict)
+
+    replay_dict = dict(replay_dict, driver='weewx.drivers.replay', speed='0')
+    if replay_dict.get('database'):
+        # Replay from the source database, wherever it is
+        db_dict = weewx.manager.get_database_dict_from_config(config_dict,
+                                                              replay_dict['database'])
+        bench_dict['Databases']['replay_source'] = db_dict
+        replay_dict['database'] = 'replay_source'
+    bench_dict['Station']['station_type'] = 'Replay'
+    bench_dict['Replay'] = replay_dict
+
+    # Everything the engine writes goes in the work directory
+    bench_dict['WEEWX_ROOT'] = work_dir
+    bench_dict['Databases']['benchmark_sqlite'] = {'database_name': 'benchmark.sdb',
+                                                   'driver': 'weedb.sqlite',
+                                                   'SQLITE_ROOT': work_dir}
+    bench_dict['DataBindings']['wx_binding']['database'] = 'benchmark_sqlite'
+    db_path = os.path.join(work_dir, 'benchmark.sdb')
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    # Each run starts from scratch
+    bench_dict.setdefault('StdArchive', {})['checkpoint_interval'] = 0
+
+    # Uploads and reports are not part of processing the data
+    services = bench_dict['Engine']['Services']
+    services['restful_services'] = []
+    services['report_services'] = []
+
+    bench_dict['loop_batch'] = loop_batch
+    bench_dict['profile_dispatch'] = profile
+    bench_dict['profile_interval'] = 0
+    bench_dict['loop_budget'] = 0
+    bench_dict['profile_file'] = 'dispatch_profile.json'
+    bench_dict['Logging'] = {'root': {'level': 'WARNING', 'handlers': ['console']}}
+    weeutil.logger.setup('weewx.benchmark', bench_dict)
+
+    engine = weewx.engine.StdEngine(bench_dict)
+    profiler = engine.profiler
+    console = engine.console
+    try:
+        engine.run()
+    except weewx.StopNow:
+        pass
+
+    with weewx.manager.open_manager_with_config(bench_dict, 'wx_binding') as dbmanager:
+        nrecords = dbmanager.getSql("SELECT COUNT(*) FROM %s" % dbmanager.table_name)[0]
+
+    result = {'packets': console.packet_count,
+              'records': nrecords,
+              'seconds': console.stop_wall_ts - console.start_wall_ts,
+              'loop_batch': loop_batch}
+    if profiler:
+        result['profile'] = profiler.to_dict()
+    return result
+
+
+def format_result(result):
+    """Return lines of text giving the throughput of a benchmark run."""
+    seconds = result['seconds']
+    return ["Replayed %d LOOP packets and wrote %d archive records in %.3f seconds%s"
+            % (result['packets'], result['records'], seconds,
+               " (LOOP packets in batches)" if result['loop_batch'] else ""),
+            "  %10.1f LOOP packets per second" % (result['packets'] / seconds),
+            "  %10.1f archive records per second" % (result['records'] / seconds)]
+
+
+def format_service_costs(result):
+    """Return lines of text giving the time taken by each service, slowest first."""
+    # Add up the time taken by each service, over all its callbacks
+    totals = {}
+    for callbacks in result['profile']['callbacks'].values():
+        for name, hist_dict in callbacks.items():
+            service = name.rsplit('.', 1)[0]
+            totals[service] = totals.get(service, 0.0) + hist_dict['total']
+    npackets = result['packets'] or 1
+    lines = ["%-52s %10s %12s" % ('Service', 'Total (s)', 'Per packet (us)')]
+    for service in sorted(totals, key=totals.get, reverse=True):
+        lines.append("%-52s %10.3f %12.1f"
+                     % (service[-52:], totals[service], totals[service] / npackets * 1.e6))
+    return lines
+
+
+if __name__ == '__main__':
+    main()
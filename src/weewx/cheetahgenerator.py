@@ -14,8 +14,13 @@ Configuration Options
   encoding = (html_entities|utf8|strict_ascii|normalized_ascii)
   template = filename.tmpl           # must end with .tmpl
   stale_age = s                      # age in seconds
+  incremental = true|false           # skip if the data used have not changed
+  prefetch_days = true|false         # fetch the daily summaries of SummaryBy spans at once
+  batch_days = true|false            # fetch the daily summaries used by several tags at once
+  stream_output = true|false         # write the output as it is produced
   search_list = a, b, c
   search_list_extensions = d, e, f
+  cache_dir = directory              # where to keep compiled templates
 
 The strings YYYY, MM, DD and WW will be replaced if they appear in the filename.
 
@@ -58,10 +63,15 @@ Example:
 """
 
 import datetime
+import hashlib
+import importlib.util
 import json
 import logging
+import marshal
 import os.path
+import threading
 import time
+import types
 import unicodedata
 
 import Cheetah.Filters
@@ -71,10 +81,13 @@ import weedb
 import weeutil.logger
 import weeutil.weeutil
 import weewx.almanac
+import weewx.dependencies
+import weewx.profiler
 import weewx.reportengine
 import weewx.station
 import weewx.tags
 import weewx.units
+import weewx.xtypes
 from weeutil.config import search_up, accumulateLeaves, deep_copy
 from weeutil.weeutil import to_bool, to_int, timestamp_to_string
 
@@ -115,10 +128,15 @@ class CheetahGenerator(weewx.reportengine.ReportGenerator):
         formatter:        An instance of weewx.units.Formatter
         converter:        An instance of weewx.units.Converter
         search_list_objs: A list holding search list extensions
+        extension_cache:  The extension lists that can be used for more than one template
         db_binder:        An instance of weewx.manager.DBBinder from which the
                           data should be extracted
     """
 
+    # Templates depend only on the database, so they can be generated alongside the other
+    # generators in the report pool
+    waits_for = None
+
     generator_dict = {'SummaryByDay'  : weeutil.weeutil.genDaySpans,
                       'SummaryByMonth': weeutil.weeutil.genMonthSpans,
                       'SummaryByYear' : weeutil.weeutil.genYearSpans}
@@ -133,6 +151,8 @@ class CheetahGenerator(weewx.reportengine.ReportGenerator):
         weewx.reportengine.ReportGenerator.__init__(self, config_dict, skin_dict, *args, **kwargs)
 
         self.search_list_objs = []
+        # Key is (index of a search list extension, its cache key). Value is its extension list.
+        self.extension_cache = {}
         self.formatter = weewx.units.Formatter.fromSkinDict(skin_dict)
         self.converter = weewx.units.Converter.fromSkinDict(skin_dict)
 
@@ -162,9 +182,16 @@ class CheetahGenerator(weewx.reportengine.ReportGenerator):
         # configure the search list extensions
         self.init_extensions(gen_dict[section_name])
 
+        # What the files generated incrementally depended on, the last time
+        self.depends = weewx.dependencies.DependencyFile(
+            os.path.join(self.config_dict['WEEWX_ROOT'], self.skin_dict['HTML_ROOT'],
+                         '#%s.cheetah.depends' % self.skin_dict['REPORT_NAME']),
+            self.config_dict, self.skin_dict, self.db_binder)
+
         # Generate any templates in the given dictionary:
         ngen = self.generate(gen_dict[section_name], section_name, self.gen_ts)
 
+        self.depends.save()
         self.teardown()
 
         elapsed_time = time.time() - t1
@@ -198,6 +225,7 @@ class CheetahGenerator(weewx.reportengine.ReportGenerator):
     def teardown(self):
         """Delete any extension objects we created to prevent back references
         from slowing garbage collection"""
+        self.extension_cache.clear()
         while self.search_list_objs:
             self.search_list_objs[-1].finalize()
             del self.search_list_objs[-1]
@@ -238,6 +266,9 @@ class CheetahGenerator(weewx.reportengine.ReportGenerator):
             return ngen
 
         (template, dest_dir, encoding, default_binding) = self._prepGen(report_dict)
+        cache_dir = report_dict.get('cache_dir')
+        if cache_dir:
+            cache_dir = os.path.join(self.config_dict['WEEWX_ROOT'], cache_dir)
 
         # Get start and stop times        
         default_archive = self.db_binder.get_manager(default_binding)
@@ -306,17 +337,38 @@ class CheetahGenerator(weewx.reportengine.ReportGenerator):
                 except os.error:
                     pass
 
+            # Skip files generated incrementally, if none of the data they use have changed
+            incremental = to_bool(report_dict.get('incremental', False))
+            gen_span = (timespan.start, timespan.stop)
+            if incremental and self.depends.is_current(_fullname, gen_span):
+                log.debug("Skip '%s': the data it uses have not changed", _filename)
+                continue
+
             searchList = self._getSearchList(encoding, timespan,
                                              default_binding, section_name,
                                              os.path.join(
                                                os.path.dirname(report_dict['template']),
                                                _filename))
 
-            # First, compile the template
+            stream_output = to_bool(report_dict.get('stream_output', False))
+
+            # The "SummaryBy" templates ask for aggregates for each day, or month, of the
+            # timespan. Fetch the daily summaries they need for the whole timespan at once.
+            # If asked, other templates fetch them at once for the periods where, the last
+            # time, they asked for several aggregates.
+            if summarize_by in CheetahGenerator.generator_dict \
+                    and to_bool(report_dict.get('prefetch_days', True)):
+                prefetch = weewx.xtypes.prefetch_days(timespan)
+            elif to_bool(report_dict.get('batch_days', False)):
+                prefetch = weewx.xtypes.batch_days(day_plans.get(template))
+            else:
+                prefetch = weeutil.weeutil.null_context()
+
+            # First, compile the template. Usually, it was compiled on an earlier run, and all
+            # that is needed is a new instance of the compiled class.
             try:
-                # TODO: Look into caching the compiled template.
-                compiled_template = Cheetah.Template.Template(
-                    file=template,
+                template_class = template_cache.get_class(template, cache_dir)
+                compiled_template = template_class(
                     searchList=searchList,
                     filter='AssureUnicode',
                     filtersLib=weewx.cheetahgenerator)
@@ -327,52 +379,55 @@ class CheetahGenerator(weewx.reportengine.ReportGenerator):
                 weeutil.logger.log_traceback(log.error, "****  ")
                 continue
 
-            # Second, evaluate the compiled template
-            try:
-                # We have a compiled template in hand. Evaluate it. The result will be a long
-                # Unicode string.
-                unicode_string = compiled_template.respond()
-            except Cheetah.Parser.ParseError as e:
-                log.error("Parse error while evaluating file %s", template)
-                log.error("**** Ignoring template %s", template)
-                log.error("**** Reason: %s", e)
-                continue
-            except Cheetah.NameMapper.NotFound as e:
-                log.error("Evaluation of template %s failed.", template)
-                log.error("**** Ignoring template %s", template)
-                log.error("**** Reason: %s", e)
-                log.error("**** To debug, try inserting '#errorCatcher Echo' at top of template")
-                continue
-            except Exception as e:
-                log.error("Evaluation of template %s failed with exception '%s'", template, type(e))
-                log.error("**** Ignoring template %s", template)
-                log.error("**** Reason: %s", e)
-                weeutil.logger.log_traceback(log.error, "****  ")
-                continue
+            # Convert the results to a byte string, using the strategy chosen by the user
+            encode = _get_encoder(encoding)
 
-            # Third, convert the results to a byte string, using the strategy chosen by the user.
-            if encoding == 'html_entities':
-                byte_string = unicode_string.encode('ascii', 'xmlcharrefreplace')
-            elif encoding == 'strict_ascii':
-                byte_string = unicode_string.encode('ascii', 'ignore')
-            elif encoding == 'normalized_ascii':
-                # Normalize the string, replacing accented characters with non-accented
-                # equivalents
-                normalized = unicodedata.normalize('NFD', unicode_string)
-                byte_string = normalized.encode('ascii', 'ignore')
-            else:
-                byte_string = unicode_string.encode(encoding)
-
-            # Finally, write the byte string to the target file
+            tmpname = _fullname + '.tmp'
             try:
-                # Write to a temporary file first
-                tmpname = _fullname + '.tmp'
-                # Open it in binary mode. We are writing a byte-string, not a string
-                with open(tmpname, mode='wb') as fd:
-                    fd.write(byte_string)
-                # Now move the temporary file into place
+                # Second, evaluate the compiled template
+                try:
+                    with weewx.dependencies.track() as deps, prefetch as days, \
+                            weewx.profiler.report_timing('template', _filename):
+                        if stream_output:
+                            # Write the results to a temporary file as they are produced
+                            with open(tmpname, mode='wb') as fd:
+                                stream = _StreamingTransaction(fd, encode)
+                                compiled_template.respond(trans=stream)
+                                stream.flush()
+                        else:
+                            # The result will be a long Unicode string.
+                            unicode_string = compiled_template.respond()
+                    if isinstance(days, weewx.xtypes.DayBatch):
+                        day_plans[template] = days.usage()
+                except Cheetah.Parser.ParseError as e:
+                    log.error("Parse error while evaluating file %s", template)
+                    log.error("**** Ignoring template %s", template)
+                    log.error("**** Reason: %s", e)
+                    continue
+                except Cheetah.NameMapper.NotFound as e:
+                    log.error("Evaluation of template %s failed.", template)
+                    log.error("**** Ignoring template %s", template)
+                    log.error("**** Reason: %s", e)
+                    log.error("**** To debug, try inserting '#errorCatcher Echo' at top of template")
+                    continue
+                except Exception as e:
+                    log.error("Evaluation of template %s failed with exception '%s'", template, type(e))
+                    log.error("**** Ignoring template %s", template)
+                    log.error("**** Reason: %s", e)
+                    weeutil.logger.log_traceback(log.error, "****  ")
+                    continue
+
+                if not stream_output:
+                    # Write the byte string to a temporary file. Open it in binary mode. We are
+                    # writing a byte-string, not a string
+                    with open(tmpname, mode='wb') as fd:
+                        fd.write(encode(unicode_string))
+
+                # Finally, move the temporary file into place
                 os.rename(tmpname, _fullname)
                 ngen += 1
+                if incremental:
+                    self.depends.add(_fullname, gen_span, deps)
             finally:
                 try:
                     os.unlink(tmpname)
@@ -396,9 +451,16 @@ class CheetahGenerator(weewx.reportengine.ReportGenerator):
         # Bind to the default_binding:
         db_lookup = self.db_binder.bind_default(default_binding)
 
-        # Then add the V3.X style search list extensions
-        for obj in self.search_list_objs:
-            search_list += obj.get_extension_list(timespan, db_lookup)
+        # Then add the V3.X style search list extensions. Those that can be are used again for
+        # other templates.
+        for i, obj in enumerate(self.search_list_objs):
+            if not obj.cacheable:
+                search_list += obj.get_extension_list(timespan, db_lookup)
+                continue
+            key = (i, obj.cache_key(timespan, default_binding))
+            if key not in self.extension_cache:
+                self.extension_cache[key] = obj.get_extension_list(timespan, db_lookup)
+            search_list += self.extension_cache[key]
 
         return search_list
 
@@ -468,6 +530,169 @@ class CheetahGenerator(weewx.reportengine.ReportGenerator):
         return (template, destination_dir, encoding, default_binding)
 
 
+def _get_encoder(encoding):
+    """Return a function that converts a Unicode string to a byte string, using the strategy
+    chosen by the user."""
+    if encoding == 'html_entities':
+        return lambda unicode_string: unicode_string.encode('ascii', 'xmlcharrefreplace')
+    elif encoding == 'strict_ascii':
+        return lambda unicode_string: unicode_string.encode('ascii', 'ignore')
+    elif encoding == 'normalized_ascii':
+        # Normalize the string, replacing accented characters with non-accented equivalents
+        return lambda unicode_string: unicodedata.normalize('NFD', unicode_string) \
+            .encode('ascii', 'ignore')
+    else:
+        return lambda unicode_string: unicode_string.encode(encoding)
+
+
+class _StreamingTransaction:
+    """Stands in for the Cheetah DummyTransaction. Rather than collecting everything a template
+    produces into one long string, it encodes it, and writes it to a file, a piece at a time."""
+
+    def __init__(self, fd, encode, buffer_size=65536):
+        self.fd = fd
+        self.encode = encode
+        self.buffer_size = buffer_size
+        self.pieces = []
+        self.size = 0
+
+    def response(self):
+        return self
+
+    def write(self, text):
+        if isinstance(text, bytes):
+            text = text.decode('utf-8')
+        self.pieces.append(text)
+        self.size += len(text)
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def writeln(self, text):
+        self.write(text)
+        self.write('\n')
+
+    def flush(self):
+        if self.pieces:
+            self.fd.write(self.encode(''.join(self.pieces)))
+            self.pieces = []
+            self.size = 0
+
+
+# =============================================================================
+# Cache of compiled templates
+# =============================================================================
+
+class TemplateCache:
+    """Holds the classes compiled from templates, so a template is compiled only once, rather
+    than on every run of the reports. Files brought in by #include are held in the same way.
+
+    A class is compiled again if its template file has been modified. Optionally, the compiled
+    code is also kept on disk, so it survives a restart.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Key is the absolute path of a template. Value is a tuple (mtime, class).
+        self.classes = {}
+
+    def get_class(self, path, cache_dir=None):
+        """Return the class compiled from the template at 'path'.
+
+        Args:
+            path (str): Path to the template.
+            cache_dir (str|None): Directory where the compiled code is kept on disk. If None,
+                it is only kept in memory.
+
+        Returns:
+            type: A subclass of Cheetah.Template.Template
+        """
+        path = os.path.abspath(path)
+        mtime = os.path.getmtime(path)
+        with self.lock:
+            entry = self.classes.get(path)
+        if entry and entry[0] == mtime:
+            return entry[1]
+
+        code = None
+        cache_path = None
+        if cache_dir:
+            cache_path = self._cache_path(path, cache_dir)
+            code = self._read_code(cache_path, mtime)
+        if code is None:
+            log.debug("Compiling template %s", path)
+            module_code = Cheetah.Template.Template.compile(file=path,
+                                                            returnAClass=False,
+                                                            moduleName='weewx_template',
+                                                            className='CompiledTemplate')
+            code = compile(module_code, path, 'exec')
+            if cache_path:
+                self._write_code(cache_path, mtime, code)
+
+        module = types.ModuleType('weewx_template')
+        exec(code, module.__dict__)
+        template_class = module.CompiledTemplate
+        # Have any #include directives in the template go through the cache as well
+        include_compiler = _IncludeCompiler(self, cache_dir)
+        template_class._getTemplateAPIClassForIncludeDirectiveCompilation = \
+            lambda _self, source, file: include_compiler
+
+        with self.lock:
+            self.classes[path] = (mtime, template_class)
+        return template_class
+
+    def clear(self):
+        with self.lock:
+            self.classes.clear()
+
+    @staticmethod
+    def _cache_path(path, cache_dir):
+        # Compiled code cannot be shared between versions of Python, or of Cheetah.
+        key = "%s|%s|%s" % (path, importlib.util.MAGIC_NUMBER.hex(), Cheetah.Version)
+        return os.path.join(cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.bin')
+
+    @staticmethod
+    def _read_code(cache_path, mtime):
+        """Return the code kept on disk, or None if it is missing or out of date."""
+        try:
+            with open(cache_path, 'rb') as fd:
+                cached_mtime, code = marshal.load(fd)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        return code if cached_mtime == mtime else None
+
+    @staticmethod
+    def _write_code(cache_path, mtime, code):
+        tmpname = cache_path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(tmpname, 'wb') as fd:
+                marshal.dump((mtime, code), fd)
+            os.replace(tmpname, cache_path)
+        except OSError as e:
+            log.info("Unable to save compiled template to %s: %s", cache_path, e)
+
+
+class _IncludeCompiler:
+    """Compiles the files brought in by #include directives, using a TemplateCache."""
+
+    def __init__(self, cache, cache_dir):
+        self.cache = cache
+        self.cache_dir = cache_dir
+
+    def compile(self, source=None, file=None):
+        if source is None and isinstance(file, str):
+            return self.cache.get_class(file, self.cache_dir)
+        return Cheetah.Template.Template.compile(source=source, file=file)
+
+
+# The compiled templates of all skins, held for the life of the process
+template_cache = TemplateCache()
+
+# Key is the path of a template. Value is what it asked of the daily summaries the last time
+# it was evaluated. See weewx.xtypes.DayBatch.
+day_plans = {}
+
+
 # =============================================================================
 # Classes used to implement the Search list
 # =============================================================================
@@ -475,6 +700,11 @@ class CheetahGenerator(weewx.reportengine.ReportGenerator):
 class SearchList:
     """Abstract base class used for search list extensions."""
 
+    # Set to True if the list returned by get_extension_list() can be used again for other
+    # templates in the same run of the generator. It is then built again only when the value
+    # returned by cache_key() changes.
+    cacheable = False
+
     def __init__(self, generator):
         """Create an instance of SearchList.
 
@@ -496,6 +726,19 @@ class SearchList:
         """
         return [self]
 
+    def cache_key(self, timespan, default_binding):  # @UnusedVariable
+        """Return what the list returned by get_extension_list() depends on. Only used if
+        'cacheable' is True.
+
+        timespan:  An instance of weeutil.weeutil.TimeSpan, as for get_extension_list().
+
+        default_binding: The name of the binding that db_lookup() uses by default.
+
+        The default is None, meaning the list depends on neither, and is built only once in a
+        run of the generator.
+        """
+        return None
+
     def finalize(self):
         """Called when the extension is no longer needed"""
 
@@ -503,6 +746,8 @@ class SearchList:
 class Almanac(SearchList):
     """Class that implements the '$almanac' tag."""
 
+    cacheable = True
+
     def __init__(self, generator):
         SearchList.__init__(self, generator)
 
@@ -546,20 +791,28 @@ class Almanac(SearchList):
 
         altitude_vt = weewx.units.convert(generator.stn_info.altitude_vt, "meter")
 
-        self.almanac = weewx.almanac.Almanac(celestial_ts,
-                                             generator.stn_info.latitude_f,
-                                             generator.stn_info.longitude_f,
-                                             altitude=altitude_vt[0],
-                                             temperature=temperature_C,
-                                             pressure=pressure_mbar,
-                                             texts=self.texts,
-                                             formatter=generator.formatter,
-                                             converter=generator.converter)
+        self._almanac = weewx.almanac.Almanac(celestial_ts,
+                                              generator.stn_info.latitude_f,
+                                              generator.stn_info.longitude_f,
+                                              altitude=altitude_vt[0],
+                                              temperature=temperature_C,
+                                              pressure=pressure_mbar,
+                                              texts=self.texts,
+                                              formatter=generator.formatter,
+                                              converter=generator.converter)
+
+    @property
+    def almanac(self):
+        # The almanac depends on the time it is for
+        weewx.dependencies.add_point(None, self._almanac.time_ts)
+        return self._almanac
 
 
 class Station(SearchList):
     """Class that implements the $station tag."""
 
+    cacheable = True
+
     def __init__(self, generator):
         SearchList.__init__(self, generator)
         self.station = weewx.station.Station(generator.stn_info,
@@ -571,6 +824,12 @@ class Station(SearchList):
 class Current(SearchList):
     """Class that implements the $current tag"""
 
+    # $current is for the time of the report, from the default binding
+    cacheable = True
+
+    def cache_key(self, timespan, default_binding):
+        return timespan.stop, default_binding
+
     def get_extension_list(self, timespan, db_lookup):
         record_binder = weewx.tags.RecordBinder(db_lookup, timespan.stop,
                                                 self.generator.formatter, self.generator.converter,
@@ -582,6 +841,12 @@ class Stats(SearchList):
     """Class that implements the time-based statistical tags, such
     as $day.outTemp.max"""
 
+    # The tags depend on the time of the report, and the default binding
+    cacheable = True
+
+    def cache_key(self, timespan, default_binding):
+        return timespan.stop, default_binding
+
     def get_extension_list(self, timespan, db_lookup):
         try:
             trend_dict = self.generator.skin_dict['Units']['Trend']
@@ -605,6 +870,8 @@ class Stats(SearchList):
 class UnitInfo(SearchList):
     """Class that implements the $unit and $obs tags."""
 
+    cacheable = True
+
     def __init__(self, generator):
         SearchList.__init__(self, generator)
         # This implements the $unit tag:
@@ -626,6 +893,8 @@ class Extras(SearchList):
     """Class for exposing the [Extras] section in the skin config dictionary
     as tag $Extras."""
 
+    cacheable = True
+
     def __init__(self, generator):
         SearchList.__init__(self, generator)
         # If the user has supplied an '[Extras]' section in the skin
@@ -637,6 +906,8 @@ class Extras(SearchList):
 class JSONHelpers(SearchList):
     """Helper functions for formatting JSON"""
 
+    cacheable = True
+
     @staticmethod
     def jsonize(arg):
         """
@@ -694,6 +965,8 @@ class JSONHelpers(SearchList):
 class Gettext(SearchList):
     """Values provided by $gettext() are found in the [Texts] section of the localization file."""
 
+    cacheable = True
+
     def gettext(self, key):
         try:
             v = self.generator.skin_dict['Texts'].get(key, key)
@@ -715,6 +988,8 @@ class Gettext(SearchList):
 class PlotInfo(SearchList):
     """Return information about plots, based on what's in the [ImageGenerator] section."""
 
+    cacheable = True
+
     def getobs(self, plot_name):
         """
         Given a plot name, return the set of observations in that plot.
@@ -755,6 +1030,8 @@ class DisplayOptions(SearchList):
     """Class for exposing the [DisplayOptions] section in the skin config
     dictionary as tag $DisplayOptions."""
 
+    cacheable = True
+
     def __init__(self, generator):
         SearchList.__init__(self, generator)
         self.DisplayOptions = dict(generator.skin_dict.get('DisplayOptions', {}))
@@ -763,6 +1040,8 @@ class DisplayOptions(SearchList):
 class SkinInfo(SearchList):
     """Class for exposing information about the skin."""
 
+    cacheable = True
+
     def __init__(self, generator):
         SearchList.__init__(self, generator)
         for k in ['HTML_ROOT', 'REPORT_NAME', 'skin',
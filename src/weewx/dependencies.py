@@ -0,0 +1,218 @@
+#
+#    Copyright (c) 2009-2024 Tom Keffer <tkeffer@gmail.com>
+#
+#    See the file LICENSE.txt for your full rights.
+#
+"""Track the data that each generated file reads, so the file can be left alone if none of it
+has changed since the file was last generated.
+
+While a template or a plot is rendered, the functions in weewx.xtypes, and the tags for current
+values, note which data binding they read, and the latest time they read. After the next
+archive record arrives, a file needs to be generated again only if it read data from a
+binding that got new records, up to or beyond the time of the last record it saw.
+
+This assumes data are only added at the end of a database. Data imported into the past are
+not noticed.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+import weeutil.weeutil
+import weewx
+
+log = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class Dependencies:
+    """The data read while rendering one file."""
+
+    def __init__(self):
+        # Key is a data binding. Value is the latest time read from it.
+        self.latest = {}
+        # True if data were read that depend on the time the file was generated for, such as
+        # current values, or that were read from a database not opened through a binding.
+        self.volatile = False
+
+    def add_range(self, db_manager, stop_ts):
+        binding = getattr(db_manager, 'data_binding', None)
+        if binding is None:
+            self.volatile = True
+        elif stop_ts is not None:
+            self.latest[binding] = max(self.latest.get(binding, stop_ts), stop_ts)
+
+    def add_point(self, db_manager, timestamp):
+        self.volatile = True
+        self.add_range(db_manager, timestamp)
+
+
+@contextmanager
+def track():
+    """Context manager that collects the data read within it into a Dependencies object."""
+    deps = Dependencies()
+    stack = _local.__dict__.setdefault('stack', [])
+    stack.append(deps)
+    try:
+        yield deps
+    finally:
+        stack.pop()
+
+
+def add_range(db_manager, timespan):
+    """Note that data over 'timespan' were read from the database of 'db_manager'."""
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        stop_ts = timespan[1] if timespan else None
+        for deps in stack:
+            deps.add_range(db_manager, stop_ts)
+
+
+def add_point(db_manager, timestamp):
+    """Note that the record at 'timestamp' was read from the database of 'db_manager'."""
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        for deps in stack:
+            deps.add_point(db_manager, timestamp)
+
+
+# The skin dictionary the last signature was calculated for, and that signature
+_last_signature = (None, None)
+_signature_lock = threading.Lock()
+
+
+def skin_signature(config_dict, skin_dict):
+    """Return a string that changes if the skin, or its configuration, changes.
+
+    The generators of a report share its skin dictionary, and a new one is built for each run
+    of the report. So the signature is calculated once for each run of a report, rather than
+    for each generator.
+    """
+    global _last_signature
+    with _signature_lock:
+        last_skin_dict, signature = _last_signature
+        if last_skin_dict is skin_dict:
+            return signature
+    skin_dir = os.path.join(config_dict['WEEWX_ROOT'],
+                            skin_dict['SKIN_ROOT'],
+                            skin_dict['skin'])
+    latest_mtime = 0
+    for dirpath, _, filenames in os.walk(skin_dir):
+        for filename in filenames:
+            try:
+                latest_mtime = max(latest_mtime,
+                                   os.path.getmtime(os.path.join(dirpath, filename)))
+            except OSError:
+                pass
+    skin_json = json.dumps(skin_dict, sort_keys=True, default=str)
+    signature = hashlib.sha1(("%s|%s" % (latest_mtime, skin_json)).encode('utf-8')).hexdigest()
+    with _signature_lock:
+        _last_signature = (skin_dict, signature)
+    return signature
+
+
+class DependencyFile:
+    """Remembers what each file generated by a generator depended on. Files generated with a
+    different skin, or skin configuration, do not count.
+
+    Args:
+        path (str): Where to keep the dependencies.
+        config_dict (dict): The configuration dictionary.
+        skin_dict (dict): The skin dictionary.
+        db_binder (weewx.manager.DBBinder): Used to find the last record of each binding.
+    """
+
+    def __init__(self, path, config_dict, skin_dict, db_binder):
+        self.path = path
+        self.config_dict = config_dict
+        self.skin_dict = skin_dict
+        self.db_binder = db_binder
+        # Cache of the time of the last record in each binding
+        self.last_stamps = {}
+        # These are not needed unless some file is generated incrementally
+        self._outputs = None
+        self._signature = None
+        self.changed = False
+
+    @property
+    def outputs(self):
+        if self._outputs is None:
+            try:
+                with open(self.path, encoding='utf-8') as fd:
+                    self._outputs = json.load(fd)
+            except (OSError, ValueError):
+                self._outputs = {}
+        return self._outputs
+
+    @property
+    def signature(self):
+        if self._signature is None:
+            self._signature = skin_signature(self.config_dict, self.skin_dict)
+        return self._signature
+
+    def last_stamp(self, binding):
+        if binding not in self.last_stamps:
+            try:
+                self.last_stamps[binding] = self.db_binder.get_manager(binding).lastGoodStamp()
+            except weewx.UnknownBinding:
+                self.last_stamps[binding] = None
+        return self.last_stamps[binding]
+
+    def is_current(self, filename, gen_span):
+        """Return True if the file does not have to be generated again.
+
+        Args:
+            filename (str): Path to the file.
+            gen_span (tuple[float, float]): Start and stop time the file is to be generated for.
+        """
+        entry = self.outputs.get(filename)
+        if not entry or entry['signature'] != self.signature or not entry['latest'] \
+                or not os.path.exists(filename):
+            return False
+        if entry['gen_span'] != list(gen_span):
+            # The file is for a different time. That does not matter, but only if it read
+            # nothing but data from before the start of the day, and it is still the same day.
+            day_start = weeutil.weeutil.startOfDay(gen_span[1])
+            if entry['volatile'] or day_start != entry['day_start'] \
+                    or any(latest > day_start for latest in entry['latest'].values()):
+                return False
+        for binding, latest in entry['latest'].items():
+            last_stamp = self.last_stamp(binding)
+            old_last_stamp = entry['last_stamps'].get(binding)
+            if last_stamp == old_last_stamp:
+                continue
+            # There are new records. They do not matter if they all come after anything
+            # that was read.
+            if last_stamp is None or old_last_stamp is None \
+                    or last_stamp < old_last_stamp or latest > old_last_stamp:
+                return False
+        return True
+
+    def add(self, filename, gen_span, deps):
+        """Remember what a freshly generated file depended on."""
+        self.outputs[filename] = {
+            'signature': self.signature,
+            'gen_span': list(gen_span),
+            'day_start': weeutil.weeutil.startOfDay(gen_span[1]),
+            'latest': deps.latest,
+            'volatile': deps.volatile,
+            'last_stamps': {binding: self.last_stamp(binding) for binding in deps.latest},
+        }
+        self.changed = True
+
+    def save(self):
+        if not self.changed:
+            return
+        tmpname = self.path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmpname, 'w', encoding='utf-8') as fd:
+                json.dump(self.outputs, fd)
+            os.replace(tmpname, self.path)
+        except OSError as e:
+            log.error("Unable to save dependencies to %s: %s", self.path, e)
@@ -27,6 +27,13 @@ class AbstractDevice:
     def genLoopPackets(self):
         raise NotImplementedError("Method 'genLoopPackets' not implemented")
 
+    def genLoopPacketBatches(self):
+        """Generate lists of LOOP packets. Drivers that receive many packets a second should
+        override this to yield the packets that are waiting, all at once. This is only used if
+        option 'loop_batch' is true."""
+        for packet in self.genLoopPackets():
+            yield [packet]
+
     def genArchiveRecords(self, lastgood_ts):
         raise NotImplementedError("Method 'genArchiveRecords' not implemented")
 
@@ -0,0 +1,234 @@
+#
+#    Copyright (c) 2009-2024 Tom Keffer <tkeffer@gmail.com>
+#
+#    See the file LICENSE.txt for your full rights.
+#
+"""Driver that replays recorded LOOP packets, or the records of an archive database.
+
+This is useful to measure how fast the engine can process data, and to reproduce problems.
+The data come from either:
+
+  - A file of LOOP packets, one JSON object per line, such as one written by the service
+    LoopRecorder, below; or
+  - The archive of an existing database. Each archive record is replayed as a LOOP packet.
+    The records are also offered as hardware archive records.
+
+When the data run out, the driver raises weewx.StopNow, which stops the engine.
+
+[Replay]
+    driver = weewx.drivers.replay
+    # Either a file of LOOP packets...
+    file = /var/tmp/packets.json
+    # ... or a database in [Databases]:
+    # database = archive_sqlite
+    # How fast to replay: 0 for as fast as possible, 1 for real time, 10 for ten times real
+    # time, etc.
+    speed = 0
+"""
+
+import json
+import logging
+import os.path
+import time
+
+import weewx.drivers
+import weewx.engine
+from weeutil.weeutil import to_float, to_int
+
+log = logging.getLogger(__name__)
+
+DRIVER_NAME = 'Replay'
+DRIVER_VERSION = "1.0"
+
+
+def loader(config_dict, engine):
+    replay_dict = config_dict[DRIVER_NAME]
+    if replay_dict.get('file'):
+        path = os.path.join(config_dict.get('WEEWX_ROOT', ''), replay_dict['file'])
+        records = FileSource(path)
+    elif replay_dict.get('database'):
+        import weewx.manager
+        db_dict = weewx.manager.get_database_dict_from_config(config_dict,
+                                                              replay_dict['database'])
+        records = DatabaseSource(db_dict, replay_dict.get('table_name', 'archive'))
+    else:
+        raise weewx.ViolatedPrecondition("Replay driver needs either option 'file' "
+                                         "or option 'database'")
+    return Replay(records, **replay_dict)
+
+
+class FileSource:
+    """Reads LOOP packets from a file with one JSON object per line."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = open(path, encoding='utf-8')
+
+    def __iter__(self):
+        for line in self.fd:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+    def genRecords(self, start_ts, stop_ts):
+        raise NotImplementedError("A file of LOOP packets has no archive records")
+
+    def close(self):
+        self.fd.close()
+
+
+class DatabaseSource:
+    """Reads the records of an archive database."""
+
+    def __init__(self, db_dict, table_name='archive'):
+        import weewx.manager
+        self.manager = weewx.manager.Manager.open(db_dict, table_name)
+
+    def __iter__(self):
+        for record in self.manager.genBatchRecords():
+            # A LOOP packet has no interval
+            record.pop('interval', None)
+            yield record
+
+    def genRecords(self, start_ts, stop_ts):
+        return self.manager.genBatchRecords(start_ts, stop_ts)
+
+    def close(self):
+        self.manager.close()
+
+
+class Replay(weewx.drivers.AbstractDevice):
+    """Replays LOOP packets from a source."""
+
+    def __init__(self, source, **stn_dict):
+        """Initialize the replay driver.
+
+        Args:
+            source (FileSource|DatabaseSource): Where the packets come from.
+
+        NAMED ARGUMENTS:
+
+        speed (float): How fast to replay, as a multiple of real time. Zero means as fast as
+            possible. Default is 0.
+
+        max_batch (int): When replaying as fast as possible, and the engine takes packets in
+            batches, how many packets to put in a batch. Default is 50.
+        """
+        self.source = source
+        self.speed = to_float(stn_dict.get('speed', 0))
+        self.max_batch = to_int(stn_dict.get('max_batch', 50))
+        self.packets = iter(source)
+        # Peek at the first packet, so we know the time when we start
+        self.next_packet = next(self.packets, None)
+        if self.next_packet is None:
+            raise weewx.ViolatedPrecondition("No data to replay")
+        self.the_time = self.next_packet['dateTime']
+        self.first_ts = self.the_time
+        # When the first packet was replayed, and when the data ran out
+        self.start_wall_ts = None
+        self.stop_wall_ts = None
+        self.packet_count = 0
+        log.info("Replaying data from %s at %s", getattr(source, 'path', 'the database'),
+                 "%g times real time" % self.speed if self.speed else "full speed")
+
+    def _get_packet(self):
+        """Return the next packet, or None if there are no more."""
+        packet = self.next_packet
+        if packet is None:
+            if self.stop_wall_ts is None:
+                self.stop_wall_ts = time.time()
+            return None
+        self.next_packet = next(self.packets, None)
+        if self.start_wall_ts is None:
+            self.start_wall_ts = time.time()
+        if self.speed:
+            sleep_time = self.start_wall_ts + (packet['dateTime'] - self.first_ts) / self.speed \
+                         - time.time()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+        self.the_time = packet['dateTime']
+        self.packet_count += 1
+        return packet
+
+    def genLoopPackets(self):
+        while True:
+            packet = self._get_packet()
+            if packet is None:
+                raise weewx.StopNow("End of replay data after %d packets" % self.packet_count)
+            yield packet
+
+    def genLoopPacketBatches(self):
+        """When replaying as fast as possible, yield the packets in batches. Otherwise, each
+        batch holds one packet."""
+        batch_size = 1 if self.speed else self.max_batch
+        while True:
+            batch = []
+            while len(batch) < batch_size:
+                packet = self._get_packet()
+                if packet is None:
+                    break
+                batch.append(packet)
+            if batch:
+                yield batch
+            if len(batch) < batch_size:
+                raise weewx.StopNow("End of replay data after %d packets" % self.packet_count)
+
+    def genArchiveRecords(self, lastgood_ts):
+        """Yield the archive records since lastgood_ts, up to the time of the last packet."""
+        return self.source.genRecords(lastgood_ts, self.the_time)
+
+    def getTime(self):
+        return self.the_time
+
+    def closePort(self):
+        self.source.close()
+
+    @property
+    def hardware_name(self):
+        return "Replay"
+
+
+class LoopRecorder(weewx.engine.StdService):
+    """Service that records LOOP packets to a file, so they can be replayed later.
+
+    [LoopRecorder]
+        file = /var/tmp/packets.json
+    """
+
+    def __init__(self, engine, config_dict):
+        super().__init__(engine, config_dict)
+        self.path = os.path.join(config_dict.get('WEEWX_ROOT', ''),
+                                 config_dict['LoopRecorder']['file'])
+        self.fd = open(self.path, 'a', encoding='utf-8')
+        log.info("Recording LOOP packets to %s", self.path)
+        self.bind(weewx.NEW_LOOP_PACKET, self.new_loop_packet)
+
+    def new_loop_packet(self, event):
+        self.fd.write(json.dumps(event.packet) + '\n')
+
+    def shutDown(self):
+        self.fd.close()
+
+
+def confeditor_loader():
+    return ReplayConfEditor()
+
+
+class ReplayConfEditor(weewx.drivers.AbstractConfEditor):
+    @property
+    def default_stanza(self):
+        return """
+[Replay]
+    # This section is for the driver that replays recorded data.
+
+    # A file of LOOP packets, one JSON object per line...
+    file = packets.json
+    # ... or a database in [Databases], whose archive records will be replayed:
+    # database = archive_sqlite
+
+    # How fast to replay: 0 for as fast as possible, 1 for real time, etc.
+    speed = 1
+
+    # The driver to use:
+    driver = weewx.drivers.replay
+"""
@@ -182,6 +182,17 @@ class Simulator(weewx.drivers.AbstractDevice):
                 _packet[obs_type] = self.observations[obs_type].value_at(avg_time)
             yield _packet
 
+    def genLoopPacketBatches(self, max_batch=50):
+        """In generator mode, packets are generated as fast as possible, so yield them in
+        batches. Otherwise, each batch holds one packet."""
+        batch_size = max_batch if self.mode == 'generator' else 1
+        batch = []
+        for packet in self.genLoopPackets():
+            batch.append(packet)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+
     def getTime(self):
         return self.the_time
     
@@ -0,0 +1,87 @@
+#
+#    Copyright (c) 2009-2024 Tom Keffer <tkeffer@gmail.com>
+#
+#    See the file LICENSE.txt for your full rights.
+#
+"""Test the replay driver, and the benchmark that uses it"""
+import json
+
+import configobj
+import pytest
+
+import weeutil.weeutil
+import weewx
+import weewx.benchmark
+import weewx.drivers.replay
+
+PACKETS = [{'dateTime': 1700000000 + 10 * i, 'usUnits': 1, 'outTemp': 20.0 + i}
+           for i in range(7)]
+
+
+@pytest.fixture
+def packet_file(tmp_path):
+    path = tmp_path / 'packets.json'
+    with open(path, 'w') as fd:
+        for packet in PACKETS:
+            fd.write(json.dumps(packet) + '\n')
+    return str(path)
+
+
+def test_replay(packet_file):
+    station = weewx.drivers.replay.Replay(weewx.drivers.replay.FileSource(packet_file))
+    assert station.getTime() == 1700000000
+    packets = []
+    # The engine starts a new generator after each archive period
+    for packet in station.genLoopPackets():
+        packets.append(packet)
+        if len(packets) == 3:
+            break
+    with pytest.raises(weewx.StopNow):
+        for packet in station.genLoopPackets():
+            packets.append(packet)
+    assert packets == PACKETS
+    assert station.getTime() == 1700000060
+    assert station.packet_count == 7
+    with pytest.raises(NotImplementedError):
+        station.genArchiveRecords(None)
+    station.closePort()
+
+
+def test_batches(packet_file):
+    station = weewx.drivers.replay.Replay(weewx.drivers.replay.FileSource(packet_file),
+                                          max_batch=3)
+    batches = []
+    with pytest.raises(weewx.StopNow):
+        for batch in station.genLoopPacketBatches():
+            batches.append(batch)
+    # The last, short, batch is not lost
+    assert batches == [PACKETS[0:3], PACKETS[3:6], PACKETS[6:]]
+
+
+def test_benchmark(tmp_path):
+    with weeutil.weeutil.get_resource_fd('weewx_data', 'weewx.conf') as fd:
+        config_dict = configobj.ConfigObj(fd, encoding='utf-8')
+    config_dict['WEEWX_ROOT'] = str(tmp_path)
+    packet_path = str(tmp_path / 'packets.json')
+    # A little over an hour of simulator data
+    weewx.benchmark.write_simulator_packets(packet_path, 1500)
+
+    run_dir = tmp_path / 'run'
+    run_dir.mkdir()
+    result = weewx.benchmark.run_benchmark(config_dict, {'file': packet_path}, str(run_dir))
+    assert result['packets'] == 1500
+    # Archive interval is 5 minutes. The last, incomplete, period is not archived.
+    assert result['records'] == 12
+    lines = weewx.benchmark.format_service_costs(result)
+    assert any(line.startswith('weewx.engine.StdArchive') for line in lines)
+
+    # Now replay the archive that was just written, in batches
+    config_dict['Databases']['archive_sqlite']['database_name'] = 'benchmark.sdb'
+    config_dict['DatabaseTypes']['SQLite']['SQLITE_ROOT'] = 'run'
+    rerun_dir = tmp_path / 'rerun'
+    rerun_dir.mkdir()
+    result = weewx.benchmark.run_benchmark(config_dict, {'database': 'archive_sqlite'},
+                                           str(rerun_dir), loop_batch=True, profile=False)
+    assert result['packets'] == 12
+    assert 'profile' not in result
+    assert len(weewx.benchmark.format_result(result)) == 3
@@ -2911,14 +2911,16 @@ class VantageConfigurator(weewx.drivers.AbstractConfigurator):
 
                 print("Starting dump ...")
 
-                for record in converted_generator:
-                    archive.addRecord(record)
-                    nrecs += 1
-                    print("Records processed: %d; Timestamp: %s\r"
-                          % (nrecs, weeutil.weeutil.timestamp_to_string(record['dateTime'])),
-                          end=' ',
-                          file=sys.stdout)
-                    sys.stdout.flush()
+                # Let the records share transactions, rather than committing each one:
+                with archive.start_group_commit():
+                    for record in converted_generator:
+                        archive.addRecord(record)
+                        nrecs += 1
+                        print("Records processed: %d; Timestamp: %s\r"
+                              % (nrecs, weeutil.weeutil.timestamp_to_string(record['dateTime'])),
+                              end=' ',
+                              file=sys.stdout)
+                        sys.stdout.flush()
                 print("\nFinished dump. %d records added" % (nrecs,))
         else:
             print("Nothing done.")
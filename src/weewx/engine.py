@@ -7,24 +7,33 @@
 """Main engine for the weewx weather system."""
 
 # Python imports
+import functools
 import gc
+import importlib.util
+import json
 import logging
 import math
+import os.path
+import queue
 import socket
 import sys
 import threading
 import time
 
+import configobj
+
 # weewx imports:
+import weedb
 import weeutil.config
 import weeutil.logger
 import weeutil.weeutil
 import weewx.accum
 import weewx.manager
+import weewx.profiler
 import weewx.qc
 import weewx.station
 import weewx.units
-from weeutil.weeutil import to_bool, to_int, to_sorted_string
+from weeutil.weeutil import to_bool, to_float, to_int, to_sorted_string
 from weewx import all_service_groups
 
 log = logging.getLogger(__name__)
@@ -52,10 +61,15 @@ class StdEngine:
     When a service loads, it binds callbacks to events. When an event occurs,
     the bound callback will be called."""
 
-    def __init__(self, config_dict):
+    def __init__(self, config_dict, startup_profiler=None):
         """Initialize an instance of StdEngine.
         
-        config_dict: The configuration dictionary. """
+        config_dict: The configuration dictionary.
+
+        startup_profiler: An instance of weewx.profiler.StartupProfiler, to time each step of
+        starting up, or None to not do so."""
+
+        self.startup_profiler = startup_profiler
 
         # Set a default socket time out, in case FTP or HTTP hang:
         timeout = int(config_dict.get('socket_timeout', 20))
@@ -63,12 +77,66 @@ class StdEngine:
 
         # Default garbage collection is every 3 hours:
         self.gc_interval = int(config_dict.get('gc_interval', 3 * 3600))
+        # Thresholds for the automatic garbage collection of each generation. The first is
+        # raised from Python's default, so that young objects are collected less often.
+        self.gc_threshold = [int(x) for x in weeutil.weeutil.option_as_list(
+            config_dict.get('gc_threshold', ['10000', '10', '10']))]
+        # Whether to exempt everything loaded at startup from garbage collection
+        self.gc_freeze = to_bool(config_dict.get('gc_freeze', True))
+        if self.gc_freeze and not hasattr(gc, 'freeze'):
+            log.info("Freezing objects at startup is not available before Python 3.7")
+            self.gc_freeze = False
+        self.last_gc_ts = None
+
+        # Whether to log where memory is being allocated
+        tracemalloc_interval = to_int(config_dict.get('tracemalloc_interval', 0))
+        if tracemalloc_interval:
+            self.alloc_tracker = weewx.profiler.AllocationTracker(
+                interval=tracemalloc_interval,
+                top=to_int(config_dict.get('tracemalloc_top', 10)),
+                frames=to_int(config_dict.get('tracemalloc_frames', 1)))
+        else:
+            self.alloc_tracker = None
 
         # Whether to log events. This can be very verbose.
         self.log_events = to_bool(config_dict.get('log_events', False))
 
+        # Whether to measure how long each callback takes
+        if to_bool(config_dict.get('profile_dispatch', False)):
+            loop_budget = to_float(config_dict.get('loop_budget', 1.0))
+            self.profiler = weewx.profiler.DispatchProfiler(
+                log_interval=to_float(config_dict.get('profile_interval', 3600)),
+                loop_budget=loop_budget or None,
+                profile_file=os.path.join(config_dict.get('WEEWX_ROOT', ''),
+                                          config_dict.get('profile_file',
+                                                          'archive/dispatch_profile.json')))
+        else:
+            self.profiler = None
+
+        # Whether to get LOOP packets from the driver in batches, if it can supply them
+        self.loop_batch = to_bool(config_dict.get('loop_batch', False))
+        # How to deliver a batch of LOOP packets to the services. Worked out when needed.
+        self._batch_plan = None
+
+        # Instance of weewx.metrics.Metrics, if the service StdMetrics is running
+        self.metrics = None
+
+        # The configuration. It can be reloaded without restarting the engine.
+        self.config_dict = config_dict
+        # Set by request_reload() to have the configuration reloaded at the next LOOP packet
+        self.reload_requested = False
+        # Whether to reload the configuration file when it changes
+        self.watch_config = to_bool(config_dict.get('watch_config', False))
+        self.config_mtime = self._get_config_mtime()
+        self.config_check_ts = time.time()
+
         # The callback dictionary:
         self.callbacks = dict()
+        # Key is the id of a service, value is a list of (event_type, callback) tuples it has
+        # bound. Callbacks that were not bound by a service are under key None.
+        self.service_bindings = {}
+        # The service being loaded
+        self._loading = None
 
         # This will hold an instance of the device driver
         self.console = None
@@ -79,11 +147,16 @@ class StdEngine:
         # Set up the device driver:
         self.setupStation(config_dict)
 
+        if self.loop_batch and not hasattr(self.console, 'genLoopPacketBatches'):
+            log.info("Driver cannot supply LOOP packets in batches. Batching not done.")
+            self.loop_batch = False
+
         # Set up information about the station
         self.stn_info = weewx.station.StationInfo(self.console, **config_dict['Station'])
 
-        # The list of instantiated services
+        # The list of instantiated services, and their names in the configuration file
         self.service_obj = []
+        self.service_names = []
 
         # Load the services:
         self.loadServices(config_dict)
@@ -101,7 +174,8 @@ class StdEngine:
         log.info("Loading station type %s (%s)", station_type, driver)
 
         # Import the driver:
-        __import__(driver)
+        with self.timing('import', driver):
+            __import__(driver)
 
         # Open up the weather station, wrapping it in a try block in case
         # of failure.
@@ -112,7 +186,8 @@ class StdEngine:
             # Find the function 'loader' within the module:
             loader_function = getattr(driver_module, 'loader')
             # Call it with the configuration dictionary as the only argument:
-            self.console = loader_function(config_dict, self)
+            with self.timing('driver', driver):
+                self.console = loader_function(config_dict, self)
         except Exception as ex:
             log.error("Import of driver failed: %s (%s)", ex, type(ex))
             weeutil.logger.log_traceback(log.critical, "    ****  ")
@@ -122,48 +197,39 @@ class StdEngine:
     def loadServices(self, config_dict):
         """Set up the services to be run."""
 
-        # Make sure all service groups are lists (if there's just a single entry, ConfigObj
-        # will parse it as a string if it did not have a trailing comma).
-        for service_group in config_dict['Engine']['Services']:
-            if not isinstance(config_dict['Engine']['Services'][service_group], list):
-                config_dict['Engine']['Services'][service_group] \
-                    = [config_dict['Engine']['Services'][service_group]]
-
-        # Versions before v4.2 did not have the service group 'xtype_services'. Set a default
-        # for them:
-        config_dict['Engine']['Services'].setdefault('xtype_services',
-                                                     ['weewx.wxxtypes.StdWXXTypes',
-                                                      'weewx.wxxtypes.StdPressureCooker',
-                                                      'weewx.wxxtypes.StdRainRater',
-                                                      'weewx.wxxtypes.StdDelta'])
-
         # Wrap the instantiation of the services in a try block, so if an
         # exception occurs, any service that may have started can be shut
         # down in an orderly way.
         try:
-            # Go through each of the service lists one by one:
-            for service_group in all_service_groups:
-                # For each service list, retrieve all the listed services.
-                # Provide a default, empty list in case the service list is
-                # missing completely:
-                svcs = config_dict['Engine']['Services'].get(service_group, [])
-                for svc in svcs:
-                    if svc == '':
-                        log.debug("No services in service group %s", service_group)
-                        continue
-                    log.debug("Loading service %s", svc)
-                    # Get the class, then instantiate it with self and the config dictionary as
-                    # arguments:
-                    obj = weeutil.weeutil.get_object(svc)(self, config_dict)
-                    # Append it to the list of open services.
-                    self.service_obj.append(obj)
-                    log.debug("Finished loading service %s", svc)
+            for svc in service_list(config_dict):
+                obj = self._load_service(svc, config_dict)
+                # Append it to the list of open services.
+                self.service_obj.append(obj)
+                self.service_names.append(svc)
         except Exception:
             # An exception occurred. Shut down any running services, then
             # reraise the exception.
             self.shutDown()
             raise
 
+    def _load_service(self, svc, config_dict):
+        """Instantiate a service, keeping track of the callbacks it binds."""
+        log.debug("Loading service %s", svc)
+        # Get the class, then instantiate it with self and the config dictionary as
+        # arguments:
+        with self.timing('import', svc):
+            service_class = weeutil.weeutil.get_object(svc)
+        self._loading = service_class
+        try:
+            with self.timing('service', svc):
+                obj = service_class(self, config_dict)
+        finally:
+            bindings = self.service_bindings.pop(id(service_class), [])
+            self._loading = None
+        self.service_bindings.setdefault(id(obj), []).extend(bindings)
+        log.debug("Finished loading service %s", svc)
+        return obj
+
     def run(self):
         """Main execution entry point."""
 
@@ -173,21 +239,13 @@ class StdEngine:
             # Send out a STARTUP event:
             self.dispatchEvent(weewx.Event(weewx.STARTUP))
 
-            log.info("Starting main packet loop.")
+            self.setup_gc()
 
-            last_gc = time.time()
+            log.info("Starting main packet loop.")
 
             # This is the outer loop. 
             while True:
 
-                # See if garbage collection is scheduled:
-                if time.time() - last_gc > self.gc_interval:
-                    gc_start = time.time()
-                    ngc = gc.collect()
-                    last_gc = time.time()
-                    gc_time = last_gc - gc_start
-                    log.info("Garbage collected %d objects in %.2f seconds", ngc, gc_time)
-
                 # First, let any interested services know the packet LOOP is
                 # about to start
                 self.dispatchEvent(weewx.Event(weewx.PRE_LOOP))
@@ -201,13 +259,49 @@ class StdEngine:
                     # generate LOOP packets until some service breaks it by
                     # throwing an exception (usually when an archive period
                     # has passed).
-                    for packet in self.console.genLoopPackets():
-                        # Package the packet as an event, then dispatch it.
-                        self.dispatchEvent(weewx.Event(weewx.NEW_LOOP_PACKET, packet=packet))
-
-                        # Allow services to break the loop by throwing
-                        # an exception:
-                        self.dispatchEvent(weewx.Event(weewx.CHECK_LOOP, packet=packet))
+                    if self.loop_batch:
+                        for packets in self.console.genLoopPacketBatches():
+                            if self.startup_profiler:
+                                # Startup is done
+                                self.startup_profiler.log_summary()
+                                self.startup_profiler = None
+
+                            # This will also allow services to break the loop.
+                            t0 = time.perf_counter()
+                            try:
+                                self.dispatchLoopBatch(packets)
+                            finally:
+                                if self.metrics is not None:
+                                    self.metrics.add_loop(len(packets),
+                                                          time.perf_counter() - t0)
+
+                            if self.reload_requested \
+                                    or self.watch_config and self._config_changed():
+                                self.reload()
+                    else:
+                        for packet in self.console.genLoopPackets():
+                            if self.startup_profiler:
+                                # Startup is done
+                                self.startup_profiler.log_summary()
+                                self.startup_profiler = None
+
+                            t0 = time.perf_counter()
+                            try:
+                                # Package the packet as an event, then dispatch it.
+                                self.dispatchEvent(weewx.Event(weewx.NEW_LOOP_PACKET,
+                                                               packet=packet))
+
+                                # Allow services to break the loop by throwing
+                                # an exception:
+                                self.dispatchEvent(weewx.Event(weewx.CHECK_LOOP,
+                                                               packet=packet))
+                            finally:
+                                if self.metrics is not None:
+                                    self.metrics.add_loop(1, time.perf_counter() - t0)
+
+                            if self.reload_requested \
+                                    or self.watch_config and self._config_changed():
+                                self.reload()
 
                     log.critical("Internal error. Packet loop has exited.")
 
@@ -216,11 +310,39 @@ class StdEngine:
                     # Send out an event saying the packet LOOP is done:
                     self.dispatchEvent(weewx.Event(weewx.POST_LOOP))
 
+                    # The archive record has been dealt with, and the next LOOP packet is
+                    # some time away. This is the time to do any housekeeping.
+                    self.collect_garbage()
+                    if self.alloc_tracker:
+                        self.alloc_tracker.check()
+
         finally:
             # The main loop has exited. Shut the engine down.
             log.info("Main loop exiting. Shutting engine down.")
             self.shutDown()
 
+    def setup_gc(self):
+        """Tune the garbage collector for a long-running program. Everything that exists
+        by now is likely to stay, so it is frozen: later collections will not have to look
+        at it."""
+        gc.set_threshold(*self.gc_threshold)
+        if self.gc_freeze:
+            gc.collect()
+            gc.freeze()
+            log.debug("Froze %d objects", gc.get_freeze_count())
+        self.last_gc_ts = time.time()
+
+    def collect_garbage(self):
+        """Do a full garbage collection, if one is due."""
+        if time.time() - self.last_gc_ts > self.gc_interval:
+            gc_start = time.time()
+            ngc = gc.collect()
+            self.last_gc_ts = time.time()
+            gc_time = self.last_gc_ts - gc_start
+            log.info("Garbage collected %d objects in %.2f seconds", ngc, gc_time)
+            if self.metrics is not None:
+                self.metrics.add_gc(ngc, gc_time)
+
     def bind(self, event_type, callback):
         """Binds an event to a callback function."""
 
@@ -229,25 +351,245 @@ class StdEngine:
         # otherwise append to the existing list:
         self.callbacks.setdefault(event_type, []).append(callback)
 
+        # Remember who bound it, so the callbacks can be put back together after a reload
+        owner = self._loading or getattr(callback, '__self__', None)
+        key = id(owner) if owner is not None else None
+        self.service_bindings.setdefault(key, []).append((event_type, callback))
+
     def dispatchEvent(self, event):
         """Call all registered callbacks for an event."""
         # See if any callbacks have been registered for this event type:
         if event.event_type in self.callbacks:
             if self.log_events:
                 log.debug(event)
+            if self.startup_profiler:
+                self.startup_profiler.dispatch(event, self.callbacks[event.event_type])
+                return
+            if self.profiler:
+                self.profiler.dispatch(event, self.callbacks[event.event_type])
+                return
             # Yes, at least one has been registered. Call them in order:
             for callback in self.callbacks[event.event_type]:
                 # Call the function with the event as an argument:
                 callback(event)
 
+    def dispatchLoopBatch(self, packets):
+        """Dispatch a batch of LOOP packets.
+
+        A service with a method new_loop_packets() gets the whole batch in one call, in place
+        of its NEW_LOOP_PACKET callbacks. The other callbacks get an event for each packet, as
+        usual. Either way, a service sees a packet only after the services before it have
+        seen it. Then a CHECK_LOOP event is dispatched for each packet, in order.
+
+        packets: A list of LOOP packets."""
+        if self.profiler or self.log_events:
+            # Profile and log the packets one at a time, the same as without batching
+            for packet in packets:
+                self.dispatchEvent(weewx.Event(weewx.NEW_LOOP_PACKET, packet=packet))
+                self.dispatchEvent(weewx.Event(weewx.CHECK_LOOP, packet=packet))
+            return
+
+        if self._batch_plan is None:
+            self._batch_plan = self._loop_batch_plan()
+        events = [weewx.Event(weewx.NEW_LOOP_PACKET, packet=packet) for packet in packets]
+        for batch, func in self._batch_plan:
+            if batch:
+                packets = [event.packet for event in events]
+                func(packets)
+                # The service may have replaced some packets
+                for event, packet in zip(events, packets):
+                    event.packet = packet
+            else:
+                for event in events:
+                    func(event)
+
+        for event in events:
+            self.dispatchEvent(weewx.Event(weewx.CHECK_LOOP, packet=event.packet))
+
+    def _loop_batch_plan(self):
+        """Work out how to deliver a batch of LOOP packets to the NEW_LOOP_PACKET callbacks.
+
+        Returns a list of (batch, function) tuples, in dispatch order. If batch is True,
+        the function takes a list of packets, otherwise it takes an event."""
+        plan = []
+        batched = set()
+        for callback in self.callbacks.get(weewx.NEW_LOOP_PACKET, []):
+            # Callbacks of asynchronous services are wrapped, so they have no __self__, and
+            # will get their packets one at a time.
+            service = getattr(callback, '__self__', None)
+            batch_fn = getattr(service, 'new_loop_packets', None)
+            if batch_fn is None:
+                plan.append((False, callback))
+            elif id(service) not in batched:
+                batched.add(id(service))
+                plan.append((True, batch_fn))
+        return plan
+
+    def request_reload(self):
+        """Have the configuration reloaded after the next LOOP packet. Safe to call from a
+        signal handler."""
+        self.reload_requested = True
+
+    def reload(self, config_dict=None):
+        """Reload the configuration, then re-create the services whose configuration has
+        changed. The driver and the database connections are kept. A re-created service can
+        take over the state of the old instance, such as the accumulator of StdArchive.
+
+        config_dict: The new configuration dictionary, or None to read the configuration file
+        again."""
+        self.reload_requested = False
+        self.config_mtime = self._get_config_mtime()
+
+        if config_dict is None:
+            config_path = self.config_dict.get('config_path')
+            if not config_path:
+                log.error("Configuration file unknown. Unable to reload.")
+                return
+            try:
+                import weecfg
+                _, config_dict = weecfg.read_config(config_path)
+            except (OSError, configobj.ConfigObjError) as e:
+                log.error("Unable to reload configuration file %s: %s", config_path, e)
+                return
+        new_names = service_list(config_dict)
+
+        changed = changed_sections(self.config_dict, config_dict)
+        if not changed and new_names == self.service_names:
+            log.info("Configuration has not changed")
+            return
+        log.info("Reloading configuration. Changed: %s", ', '.join(sorted(changed)) or 'none')
+
+        # The driver, the databases, and engine options are set up once, so changes to them
+        # need a restart.
+        restart = {'Station', self.config_dict['Station'].get('station_type'), 'Engine',
+                   'DataBindings', 'Databases', 'DatabaseTypes', 'Logging'}
+        restart.update(key for key in changed
+                       if not isinstance(self.config_dict.get(key, config_dict.get(key)), dict))
+        for key in sorted(changed & restart):
+            log.warning("Changes to '%s' need a restart. Not applied.", key)
+        changed -= restart
+        if not changed and new_names == self.service_names:
+            return
+
+        old_services = list(zip(self.service_names, self.service_obj))
+        new_services = []
+        started = []
+        for name in new_names:
+            # Find the old instance, if any
+            for i, (old_name, old) in enumerate(old_services):
+                if old_name == name:
+                    del old_services[i]
+                    break
+            else:
+                old = None
+
+            # A service that does not say which sections it uses is kept as it is. Otherwise,
+            # it would lose its state on every reload.
+            sections = getattr(old, 'config_sections', None)
+            if old is not None and (sections is None or not changed.intersection(sections)):
+                new_services.append((name, old))
+                continue
+
+            try:
+                obj = self._load_service(name, config_dict)
+            except Exception as e:
+                log.error("Unable to load service %s: %s", name, e)
+                weeutil.logger.log_traceback(log.error, "    ****  ")
+                if old is not None:
+                    log.error("    ****  Keeping the running instance")
+                    new_services.append((name, old))
+                continue
+
+            if old is None:
+                log.info("Started service %s", name)
+                started.append(obj)
+            else:
+                log.info("Re-created service %s", name)
+                if hasattr(old, 'stop_worker'):
+                    old.stop_worker()
+                if getattr(type(obj), 'take_over', StdService.take_over) \
+                        is StdService.take_over:
+                    # Nothing was taken over from the old instance, so start from scratch
+                    started.append(obj)
+                else:
+                    obj.take_over(old)
+                self._shut_down_service(old)
+            new_services.append((name, obj))
+
+        # Shut down services that are no longer in the list
+        for name, old in old_services:
+            log.info("Stopped service %s", name)
+            self._shut_down_service(old)
+
+        self.service_names = [name for name, _ in new_services]
+        self.service_obj = [obj for _, obj in new_services]
+        self.config_dict = config_dict
+
+        # Put the callbacks back together, in service order. Any that were not bound by a
+        # service go last.
+        self.callbacks = dict()
+        keys = [id(obj) for obj in self.service_obj]
+        keys += [key for key in self.service_bindings if key not in keys]
+        for key in keys:
+            for event_type, callback in self.service_bindings.get(key, []):
+                self.callbacks.setdefault(event_type, []).append(callback)
+        self._batch_plan = None
+
+        # New services, and those that did not take over from an old instance, missed the
+        # STARTUP event.
+        for obj in started:
+            for event_type, callback in self.service_bindings.get(id(obj), []):
+                if event_type == weewx.STARTUP:
+                    callback(weewx.Event(weewx.STARTUP))
+
+    def _shut_down_service(self, obj):
+        """Shut down a single service, and forget its callbacks."""
+        try:
+            if hasattr(obj, 'stop_worker'):
+                obj.stop_worker()
+            obj.shutDown()
+        except Exception as e:
+            log.error("Error while shutting down %s: %s", type(obj).__name__, e)
+        self.service_bindings.pop(id(obj), None)
+
+    def _get_config_mtime(self):
+        try:
+            return os.path.getmtime(self.config_dict['config_path'])
+        except (KeyError, OSError):
+            return None
+
+    def _config_changed(self):
+        """Return True if the configuration file has been modified. Checked at most every 10
+        seconds."""
+        now = time.time()
+        if now - self.config_check_ts < 10:
+            return False
+        self.config_check_ts = now
+        return self._get_config_mtime() != self.config_mtime
+
     def shutDown(self):
         """Run when an engine shutdown is requested."""
 
+        if self.profiler:
+            self.profiler.log_summary()
+            self.profiler.save()
+
+        if self.alloc_tracker:
+            self.alloc_tracker.stop()
+            self.alloc_tracker = None
+
+        # If the engine gets restarted, the old services should not stay frozen
+        if self.gc_freeze and self.last_gc_ts:
+            gc.unfreeze()
+
         # Shut down all the services
         while self.service_obj:
             # Wrap each individual service shutdown, in case of a problem.
             try:
-                # Start from the end of the list and move forward
+                # Start from the end of the list and move forward. Let any asynchronous
+                # service finish what is in its queue first.
+                if hasattr(self.service_obj[-1], 'stop_worker'):
+                    self.service_obj[-1].stop_worker()
                 self.service_obj[-1].shutDown()
             except:
                 pass
@@ -265,6 +607,12 @@ class StdEngine:
         except:
             pass
 
+    def timing(self, step, name):
+        """Return a context manager that times a step of starting up, if profiling."""
+        if self.startup_profiler:
+            return self.startup_profiler.timing(step, name)
+        return weeutil.weeutil.null_context()
+
     def _get_console_time(self):
         try:
             return self.console.getTime()
@@ -272,6 +620,51 @@ class StdEngine:
             return int(time.time() + 0.5)
 
 
+def service_list(config_dict):
+    """Return the names of the services to be run, in order."""
+
+    # Make sure all service groups are lists (if there's just a single entry, ConfigObj
+    # will parse it as a string if it did not have a trailing comma).
+    for service_group in config_dict['Engine']['Services']:
+        if not isinstance(config_dict['Engine']['Services'][service_group], list):
+            config_dict['Engine']['Services'][service_group] \
+                = [config_dict['Engine']['Services'][service_group]]
+
+    # Versions before v4.2 did not have the service group 'xtype_services'. Set a default
+    # for them:
+    config_dict['Engine']['Services'].setdefault('xtype_services',
+                                                 ['weewx.wxxtypes.StdWXXTypes',
+                                                  'weewx.wxxtypes.StdPressureCooker',
+                                                  'weewx.wxxtypes.StdRainRater',
+                                                  'weewx.wxxtypes.StdDelta'])
+
+    svcs = []
+    # Go through each of the service lists one by one:
+    for service_group in all_service_groups:
+        # Provide a default, empty list in case the service list is missing completely:
+        for svc in config_dict['Engine']['Services'].get(service_group, []):
+            if svc == '':
+                log.debug("No services in service group %s", service_group)
+                continue
+            svcs.append(svc)
+    return svcs
+
+
+def changed_sections(old_dict, new_dict):
+    """Return the set of top-level keys whose value differs between two configuration
+    dictionaries. The list of services in [Engine] is not included."""
+    changed = set()
+    for key in set(old_dict) | set(new_dict):
+        old_val = old_dict.get(key)
+        new_val = new_dict.get(key)
+        if key == 'Engine':
+            old_val = {k: v for k, v in (old_val or {}).items() if k != 'Services'}
+            new_val = {k: v for k, v in (new_val or {}).items() if k != 'Services'}
+        if old_val != new_val:
+            changed.add(key)
+    return changed
+
+
 # ==============================================================================
 #                    Class DummyEngine
 # ==============================================================================
@@ -300,21 +693,169 @@ class DummyEngine(StdEngine):
 # ==============================================================================
 
 class StdService:
-    """Abstract base class for all services."""
+    """Abstract base class for all services.
+
+    A service that only consumes data can declare itself asynchronous, either by setting the
+    class attribute 'asynchronous' to True, or by being listed in option 'async_services' in
+    section [Engine]. Its callbacks for the event types in 'async_event_types' will then be run
+    by a worker thread, so they cannot stall the main loop.
+    """
+
+    # Whether the callbacks of this service should be run by a worker thread
+    asynchronous = False
+    # The worker thread, if any
+    _worker = None
+    # The top-level sections of the configuration that the service uses. If any of them
+    # change when the configuration is reloaded, the service is re-created. None means they
+    # are not known, so the service is left as it is.
+    config_sections = None
 
     def __init__(self, engine, config_dict):
         self.engine = engine
         self.config_dict = config_dict
+        engine_dict = config_dict.get('Engine', {})
+        async_services = weeutil.weeutil.option_as_list(engine_dict.get('async_services', []))
+        if "%s.%s" % (type(self).__module__, type(self).__name__) in async_services:
+            self.asynchronous = True
 
     def bind(self, event_type, callback):
         """Bind the specified event to a callback."""
-        # Just forward the request to the main engine:
+        if self.asynchronous and event_type in async_event_types:
+            if not self._worker:
+                engine_dict = self.config_dict.get('Engine', {})
+                self._worker = ServiceWorker(
+                    type(self).__name__,
+                    max_queue=to_int(engine_dict.get('async_queue_size', 100)),
+                    overflow=engine_dict.get('async_overflow', 'drop_oldest'))
+                self._worker.start()
+            callback = self._worker.wrap(callback)
+        # Forward the request to the main engine:
         self.engine.bind(event_type, callback)
 
+    def stop_worker(self, timeout=10):
+        """Wait for the worker thread, if any, to finish what is in its queue, then stop it."""
+        if self._worker:
+            self._worker.stop(timeout)
+            self._worker = None
+
+    def take_over(self, old):
+        """Called when the configuration has been reloaded, and this service replaces 'old',
+        an instance of the same class. Take over any state that should survive the reload.
+        A service that does not override this gets the STARTUP event instead."""
+        pass
+
     def shutDown(self):
         pass
 
 
+# Event types that can be delivered to a service asynchronously. The others are used to
+# control the main loop and the console, so they must be delivered synchronously.
+async_event_types = {weewx.NEW_LOOP_PACKET, weewx.END_ARCHIVE_PERIOD, weewx.NEW_ARCHIVE_RECORD}
+
+
+class ServiceWorker(threading.Thread):
+    """Thread that runs the callbacks of an asynchronous service, in the order they were
+    queued."""
+
+    overflow_policies = ('drop_oldest', 'drop_newest', 'block')
+
+    def __init__(self, name, max_queue=100, overflow='drop_oldest'):
+        """Initialize an instance of ServiceWorker.
+
+        Args:
+            name (str): The name of the service.
+            max_queue (int): The most events allowed to wait in the queue.
+            overflow (str): What to do when the queue is full. One of 'drop_oldest' (discard
+                the oldest event in the queue), 'drop_newest' (discard the new event), or
+                'block' (wait for room in the queue).
+        """
+        super().__init__(name="%s-worker" % name, daemon=True)
+        if overflow not in ServiceWorker.overflow_policies:
+            raise ValueError("Unknown overflow policy '%s' for service %s" % (overflow, name))
+        self.queue = queue.Queue(max_queue)
+        self.overflow = overflow
+        # How many events have been dropped
+        self.dropped = 0
+        # Set once the worker has been asked to stop. The lock makes sure no event can drop the
+        # None that tells the worker to stop.
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+
+    def wrap(self, callback):
+        """Return a function that queues the event for the callback, instead of calling it."""
+
+        @functools.wraps(callback)
+        def enqueue(event):
+            self.put(callback, snapshot_event(event))
+
+        return enqueue
+
+    def put(self, callback, event):
+        # Events that come in once the worker is stopping are not handled
+        if self.stopping.is_set():
+            return
+        if self.overflow == 'block':
+            self.queue.put((callback, event))
+            return
+        with self.lock:
+            if self.stopping.is_set():
+                return
+            while True:
+                try:
+                    self.queue.put_nowait((callback, event))
+                    return
+                except queue.Full:
+                    self.dropped += 1
+                    if self.dropped == 1 or self.dropped % 100 == 0:
+                        log.warning("%s: queue is full. %d event(s) dropped so far",
+                                    self.name, self.dropped)
+                    if self.overflow == 'drop_newest':
+                        return
+                    # Make room by dropping the oldest event, then try again
+                    try:
+                        self.queue.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            # A None signals that it is time to stop
+            if item is None:
+                return
+            callback, event = item
+            try:
+                callback(event)
+            except Exception as e:
+                log.error("%s: caught exception %s (%s)", self.name, type(e).__name__, e)
+                weeutil.logger.log_traceback(log.error, "    ****  ")
+
+    def stop(self, timeout=10):
+        """Let the worker finish the events in its queue, then stop it."""
+        # Once this is set, put() drops nothing more from the queue, so the None goes in
+        # around the overflow policy, and stays there.
+        with self.lock:
+            self.stopping.set()
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            log.error("%s: unable to stop worker thread", self.name)
+            return
+        self.join(timeout)
+        if self.is_alive():
+            log.error("%s: worker thread did not stop after %s seconds", self.name, timeout)
+
+
+def snapshot_event(event):
+    """Return a copy of an event, with copies of its packet or record, so changes made by
+    later services do not show through to an asynchronous service."""
+    copy = weewx.Event(event.event_type)
+    for key, value in vars(event).items():
+        if key != 'event_type':
+            setattr(copy, key, dict(value) if isinstance(value, dict) else value)
+    return copy
+
+
 # ==============================================================================
 #                    Class StdConvert
 # ==============================================================================
@@ -328,6 +869,8 @@ class StdConvert(StdService):
     This service should be run before most of the others, so observations appear
     in the correct unit."""
 
+    config_sections = ('StdConvert',)
+
     def __init__(self, engine, config_dict):
         # Initialize my base class:
         super().__init__(engine, config_dict)
@@ -398,6 +941,8 @@ class StdCalibrate(StdService):
     archive records if software record generation is being done.
     """
 
+    config_sections = ('StdCalibrate',)
+
     def __init__(self, engine, config_dict):
         # Initialize my base class:
         super().__init__(engine, config_dict)
@@ -429,40 +974,57 @@ class StdCalibrate(StdService):
                 if val not in ('loop', 'archive'):
                     raise ValueError(f"Invalid directive for StdCalibrate: {val}")
 
+        # Sort the corrections by where they apply, so that does not have to be worked out for
+        # every packet. Each is a list of (obs_type, code) tuples.
+        self.loop_corrections = []
+        self.archive_corrections = []
+        self.hardware_corrections = []
+        for obs_type, code in self.corrections.items():
+            # If no directives were specified (self.which is empty), then always do the correction
+            # in LOOP packets. If a directive has been specified, do the correction if 'loop' is in
+            # the directive.
+            if len(self.which[obs_type]) == 0 or 'loop' in self.which[obs_type]:
+                self.loop_corrections.append((obs_type, code))
+            # If a record was software-generated, then the correction has presumably been
+            # already applied in the LOOP packet. So, unless told otherwise, do not do the
+            # correction again.
+            if 'archive' in self.which[obs_type]:
+                self.archive_corrections.append((obs_type, code))
+            if len(self.which[obs_type]) == 0 or 'archive' in self.which[obs_type]:
+                self.hardware_corrections.append((obs_type, code))
+        # The globals used when evaluating a correction
+        self.globals = {'math': math}
+
         self.bind(weewx.NEW_LOOP_PACKET, self.new_loop_packet)
         self.bind(weewx.NEW_ARCHIVE_RECORD, self.new_archive_record)
 
     def new_loop_packet(self, event):
         """Apply a calibration correction to a LOOP packet"""
-        for obs_type in self.corrections:
-            # If no directives were specified (self.which is empty), then always do the correction.
-            # If a directive has been specified, do the correction if 'loop' is in the directive.
-            if len(self.which[obs_type]) == 0 or 'loop' in self.which[obs_type]:
-                try:
-                    event.packet[obs_type] = eval(self.corrections[obs_type], {'math': math},
-                                                  event.packet)
-                except (TypeError, NameError) as e:
-                    if weewx.debug >= 2:
-                        log.debug("StdCalibrate type or name error in LOOP packet: %s", e)
-                except ValueError as e:
-                    log.error("StdCalibrate value error in LOOP packet %s", e)
+        packet = event.packet
+        for obs_type, code in self.loop_corrections:
+            try:
+                packet[obs_type] = eval(code, self.globals, packet)
+            except (TypeError, NameError) as e:
+                if weewx.debug >= 2:
+                    log.debug("StdCalibrate type or name error in LOOP packet: %s", e)
+            except ValueError as e:
+                log.error("StdCalibrate value error in LOOP packet %s", e)
 
     def new_archive_record(self, event):
         """Apply a calibration correction to an archive packet"""
-        for obs_type in self.corrections:
-            # If a record was software-generated, then the correction has presumably been
-            # already applied in the LOOP packet. So, unless told otherwise, do not do the
-            # correction again.
-            if ((len(self.which[obs_type]) == 0 and event.origin != 'software')
-                    or 'archive' in self.which[obs_type]):
-                try:
-                    event.record[obs_type] = eval(self.corrections[obs_type], {'math': math},
-                                                  event.record)
-                except (TypeError, NameError) as e:
-                    if weewx.debug >= 2:
-                        log.debug("StdCalibrate type or name error in archive record: %s", e)
-                except ValueError as e:
-                    log.error("StdCalibrate value error in archive record: %s", e)
+        record = event.record
+        if event.origin == 'software':
+            corrections = self.archive_corrections
+        else:
+            corrections = self.hardware_corrections
+        for obs_type, code in corrections:
+            try:
+                record[obs_type] = eval(code, self.globals, record)
+            except (TypeError, NameError) as e:
+                if weewx.debug >= 2:
+                    log.debug("StdCalibrate type or name error in archive record: %s", e)
+            except ValueError as e:
+                log.error("StdCalibrate value error in archive record: %s", e)
 
 
 # ==============================================================================
@@ -477,6 +1039,8 @@ class StdQC(StdService):
     overheads of running it as a weewx service.
     """
 
+    config_sections = ('StdQC',)
+
     def __init__(self, engine, config_dict):
         super().__init__(engine, config_dict)
 
@@ -501,6 +1065,12 @@ class StdQC(StdService):
 
         self.qc.apply_qc(event.packet, 'LOOP')
 
+    def new_loop_packets(self, packets):
+        """Apply quality check to a batch of loop packets"""
+
+        for packet in packets:
+            self.qc.apply_qc(packet, 'LOOP')
+
     def new_archive_record(self, event):
         """Apply quality check to the data in an archive record"""
 
@@ -518,6 +1088,11 @@ class StdArchive(StdService):
     # averages of LOOP packets over an archive period. At the end of the
     # archive period it then emits an archive record.
 
+    config_sections = ('StdArchive', 'Accumulator')
+
+    # The maximum number of records buffered during a catchup before they are added
+    catchup_batch_size = 1000
+
     def __init__(self, engine, config_dict):
         super().__init__(engine, config_dict)
 
@@ -532,6 +1107,17 @@ class StdArchive(StdService):
         self.record_augmentation = to_bool(archive_dict.get('record_augmentation', True))
         self.log_success = to_bool(weeutil.config.search_up(archive_dict, 'log_success', True))
         self.log_failure = to_bool(weeutil.config.search_up(archive_dict, 'log_failure', True))
+        self.checkpoint_interval = to_int(archive_dict.get('checkpoint_interval', 0))
+        self.checkpoint_file = os.path.join(config_dict.get('WEEWX_ROOT', ''),
+                                            archive_dict.get('checkpoint_file',
+                                                             'archive/checkpoint.json'))
+        # Time of the last checkpoint
+        self.checkpoint_ts = time.time()
+        self.background_backfill = to_bool(archive_dict.get('background_backfill', False))
+        # The thread doing the backfill, if it is being done in the background
+        self.backfill_thread = None
+        # Records waiting to be added to the database during a catchup. None if not catching up.
+        self.catchup_records = None
 
         log.info("Archive will use data binding %s", self.data_binding)
         log.info("Record generation will be attempted in '%s'", self.record_generation)
@@ -545,6 +1131,9 @@ class StdArchive(StdService):
         # The accumulator that was used for the last archive period. Set to None after it has
         # been processed.
         self.old_accumulator = None
+        # Accumulators for any earlier archive periods that ended in the same batch of LOOP
+        # packets as the old accumulator, oldest first. They are processed along with it.
+        self.pending_accumulators = []
 
         if self.record_generation == 'software':
             self.archive_interval = software_interval
@@ -576,6 +1165,9 @@ class StdArchive(StdService):
             log.warning("Archive delay (%d) is unusually long", self.archive_delay)
 
         log.debug("Use LOOP data in hi/low calculations: %d", self.loop_hilo)
+        if self.checkpoint_interval:
+            log.info("Checkpoint every %d seconds to %s",
+                     self.checkpoint_interval, self.checkpoint_file)
 
         weewx.accum.initialize(config_dict)
 
@@ -594,14 +1186,31 @@ class StdArchive(StdService):
         dbmanager = self.engine.db_binder.get_manager(self.data_binding, initialize=True)
         log.info("Using binding '%s' to database '%s'", self.data_binding, dbmanager.database_name)
 
+        # Pick up where the last run left off
+        if self.checkpoint_interval:
+            self.restore_checkpoint()
+
         # Make sure the daily summaries have not been partially updated
         if dbmanager._read_metadata('lastWeightPatch'):
             raise weewx.ViolatedPrecondition("Update of daily summary for database '%s' not"
                                              " complete. Finish the update first."
                                              % dbmanager.database_name)
 
-        # Backfill the daily summaries.
-        _nrecs, _ndays = dbmanager.backfill_day_summary()
+        # Backfill the daily summaries, either now, or in the background.
+        if self.background_backfill and dbmanager.first_timestamp is not None \
+                and (dbmanager.last_update is None
+                     or dbmanager.last_update < dbmanager.last_timestamp):
+            if dbmanager.last_update is None:
+                # The daily summaries have never been backfilled. Say that they include nothing,
+                # so they are not used until the backfill gets to them.
+                with weedb.Transaction(dbmanager.connection) as cursor:
+                    dbmanager._write_metadata('lastUpdate', '0', cursor)
+            dbmanager.backfill_pending = True
+            self.backfill_thread = BackfillThread(self.config_dict, self.data_binding,
+                                                  finish_fn=self._finish_backfill)
+            self.backfill_thread.start()
+        else:
+            _nrecs, _ndays = dbmanager.backfill_day_summary()
 
         # Do a catch-up on any data still on the station, but not yet put in the database.
         if self.no_catchup:
@@ -644,6 +1253,51 @@ class StdArchive(StdService):
             # Try again:
             self.accumulator.addRecord(event.packet, add_hilo=self.loop_hilo)
 
+        # Is it time for a checkpoint?
+        if self.checkpoint_interval \
+                and time.time() - self.checkpoint_ts >= self.checkpoint_interval:
+            self.save_checkpoint()
+
+    def new_loop_packets(self, packets):
+        """Called with a batch of LOOP packets, in place of new_loop_packet().
+
+        Runs of packets that have the same observation types, and fall in the same archive
+        interval, are added to the accumulator in one go."""
+        i = 0
+        while i < len(packets):
+            packet = packets[i]
+            if not self.accumulator:
+                self.accumulator = self._new_accumulator(packet['dateTime'])
+            elif not self.accumulator.timespan.includesArchiveTime(packet['dateTime']):
+                # A batch can span more than one archive period. Hold on to any accumulator
+                # that has not been processed yet.
+                if self.old_accumulator:
+                    self.pending_accumulators.append(self.old_accumulator)
+                # Shuffle accumulators:
+                (self.old_accumulator, self.accumulator) = \
+                    (self.accumulator, self._new_accumulator(packet['dateTime']))
+
+            # Find the end of the run
+            keys = packet.keys()
+            j = i + 1
+            while j < len(packets) and packets[j].keys() == keys \
+                    and self.accumulator.timespan.includesArchiveTime(packets[j]['dateTime']):
+                j += 1
+
+            if j - i == 1:
+                self.accumulator.addRecord(packet, add_hilo=self.loop_hilo)
+            else:
+                run = packets[i:j]
+                self.accumulator.addRecords({obs_type: [p[obs_type] for p in run]
+                                             for obs_type in keys},
+                                            add_hilo=self.loop_hilo)
+            i = j
+
+        # Is it time for a checkpoint?
+        if self.checkpoint_interval \
+                and time.time() - self.checkpoint_ts >= self.checkpoint_interval:
+            self.save_checkpoint()
+
     def check_loop(self, event):
         """Called after any loop packets have been processed. This is the opportunity
         to break the main loop by throwing an exception."""
@@ -667,22 +1321,32 @@ class StdArchive(StdService):
         # the archive interval and the end of the archive delay period, then
         # there will be no old accumulator. Check for this.
         if self.old_accumulator:
-            # If the user has requested software generation, then do that:
-            if self.record_generation == 'software':
-                self._software_catchup()
-            elif self.record_generation == 'hardware':
-                # Otherwise, try to honor hardware generation. An exception
-                # will be raised if the console does not support it. In that
-                # case, fall back to software generation.
-                try:
-                    self._catchup(self.engine.console.genArchiveRecords)
-                except NotImplementedError:
+            # Process any accumulators from earlier in a batch of LOOP packets first.
+            for accumulator in self.pending_accumulators + [self.old_accumulator]:
+                # Processing the accumulator, and the archive record that comes of it, works on
+                # the old accumulator
+                self.old_accumulator = accumulator
+                # If the user has requested software generation, then do that:
+                if self.record_generation == 'software':
                     self._software_catchup()
-            else:
-                raise ValueError("Unknown station record generation value %s"
-                                 % self.record_generation)
+                elif self.record_generation == 'hardware':
+                    # Otherwise, try to honor hardware generation. An exception
+                    # will be raised if the console does not support it. In that
+                    # case, fall back to software generation.
+                    try:
+                        self._catchup(self.engine.console.genArchiveRecords)
+                    except NotImplementedError:
+                        self._software_catchup()
+                else:
+                    raise ValueError("Unknown station record generation value %s"
+                                     % self.record_generation)
+            self.pending_accumulators = []
             self.old_accumulator = None
 
+        # Let go of a background backfill that is done
+        if self.backfill_thread and not self.backfill_thread.is_alive():
+            self.backfill_thread = None
+
         # Set the time of the next break loop:
         self.end_archive_delay_ts = self.end_archive_period_ts + self.archive_delay
 
@@ -699,11 +1363,128 @@ class StdArchive(StdService):
                 and event.origin != 'software':
             self.old_accumulator.augmentRecord(event.record)
 
+        if self.catchup_records is not None:
+            # During a catchup, records are added to the database in batches. This is done
+            # outside any event dispatch, so no transaction is held open while other services
+            # see the record.
+            self.catchup_records.append(event.record)
+            if len(self.catchup_records) >= StdArchive.catchup_batch_size:
+                self._add_catchup_records()
+        else:
+            self._add_records(event.record)
+
+    def _add_records(self, records):
+        """Add a record, or a list of records, to the archive database."""
+        dbmanager = self.engine.db_binder.get_manager(self.data_binding)
+        with self._backfill_lock():
+            t0 = time.perf_counter()
+            dbmanager.addRecord(records,
+                                accumulator=self.old_accumulator,
+                                log_success=self.log_success,
+                                log_failure=self.log_failure)
+            if self.engine.metrics is not None:
+                self.engine.metrics.add_archive_write(time.perf_counter() - t0)
+
+    def _add_catchup_records(self):
+        """Add any records buffered during a catchup to the database."""
+        records, self.catchup_records = self.catchup_records, []
+        if records:
+            self._add_records(records)
+
+    def _backfill_lock(self):
+        """Return a context manager that keeps writes to the database out of the way of any
+        background backfill. Otherwise, the two could deadlock in the database."""
+        if self.backfill_thread:
+            return self.backfill_thread.lock
+        return weeutil.weeutil.null_context()
+
+    def _finish_backfill(self, last_update):
+        """Called by the background backfill, while it holds its lock, once it has caught up
+        with every record in the database. Go back to updating the daily summaries as records
+        are added."""
+        dbmanager = self.engine.db_binder.get_manager(self.data_binding)
+        dbmanager.last_update = last_update
+        dbmanager.backfill_pending = False
+
+    def shutDown(self):
+        # Stop any background backfill. It will pick up where it left off on the next start.
+        if self.backfill_thread:
+            self.backfill_thread.stop()
+            self.backfill_thread = None
+        # Save the current state, so it can be picked up when we restart
+        if self.checkpoint_interval:
+            self.save_checkpoint()
+
+    def take_over(self, old):
+        """Carry on with the accumulators of the old instance, and any background backfill."""
+        if self.archive_interval != old.archive_interval:
+            log.warning("A new archive interval needs a restart. Keeping %d seconds",
+                        old.archive_interval)
+            self.archive_interval = old.archive_interval
+        self.end_archive_period_ts = old.end_archive_period_ts
+        self.end_archive_delay_ts = old.end_archive_delay_ts
+        self.accumulator = old.accumulator
+        self.old_accumulator = old.old_accumulator
+        self.pending_accumulators = old.pending_accumulators
+        self.backfill_thread, old.backfill_thread = old.backfill_thread, None
+
+    def get_checkpoint(self):
+        """Return the state to be saved in a checkpoint. Any service can take part in a
+        checkpoint by offering methods get_checkpoint() and set_checkpoint()."""
+        return self.accumulator.get_state() if self.accumulator else None
+
+    def set_checkpoint(self, state):
+        """Restore the accumulator from a checkpoint, provided it is for the current archive
+        interval."""
+        if not state:
+            return
+        accumulator = weewx.accum.Accum.from_state(state)
+        now = self.engine._get_console_time()
+        if not accumulator.timespan.includesArchiveTime(now):
+            log.info("Checkpoint for interval %s has expired", accumulator.timespan)
+            return
         dbmanager = self.engine.db_binder.get_manager(self.data_binding)
-        dbmanager.addRecord(event.record,
-                            accumulator=self.old_accumulator,
-                            log_success=self.log_success,
-                            log_failure=self.log_failure)
+        if dbmanager.std_unit_system not in (None, accumulator.unit_system):
+            log.info("Checkpoint uses a different unit system from the database. Ignored.")
+            return
+        self.accumulator = accumulator
+        log.info("Restored accumulator for interval %s", accumulator.timespan)
+
+    def save_checkpoint(self):
+        """Save the state of all services that take part in checkpoints."""
+        self.checkpoint_ts = time.time()
+        checkpoint = {'dateTime': self.checkpoint_ts,
+                      'services': {type(svc).__name__: svc.get_checkpoint()
+                                   for svc in self.engine.service_obj
+                                   if hasattr(svc, 'get_checkpoint')}}
+        # Write to a temporary file, then rename it, so a crash cannot leave a partial file
+        tmp_path = self.checkpoint_file + '.tmp'
+        try:
+            with open(tmp_path, 'w') as fd:
+                json.dump(checkpoint, fd, separators=(',', ':'))
+            os.replace(tmp_path, self.checkpoint_file)
+        except (OSError, TypeError, ValueError) as e:
+            log.error("Unable to save checkpoint to %s: %s", self.checkpoint_file, e)
+
+    def restore_checkpoint(self):
+        """Restore the state of all services that take part in checkpoints."""
+        try:
+            with open(self.checkpoint_file) as fd:
+                checkpoint = json.load(fd)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log.error("Unable to read checkpoint from %s: %s", self.checkpoint_file, e)
+            return
+        log.info("Restoring checkpoint saved at %s",
+                 weeutil.weeutil.timestamp_to_string(checkpoint['dateTime']))
+        for svc in self.engine.service_obj:
+            state = checkpoint['services'].get(type(svc).__name__)
+            if state is not None and hasattr(svc, 'set_checkpoint'):
+                try:
+                    svc.set_checkpoint(state)
+                except (KeyError, TypeError, ValueError) as e:
+                    log.error("Unable to restore checkpoint for %s: %s", type(svc).__name__, e)
 
     def _catchup(self, generator):
         """Pull any unarchived records off the console and archive them.
@@ -715,6 +1496,9 @@ class StdArchive(StdService):
         # Find out when the database was last updated.
         lastgood_ts = dbmanager.lastGoodStamp()
 
+        # A long catchup can involve thousands of records. Rather than committing each one
+        # individually, buffer them and add them in batches.
+        self.catchup_records = []
         try:
             # Now ask the console for any new records since then. Not all
             # consoles support this feature. Note that for some consoles,
@@ -733,6 +1517,12 @@ class StdArchive(StdService):
         except weewx.HardwareError as e:
             log.error("Internal error detected. Catchup abandoned")
             log.error("**** %s" % e)
+        finally:
+            # Records that made it through the services before any error still get added.
+            try:
+                self._add_catchup_records()
+            finally:
+                self.catchup_records = None
 
     def _software_catchup(self):
         # Extract a record out of the old accumulator. 
@@ -754,6 +1544,56 @@ class StdArchive(StdService):
         return new_accumulator
 
 
+# ==============================================================================
+#                    Class BackfillThread
+# ==============================================================================
+
+class BackfillThread(threading.Thread):
+    """Backfills the daily summaries in the background, a day per transaction, so the engine
+    can collect data in the meantime."""
+
+    def __init__(self, config_dict, data_binding, trans_days=1, finish_fn=None):
+        super().__init__(name='BackfillThread', daemon=True)
+        self.config_dict = config_dict
+        self.data_binding = data_binding
+        self.trans_days = trans_days
+        # Called with the time of the last record in the daily summaries, once they include
+        # every record in the database
+        self.finish_fn = finish_fn
+        self.stop_event = threading.Event()
+        # Held by the backfill during each transaction. Other threads should hold it while
+        # writing to the database.
+        self.lock = threading.RLock()
+
+    def run(self):
+        try:
+            # The thread needs its own connection to the database
+            with weewx.manager.open_manager_with_config(self.config_dict,
+                                                        self.data_binding) as dbmanager:
+                dbmanager.backfill_day_summary(progress_fn=None,
+                                               trans_days=self.trans_days,
+                                               abort_fn=self.stop_event.is_set,
+                                               lock=self.lock)
+                if self.stop_event.is_set():
+                    return
+                # Catch up with the records added since the backfill started. No more can be
+                # added while the lock is held.
+                with self.lock:
+                    dbmanager._sync()
+                    dbmanager.backfill_day_summary(progress_fn=None)
+                    if self.finish_fn:
+                        self.finish_fn(dbmanager.last_update)
+        except Exception as e:
+            log.error("Background backfill of daily summaries failed: %s", e)
+            weeutil.logger.log_traceback(log.error, "    ****  ")
+            log.error("    ****  It will be done again on the next start")
+
+    def stop(self):
+        """Stop the backfill at the end of the current transaction."""
+        self.stop_event.set()
+        self.join()
+
+
 # ==============================================================================
 #                    Class StdTimeSynch
 # ==============================================================================
@@ -761,6 +1601,8 @@ class StdArchive(StdService):
 class StdTimeSynch(StdService):
     """Regularly asks the station to synch up its clock."""
 
+    config_sections = ('StdTimeSynch',)
+
     def __init__(self, engine, config_dict):
         super().__init__(engine, config_dict)
 
@@ -816,6 +1658,10 @@ class StdPrint(StdService):
     """Service that prints diagnostic information when a LOOP
     or archive packet is received."""
 
+    # Printing can be slow, and does not change anything, so do it in a worker thread
+    asynchronous = True
+    config_sections = ()
+
     def __init__(self, engine, config_dict):
         super().__init__(engine, config_dict)
 
@@ -842,19 +1688,22 @@ class StdPrint(StdService):
 class StdReport(StdService):
     """Launches a separate thread to do reporting."""
 
+    config_sections = ('StdReport',)
+
     def __init__(self, engine, config_dict):
         super().__init__(engine, config_dict)
         self.max_wait = int(config_dict['StdReport'].get('max_wait', 600))
+        # Whether to run the reports in a long-lived process, rather than a new thread each time
+        self.report_process = to_bool(config_dict['StdReport'].get('report_process', False))
         self.thread = None
         self.launch_time = None
         self.record = None
 
-        # check if pyephem is installed and make a suitable log entry
-        try:
-            import ephem
+        # check if pyephem is installed and make a suitable log entry. Find it, rather than
+        # import it, so as not to slow down startup.
+        if importlib.util.find_spec('ephem'):
             log.info("'pyephem' detected, extended almanac data is available")
-            del ephem
-        except ImportError:
+        else:
             log.info("'pyephem' not detected, extended almanac data is not available")
 
         self.bind(weewx.NEW_ARCHIVE_RECORD, self.new_archive_record)
@@ -879,6 +1728,10 @@ class StdReport(StdService):
                 log.warning("Previous report thread has been running"
                             " %s seconds.  Launching report thread anyway.", thread_age)
 
+        if self.report_process:
+            self.launch_report_process()
+            return
+
         try:
             self.thread = weewx.reportengine.StdReportEngine(self.config_dict,
                                                              self.engine.stn_info,
@@ -890,8 +1743,29 @@ class StdReport(StdService):
             log.error("Unable to launch report thread.")
             self.thread = None
 
+    def launch_report_process(self):
+        """Tell the report process to run the reports, starting it first if need be."""
+        import weewx.reportengine
+        if self.thread and not self.thread.is_running():
+            log.error("Report process has died. Starting a new one.")
+            self.thread.close()
+            self.thread = None
+        if not self.thread:
+            self.thread = weewx.reportengine.ReportProcess(self.config_dict,
+                                                           self.engine.stn_info)
+        elif self.thread.busy:
+            # It was still running the reports. Start over with a new one.
+            self.thread.close(timeout=0)
+            self.thread = weewx.reportengine.ReportProcess(self.config_dict,
+                                                           self.engine.stn_info)
+        self.thread.start(self.record, first_run=not self.launch_time)
+        self.launch_time = time.time()
+
     def shutDown(self):
-        if self.thread:
+        if self.report_process and self.thread:
+            log.info("Shutting down StdReport process")
+            self.thread.close()
+        elif self.thread:
             log.info("Shutting down StdReport thread")
             self.thread.join(20.0)
             if self.thread.is_alive():
@@ -15,6 +15,8 @@ import weeplot.genplot
 import weeplot.utilities
 import weeutil.logger
 import weeutil.weeutil
+import weewx.dependencies
+import weewx.profiler
 import weewx.reportengine
 import weewx.units
 import weewx.xtypes
@@ -32,9 +34,14 @@ log = logging.getLogger(__name__)
 class ImageGenerator(weewx.reportengine.ReportGenerator):
     """Class for managing the image generator."""
 
+    # Images depend only on the database, so they can be generated alongside the other
+    # generators in the report pool
+    waits_for = None
+
     def run(self):
         self.setup()
         self.gen_images(self.gen_ts)
+        self.depends.save()
 
     def setup(self):
         # generic_dict will contain "generic" labels, such as "Outside Temperature"
@@ -52,6 +59,11 @@ class ImageGenerator(weewx.reportengine.ReportGenerator):
             self.config_dict['WEEWX_ROOT'],
             self.skin_dict['SKIN_ROOT'],
             self.skin_dict['skin'])
+        # What the images generated incrementally depended on, the last time
+        self.depends = weewx.dependencies.DependencyFile(
+            os.path.join(self.config_dict['WEEWX_ROOT'], self.skin_dict['HTML_ROOT'],
+                         '#%s.image.depends' % self.skin_dict['REPORT_NAME']),
+            self.config_dict, self.skin_dict, self.db_binder)
 
     def gen_images(self, gen_ts):
         """Generate the images.
@@ -96,29 +108,44 @@ class ImageGenerator(weewx.reportengine.ReportGenerator):
                 if _skip_this_plot(plotgen_ts, plot_options, img_file):
                     continue
 
-                # Generate the plot.
-                plot = self.gen_plot(plotgen_ts,
-                                     plot_options,
-                                     self.image_dict[timespan][plotname])
-
-                # 'plot' will be None if skip_if_empty was truthy, and the plot contains no data
-                if plot:
-                    # We have a valid plot. Render it onto an image
-                    image = plot.render()
-
-                    # Create the subdirectory that the image is to be put in. Wrap in a try block
-                    # in case it already exists.
-                    try:
-                        os.makedirs(os.path.dirname(img_file))
-                    except OSError:
-                        pass
-
-                    try:
-                        # Now save the image
-                        image.save(img_file)
-                        ngen += 1
-                    except IOError as e:
-                        log.error("Unable to save to file '%s' %s:", img_file, e)
+                # If the plot is generated incrementally, it can be skipped if none of the data
+                # it uses have changed.
+                incremental = to_bool(plot_options.get('incremental', False))
+                time_length = weeutil.weeutil.nominal_spans(plot_options.get('time_length',
+                                                                             86400))
+                gen_span = (plotgen_ts - time_length, plotgen_ts)
+                if incremental and self.depends.is_current(img_file, gen_span):
+                    log.debug("Skip '%s': the data it uses have not changed", img_file)
+                    continue
+
+                with weewx.profiler.report_timing('image', '%s.png' % plotname):
+                    # Generate the plot.
+                    with weewx.dependencies.track() as deps:
+                        plot = self.gen_plot(plotgen_ts,
+                                             plot_options,
+                                             self.image_dict[timespan][plotname])
+
+                    # 'plot' will be None if skip_if_empty was truthy, and the plot contains no
+                    # data
+                    if plot:
+                        # We have a valid plot. Render it onto an image
+                        image = plot.render()
+
+                        # Create the subdirectory that the image is to be put in. Wrap in a try
+                        # block in case it already exists.
+                        try:
+                            os.makedirs(os.path.dirname(img_file))
+                        except OSError:
+                            pass
+
+                        try:
+                            # Now save the image
+                            image.save(img_file)
+                            ngen += 1
+                            if incremental:
+                                self.depends.add(img_file, gen_span, deps)
+                        except IOError as e:
+                            log.error("Unable to save to file '%s' %s:", img_file, e)
 
         t2 = time.time()
 
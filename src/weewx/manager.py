@@ -56,6 +56,7 @@ Example:
 
 """
 import datetime
+import functools
 import logging
 import os.path
 import sys
@@ -76,6 +77,76 @@ class IntervalError(ValueError):
     """Raised when a bad value of 'interval' is encountered."""
 
 
+# ==============================================================================
+#                         class GroupCommit
+# ==============================================================================
+
+class GroupCommit:
+    """Context manager that lets consecutive calls to Manager.addRecord() share a single
+    transaction. Use Manager.start_group_commit() to get one.
+
+    The transaction is committed, and a new one started, when either max_records have been added,
+    or max_time seconds have passed, whichever comes first. This bounds both the amount of work
+    that could be lost, and how long other connections wait to see the new data.
+    """
+
+    # Defaults:
+    max_records = 1000
+    max_time = 10.0
+
+    def __init__(self, manager, max_records=None, max_time=None):
+        self.manager = manager
+        self.max_records = GroupCommit.max_records if max_records is None else max_records
+        self.max_time = GroupCommit.max_time if max_time is None else max_time
+        self.cursor = None
+        self.nrecs = 0
+        self.start_ts = None
+
+    def __enter__(self):
+        if self.manager.group_commit is not None:
+            raise weewx.ViolatedPrecondition("Group commit already in progress on database '%s'"
+                                             % self.manager.database_name)
+        self.cursor = self.manager.connection.cursor()
+        self._begin()
+        self.manager.group_commit = self
+        return self
+
+    def __exit__(self, etyp, einst, etb):  # @UnusedVariable
+        self.manager.group_commit = None
+        try:
+            if etyp is None:
+                self.manager.connection.commit()
+            else:
+                self.manager.connection.rollback()
+                # The cached timestamps may include records that were just rolled back.
+                if self.nrecs:
+                    self.manager._sync()
+        finally:
+            try:
+                self.cursor.close()
+            except weedb.DatabaseError:
+                pass
+            self.cursor = None
+
+    def mark(self, nrecs):
+        """Note that nrecs records have been added. Commit if a limit has been reached."""
+        self.nrecs += nrecs
+        if self.nrecs >= self.max_records or time.time() - self.start_ts >= self.max_time:
+            self.flush()
+
+    def flush(self):
+        """Commit what has been added so far, then start a new transaction."""
+        self.manager.connection.commit()
+        log.debug("Group commit of %d records to database '%s'",
+                  self.nrecs, self.manager.database_name)
+        self._begin()
+
+    def _begin(self):
+        self.manager.connection.begin()
+        self.nrecs = 0
+        self.start_ts = time.time()
+
+
 # ==============================================================================
 #                         class Manager
 # ==============================================================================
@@ -97,8 +168,11 @@ class Manager:
         last_timestamp (int): The timestamp of the last record in the table.
         std_unit_system (int): The unit system used by the database table.
         sqlkeys (list[str]): A list of the SQL keys that the database table supports.
+        data_binding (str|None): The binding the manager was opened with by a DBBinder, if any.
     """
 
+    data_binding = None
+
     def __init__(self, connection, table_name='archive', schema=None):
         """Initialize an object of type Manager.
 
@@ -120,6 +194,8 @@ class Manager:
         self.first_timestamp = None
         self.last_timestamp = None
         self.std_unit_system = None
+        # Set to an instance of GroupCommit while a group commit is in progress:
+        self.group_commit = None
 
         # Now get the SQL types.
         try:
@@ -384,32 +460,17 @@ class Manager:
         # something iterable (a list):
         record_list = [record_obj] if isinstance(record_obj, dict) else record_obj
 
-        min_ts = float('inf')  # A "big number"
-        max_ts = 0
-        N = 0
-        with weedb.Transaction(self.connection) as cursor:
-
-            for record in record_list:
-                try:
-                    # If the accumulator time matches the record we are working with,
-                    # use it to update the highs and lows.
-                    if accumulator and record['dateTime'] == accumulator.timespan.stop:
-                        self._updateHiLo(accumulator, cursor)
-
-                    # Then add the record to the archives:
-                    self._addSingleRecord(record, cursor, log_success, log_failure, update)
-
-                    N += 1
-                    if progress_fn and N % 1000 == 0:
-                        progress_fn(record['dateTime'], N)
-
-                    min_ts = min(min_ts, record['dateTime'])
-                    max_ts = max(max_ts, record['dateTime'])
-                except (weedb.IntegrityError, weedb.OperationalError) as e:
-                    if log_failure:
-                        log.error("Unable to add record %s to database '%s': %s",
-                                  timestamp_to_string(record['dateTime']),
-                                  self.database_name, e)
+        if self.group_commit is not None:
+            # A group commit is in progress. Use its transaction, then give it a chance to commit.
+            N, min_ts, max_ts = self._addRecords(record_list, self.group_commit.cursor,
+                                                 accumulator, progress_fn,
+                                                 log_success, log_failure, update)
+            self.group_commit.mark(N)
+        else:
+            with weedb.Transaction(self.connection) as cursor:
+                N, min_ts, max_ts = self._addRecords(record_list, cursor,
+                                                     accumulator, progress_fn,
+                                                     log_success, log_failure, update)
 
         # Update the cached timestamps. This has to sit outside the transaction context,
         # in case an exception occurs.
@@ -420,6 +481,65 @@ class Manager:
 
         return N
 
+    def _addRecords(self, record_list, cursor, accumulator, progress_fn,
+                    log_success, log_failure, update):
+        """Internal function for adding an iterable of records using an open cursor.
+
+        Returns:
+            tuple[int, float, float]: A 3-way tuple (N, min_ts, max_ts), where N is the number
+                of successful insertions, and min_ts and max_ts are the smallest and largest
+                timestamps seen.
+        """
+        min_ts = float('inf')  # A "big number"
+        max_ts = 0
+        N = 0
+        for record in record_list:
+            try:
+                # If the accumulator time matches the record we are working with,
+                # use it to update the highs and lows.
+                if accumulator and record['dateTime'] == accumulator.timespan.stop:
+                    self._updateHiLo(accumulator, cursor)
+
+                # Then add the record to the archives:
+                self._addSingleRecord(record, cursor, log_success, log_failure, update)
+
+                N += 1
+                if progress_fn and N % 1000 == 0:
+                    progress_fn(record['dateTime'], N)
+
+                min_ts = min(min_ts, record['dateTime'])
+                max_ts = max(max_ts, record['dateTime'])
+            except (weedb.IntegrityError, weedb.OperationalError) as e:
+                if log_failure:
+                    log.error("Unable to add record %s to database '%s': %s",
+                              timestamp_to_string(record['dateTime']),
+                              self.database_name, e)
+        return N, min_ts, max_ts
+
+    def start_group_commit(self, max_records=None, max_time=None):
+        """Let consecutive calls to addRecord() share a single transaction.
+
+        Each call to addRecord() normally runs in its own transaction, so every record pays for
+        its own commit. Within a group commit, the records are committed together, either when
+        max_records have been added, or when max_time seconds have passed since the start of the
+        transaction, whichever comes first. Any remainder is committed when the group ends.
+
+        Example:
+            with dbmanager.start_group_commit():
+                for record in generator:
+                    dbmanager.addRecord(record)
+
+        Args:
+            max_records (int|None): Commit after this many records have been added.
+                Default is GroupCommit.max_records (1000).
+            max_time (float|None): Commit after this many seconds have passed.
+                Default is GroupCommit.max_time (10 seconds).
+
+        Returns:
+            GroupCommit: A context manager. Use it in a 'with' clause.
+        """
+        return GroupCommit(self, max_records, max_time)
+
     def _addSingleRecord(self, record, cursor, log_success=True, log_failure=True, update=False):
         """Internal function for adding a single record to the main archive table."""
 
@@ -757,6 +877,7 @@ class DBBinder:
                                                         data_binding,
                                                         default_binding_dict=defaults)
             self.manager_cache[data_binding] = open_manager(manager_dict, initialize)
+            self.manager_cache[data_binding].data_binding = data_binding
 
         return self.manager_cache[data_binding]
 
@@ -1063,6 +1184,10 @@ class DaySummaryManager(Manager):
 
         self.version = None
         self.daykeys = None
+        self.last_update = None
+        # Set to True while the daily summaries are being backfilled by someone else. Until then,
+        # records are added only to the main archive table.
+        self.backfill_pending = False
         DaySummaryManager._create_sync(self)
         self.patch_sums()
 
@@ -1091,6 +1216,8 @@ class DaySummaryManager(Manager):
         if self.version is None:
             self.version = '1.0'
         log.debug('Daily summary version is %s', self.version)
+        # The time of the last record included in the daily summaries
+        self.last_update = to_int(self._read_metadata('lastUpdate'))
 
     def _sync(self):
         super()._sync()
@@ -1171,6 +1298,9 @@ class DaySummaryManager(Manager):
         # First let my superclass handle adding the record to the main archive table:
         super()._addSingleRecord(record, cursor, log_success, log_failure, update)
 
+        if self.backfill_pending:
+            return
+
         # Get the start of day for the record:
         _sod_ts = weeutil.weeutil.startOfArchiveDay(record['dateTime'])
 
@@ -1193,9 +1323,92 @@ class DaySummaryManager(Manager):
                      timestamp_to_string(record['dateTime']),
                      self.database_name)
 
+    def _addRecords(self, record_list, cursor, accumulator, progress_fn,
+                    log_success, log_failure, update):
+        """Specialized version that updates the daily summaries a batch at a time, rather than
+        a record at a time. A batch is a run of records from the same day, with the same keys.
+        """
+
+        if accumulator is not None or self.backfill_pending:
+            # Updating the highs and lows from the accumulator has to be interleaved with adding
+            # the records. Do them one at a time.
+            return super()._addRecords(record_list, cursor, accumulator, progress_fn,
+                                       log_success, log_failure, update)
+
+        min_ts = float('inf')  # A "big number"
+        max_ts = 0
+        N = 0
+        batch_key = None
+        batch = []
+        weights = []
+        for record in record_list:
+            try:
+                # Add the record to the main archive table...
+                Manager._addSingleRecord(self, record, cursor, log_success, log_failure, update)
+            except (weedb.IntegrityError, weedb.OperationalError) as e:
+                if log_failure:
+                    log.error("Unable to add record %s to database '%s': %s",
+                              timestamp_to_string(record['dateTime']),
+                              self.database_name, e)
+                continue
+
+            N += 1
+            if progress_fn and N % 1000 == 0:
+                progress_fn(record['dateTime'], N)
+            min_ts = min(min_ts, record['dateTime'])
+            max_ts = max(max_ts, record['dateTime'])
+
+            # ... then add it to the batch for the daily summary. Get the weight. If the value
+            # for 'interval' is bad, an exception will be raised.
+            try:
+                weight = self._calc_weight(record)
+            except IntervalError as e:
+                # Bad value for interval. Ignore this record
+                if log_failure:
+                    log.info(e)
+                    log.info('*** record ignored')
+                continue
+
+            key = (weeutil.weeutil.startOfArchiveDay(record['dateTime']), tuple(record))
+            if key != batch_key:
+                self._add_day_batch(batch, weights, cursor, log_success)
+                batch_key = key
+                batch = []
+                weights = []
+            batch.append(record)
+            weights.append(weight)
+
+        self._add_day_batch(batch, weights, cursor, log_success)
+
+        return N, min_ts, max_ts
+
+    def _add_day_batch(self, batch, weights, cursor, log_success=True):
+        """Add a batch of records to the daily summary. All records must be from the same day,
+        and have the same keys."""
+        if not batch:
+            return
+
+        # Get the start of day for the batch:
+        _sod_ts = weeutil.weeutil.startOfArchiveDay(batch[0]['dateTime'])
+        # Convert to column-oriented form:
+        columns = {obs_type: [record[obs_type] for record in batch] for obs_type in batch[0]}
+
+        # Now add to the daily summary for the appropriate day:
+        _day_summary = self._get_day_summary(_sod_ts, cursor)
+        _day_summary.addRecords(columns, weights=weights)
+        self._set_day_summary(_day_summary, batch[-1]['dateTime'], cursor)
+        if log_success:
+            for record in batch:
+                log.info("Added record %s to daily summary in '%s'",
+                         timestamp_to_string(record['dateTime']),
+                         self.database_name)
+
     def _updateHiLo(self, accumulator, cursor):
         """Use the contents of an accumulator to update the daily hi/lows."""
 
+        if self.backfill_pending:
+            return
+
         # Get the start-of-day for the timespan in the accumulator
         _sod_ts = weeutil.weeutil.startOfArchiveDay(accumulator.timespan.stop)
 
@@ -1263,7 +1476,7 @@ class DaySummaryManager(Manager):
         return first_d, last_d + datetime.timedelta(days=1)
 
     def backfill_day_summary(self, start_d=None, stop_d=None, progress_fn=show_progress,
-                             trans_days=5, key_set=None):
+                             trans_days=5, key_set=None, abort_fn=None, lock=None):
         """Backfill the daily summaries from the archive data.
 
         Usually, the daily summaries are automatically updated as archive data is added,
@@ -1287,6 +1500,10 @@ class DaySummaryManager(Manager):
                 database transaction. [Optional. Default is 5.]
             key_set (set|None): If not None, only the observation types in this set
                 will be calculated.
+            abort_fn (function|None): If not None, this function will be called before each
+                transaction. If it returns True, the backfill stops. It can be resumed later.
+            lock (threading.Lock|None): If not None, this lock will be held during each
+                transaction, so other threads can keep their writes out of the way.
 
         Returns:
              tuple[int,int]: A 2-way tuple (nrecs, ndays) where
@@ -1300,7 +1517,7 @@ class DaySummaryManager(Manager):
             log.info("Empty database")
             return 0, 0
 
-        last_daily_ts = to_int(self._read_metadata('lastUpdate'))
+        last_daily_ts = self.last_update = to_int(self._read_metadata('lastUpdate'))
         first_d, last_d = self._get_backfill_range(last_daily_ts, start_d, stop_d, key_set)
 
         if first_d is None:
@@ -1314,45 +1531,36 @@ class DaySummaryManager(Manager):
         mark_d = first_d
 
         while mark_d < last_d:
+            if abort_fn and abort_fn():
+                log.info("Backfill of daily summaries stopped")
+                break
             # Each iteration is a transaction. Calculate its last date
             stop_transaction = min(mark_d + tranche_days, last_d)
             start_batch_ts = time.mktime(mark_d.timetuple())
             stop_batch_ts = time.mktime(stop_transaction.timetuple())
-            day_accum = None
 
-            with weedb.Transaction(self.connection) as cursor:
-                for rec in self.genBatchRecords(start_batch_ts, stop_batch_ts):
-                    # Manage day accumulators. Start a new one if necessary.
-                    if not day_accum or not day_accum.timespan.includesArchiveTime(rec['dateTime']):
-                        if day_accum:
-                            self._set_day_summary(day_accum, None, cursor, key_set=key_set)
-                            ndays += 1
-                        timespan = weeutil.weeutil.archiveDaySpan(rec['dateTime'])
-                        day_accum = weewx.accum.Accum(timespan)
-
-                    try:
-                        weight = self._calc_weight(rec)
-                        day_accum.addRecord(rec, weight=weight)
-                    except IntervalError as e:
-                        # Ignore records with bad values for 'interval'
-                        log.info(e)
-                        log.info('***  ignored.')
-                        continue
+            with lock or weeutil.weeutil.null_context(), \
+                    weedb.Transaction(self.connection) as cursor:
+                # Add the records a day at a time.
+                for day_span, columns, weights in self._genDayColumns(start_batch_ts,
+                                                                      stop_batch_ts,
+                                                                      self._calc_weight,
+                                                                      by_interval=True):
+                    day_accum = weewx.accum.Accum(day_span)
+                    day_accum.addRecords(columns, weights=weights)
+                    self._set_day_summary(day_accum, None, cursor, key_set=key_set)
+                    ndays += 1
 
                     # Track last daily timestamp
+                    last_ts = max(columns['dateTime'])
                     if last_daily_ts is None:
-                        last_daily_ts = rec['dateTime']
+                        last_daily_ts = last_ts
                     else:
-                        last_daily_ts = max(last_daily_ts, rec['dateTime'])
-                    nrecs += 1
-                    if progress_fn and nrecs % 1000 == 0:
-                        progress_fn(rec['dateTime'], nrecs)
-
-                # We're done with this transaction. Unless it is empty, save the daily summary for
-                # the last day
-                if day_accum and not day_accum.isEmpty:
-                    self._set_day_summary(day_accum, None, cursor, key_set=key_set)
-                    ndays += 1
+                        last_daily_ts = max(last_daily_ts, last_ts)
+                    if progress_fn and (nrecs + len(weights)) // 1000 > nrecs // 1000:
+                        progress_fn(columns['dateTime'][-1], nrecs + len(weights))
+                    nrecs += len(weights)
+
                 # Patch lastUpdate:
                 if last_daily_ts:
                     self._write_metadata('lastUpdate', str(int(last_daily_ts)), cursor)
@@ -1452,6 +1660,8 @@ class DaySummaryManager(Manager):
 
         if weight_fn is None:
             weight_fn = DaySummaryManager._calc_weight
+        # A weight function from elsewhere may look at any field of the record
+        by_interval = weight_fn in (DaySummaryManager._calc_weight, DaySummaryManager._get_weight)
 
         # Do all the dates in the tranche as a single transaction
         with weedb.Transaction(self.connection) as cursor:
@@ -1465,14 +1675,11 @@ class DaySummaryManager(Manager):
                 # Get an accumulator for the day
                 day_accum = weewx.accum.Accum(day_span)
                 # Now populate it with a day's worth of records
-                for rec in self.genBatchRecords(day_span.start, day_span.stop):
-                    try:
-                        weight = weight_fn(self, rec)
-                    except IntervalError as e:
-                        log.info("%s: %s", timestamp_to_string(rec['dateTime']), e)
-                        log.info('***  ignored.')
-                    else:
-                        day_accum.addRecord(rec, weight=weight)
+                for _, columns, weights in self._genDayColumns(day_span.start, day_span.stop,
+                                                               functools.partial(weight_fn,
+                                                                                 self),
+                                                               by_interval):
+                    day_accum.addRecords(columns, weights=weights)
                 # Write out the results of the accumulator
                 self._set_day_sums(day_accum, cursor)
                 if progress_fn:
@@ -1538,6 +1745,69 @@ class DaySummaryManager(Manager):
 
     # --------------------------- UTILITY FUNCTIONS -----------------------------------
 
+    def _genDayColumns(self, startstamp, stopstamp, weight_fn, by_interval=False):
+        """Generator function that yields the archive records within an interval, an archive day
+        at a time, in column-oriented form.
+
+        Args:
+            startstamp (float|int): Exclusive start of the interval in epoch time.
+            stopstamp (float|int): Inclusive end of the interval in epoch time.
+            weight_fn (function): Returns the weight of a record. It will be called with the
+                record as its only argument. Records for which it raises an IntervalError are
+                skipped.
+            by_interval (bool): True if the weight depends only on the field 'interval'. Then
+                weight_fn is called only once for each distinct value of 'interval'.
+
+        Yields:
+            tuple[TimeSpan, dict, list]: A 3-way tuple (day_span, columns, weights). day_span is
+                the archive day. columns is a dictionary where the key is an observation type,
+                and the value is a list of its values. weights is a list with the weight of
+                each record.
+        """
+        i_ts = self.sqlkeys.index('dateTime')
+        i_interval = self.sqlkeys.index('interval') if 'interval' in self.sqlkeys else None
+        weight_cache = {}
+        day_span = None
+        rows = []
+        weights = []
+        last_time = 0
+        for row in self.genBatchRows(startstamp, stopstamp):
+            ts = row[i_ts]
+            # The following is to get around a bug in sqlite when all the
+            # tables are in one file:
+            if ts <= last_time:
+                continue
+            last_time = ts
+
+            interval = row[i_interval] if i_interval is not None else None
+            if by_interval and interval in weight_cache:
+                weight = weight_cache[interval]
+            else:
+                try:
+                    weight = weight_fn(dict(zip(self.sqlkeys, row)))
+                except IntervalError as e:
+                    log.info("%s: %s", timestamp_to_string(ts), e)
+                    log.info('***  ignored.')
+                    continue
+                if by_interval:
+                    weight_cache[interval] = weight
+
+            if day_span is None or not day_span.includesArchiveTime(ts):
+                if rows:
+                    yield day_span, self._to_columns(rows), weights
+                day_span = weeutil.weeutil.archiveDaySpan(ts)
+                rows = []
+                weights = []
+            rows.append(row)
+            weights.append(weight)
+
+        if rows:
+            yield day_span, self._to_columns(rows), weights
+
+    def _to_columns(self, rows):
+        """Convert a list of rows from the archive table to column-oriented form."""
+        return dict(zip(self.sqlkeys, [list(column) for column in zip(*rows)]))
+
     def get_first_last(self):
         """Obtain the first and last timestamp of all the daily summaries.
 
@@ -1682,6 +1952,8 @@ class DaySummaryManager(Manager):
         finally:
             if cursor is None:
                 _cursor.close()
+        if key == 'lastUpdate':
+            self.last_update = to_int(value)
 
 
 if __name__ == '__main__':
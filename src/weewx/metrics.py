@@ -0,0 +1,334 @@
+#
+#    Copyright (c) 2009-2024 Tom Keffer <tkeffer@gmail.com>
+#
+#    See the file LICENSE.txt for your full rights.
+#
+"""Service that serves live runtime metrics of the engine, as JSON or as Prometheus text.
+
+The metrics are served over HTTP, either on a loopback port, or on a Unix domain socket. To use
+it, add weewx.metrics.StdMetrics to one of the service lists, then add a section [StdMetrics]
+to the configuration file:
+
+[StdMetrics]
+    # Serve on http://127.0.0.1:9105/metrics
+    port = 9105
+    # Or, serve on a Unix domain socket:
+    # socket = /var/run/weewx-metrics.sock
+
+Path /metrics returns Prometheus text, /metrics.json returns JSON.
+"""
+
+# Python imports
+import http.server
+import ipaddress
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+
+# weewx imports:
+import weedb
+import weewx
+import weewx.engine
+import weewx.profiler
+from weeutil.weeutil import to_bool, to_int
+
+log = logging.getLogger(__name__)
+
+
+# ==============================================================================
+#                    Class Metrics
+# ==============================================================================
+
+class Metrics:
+    """Counters and latency histograms, updated by the engine and by StdArchive."""
+
+    def __init__(self):
+        self.start_ts = time.time()
+        self.loop_packets = 0
+        # Latency of dispatching each LOOP packet, or each batch of packets
+        self.loop_dispatch = weewx.profiler.Histogram()
+        # Packets per second over the last minute or so
+        self.loop_rate = None
+        self._rate_ts = time.monotonic()
+        self._rate_count = 0
+        # Latency of writing each archive record to the database
+        self.archive_write = weewx.profiler.Histogram()
+        self.gc_runs = 0
+        self.gc_collected = 0
+        self.gc_seconds = 0.0
+        self.gc_last_seconds = None
+
+    def add_loop(self, count, elapsed):
+        """Record the dispatch of 'count' LOOP packets, which took 'elapsed' seconds."""
+        self.loop_packets += count
+        self.loop_dispatch.add(elapsed)
+        now = time.monotonic()
+        if now - self._rate_ts >= 60:
+            self.loop_rate = (self.loop_packets - self._rate_count) / (now - self._rate_ts)
+            self._rate_ts = now
+            self._rate_count = self.loop_packets
+
+    def add_archive_write(self, elapsed):
+        self.archive_write.add(elapsed)
+
+    def add_gc(self, collected, elapsed):
+        self.gc_runs += 1
+        self.gc_collected += collected
+        self.gc_seconds += elapsed
+        self.gc_last_seconds = elapsed
+
+
+# ==============================================================================
+#                    Class StdMetrics
+# ==============================================================================
+
+class StdMetrics(weewx.engine.StdService):
+    """Serves the runtime metrics of the engine over a local HTTP port, or a Unix socket."""
+
+    config_sections = ('StdMetrics',)
+
+    def __init__(self, engine, config_dict):
+        super().__init__(engine, config_dict)
+
+        metrics_dict = config_dict.get('StdMetrics', {})
+        self.host = metrics_dict.get('host', '127.0.0.1')
+        self.port = to_int(metrics_dict.get('port'))
+        # The metrics are served without any authentication, so only to this computer, unless
+        # the user insists.
+        self.allow_remote = to_bool(metrics_dict.get('allow_remote', False))
+        self.socket_path = metrics_dict.get('socket')
+        if self.socket_path:
+            self.socket_path = os.path.join(config_dict.get('WEEWX_ROOT', ''),
+                                            self.socket_path)
+        if not self.port and not self.socket_path:
+            log.info("No port or socket specified. Metrics will not be served.")
+
+        self.server = None
+        self.server_thread = None
+        # Have the engine, StdArchive, and the database drivers collect metrics. After a
+        # reload, carry on with the same ones. Whichever instance holds them takes them away
+        # again when it is shut down.
+        if engine.metrics is None:
+            engine.metrics = Metrics()
+        if weedb.statement_stats is None:
+            weedb.statement_stats = weedb.StatementStats()
+        self.metrics = engine.metrics
+        self.statement_stats = weedb.statement_stats
+
+        self.bind(weewx.STARTUP, self.startup)
+
+    def startup(self, _event):
+        self.start_server()
+
+    def take_over(self, old):
+        """Carry on with the same server, unless its address changed."""
+        # The metrics are now held by this instance, so the old one must leave them in place
+        old.metrics = old.statement_stats = None
+        if (self.host, self.port, self.socket_path, self.allow_remote) \
+                == (old.host, old.port, old.socket_path, old.allow_remote):
+            self.server, self.server_thread = old.server, old.server_thread
+            old.server = old.server_thread = None
+        else:
+            old.stop_server()
+            self.start_server()
+
+    def start_server(self):
+        handler = _make_handler(self)
+        try:
+            if self.socket_path:
+                if os.path.exists(self.socket_path):
+                    os.unlink(self.socket_path)
+                self.server = _UnixHTTPServer(self.socket_path, handler)
+                address = self.socket_path
+            elif self.port:
+                if not _is_loopback(self.host):
+                    if not self.allow_remote:
+                        log.error("Metrics can only be served on a loopback address, not '%s', "
+                                  "unless allow_remote is set. Metrics will not be served.",
+                                  self.host)
+                        return
+                    log.warning("Serving metrics to other computers, without authentication")
+                self.server = _HTTPServer((self.host, self.port), handler)
+                address = "http://%s:%d" % (self.host, self.port)
+            else:
+                return
+        except OSError as e:
+            log.error("Unable to serve metrics: %s", e)
+            self.server = None
+            return
+        self.server_thread = threading.Thread(target=self.server.serve_forever,
+                                              name='MetricsThread', daemon=True)
+        self.server_thread.start()
+        log.info("Serving metrics on %s", address)
+
+    def stop_server(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server_thread.join(5.0)
+            if self.socket_path:
+                try:
+                    os.unlink(self.socket_path)
+                except OSError:
+                    pass
+        self.server = self.server_thread = None
+
+    def shutDown(self):
+        self.stop_server()
+        # Stop the engine, StdArchive, and the database drivers from collecting metrics
+        if self.metrics is not None and self.engine.metrics is self.metrics:
+            self.engine.metrics = None
+        if self.statement_stats is not None and weedb.statement_stats is self.statement_stats:
+            weedb.statement_stats = None
+        self.metrics = self.statement_stats = None
+
+    def get_metrics(self):
+        """Return the current metrics as a dictionary."""
+        metrics = self.metrics or Metrics()
+        statement_stats = self.statement_stats
+        metrics_dict = {
+            'uptime': time.time() - metrics.start_ts,
+            'loop_packets': metrics.loop_packets,
+            'loop_rate': metrics.loop_rate,
+            'loop_dispatch': metrics.loop_dispatch.to_dict(),
+            'archive_write': metrics.archive_write.to_dict(),
+            'restful_queues': {},
+            'report': None,
+            'gc': {'runs': metrics.gc_runs,
+                   'collected': metrics.gc_collected,
+                   'seconds': metrics.gc_seconds,
+                   'last_seconds': metrics.gc_last_seconds},
+            'db_statements': statement_stats.to_dict() if statement_stats else {},
+        }
+        for service in list(self.engine.service_obj):
+            name = type(service).__name__
+            for kind in ('loop', 'archive'):
+                q = getattr(service, kind + '_queue', None)
+                if q is not None:
+                    metrics_dict['restful_queues'].setdefault(name, {})[kind] = q.qsize()
+            thread = getattr(service, 'thread', None)
+            if isinstance(service, weewx.engine.StdReport) and thread is not None:
+                metrics_dict['report'] = {'start_ts': getattr(thread, 'start_ts', None),
+                                          'stop_ts': getattr(thread, 'stop_ts', None),
+                                          'running': thread.is_alive()}
+        return metrics_dict
+
+
+def format_prometheus(metrics_dict):
+    """Format the dictionary returned by StdMetrics.get_metrics() as Prometheus text."""
+    lines = []
+
+    def add(name, kind, help_text, samples):
+        lines.append("# HELP weewx_%s %s" % (name, help_text))
+        lines.append("# TYPE weewx_%s %s" % (name, kind))
+        for labels, value in samples:
+            lines.append("weewx_%s%s %s" % (name, labels, _format_value(value)))
+
+    def add_histogram(name, help_text, hist_dict):
+        samples = []
+        running = 0
+        for bound, n in zip(weewx.profiler.BUCKETS, hist_dict['buckets']):
+            running += n
+            samples.append(('_bucket{le="%s"}' % bound, running))
+        samples.append(('_bucket{le="+Inf"}', hist_dict['count']))
+        samples.append(('_sum', hist_dict['total']))
+        samples.append(('_count', hist_dict['count']))
+        add(name, 'histogram', help_text, [])
+        lines.extend("weewx_%s%s %s" % (name, suffix, _format_value(value))
+                     for suffix, value in samples)
+
+    add('uptime_seconds', 'gauge', "Seconds since the metrics were started.",
+        [('', metrics_dict['uptime'])])
+    add('loop_packets_total', 'counter', "LOOP packets dispatched.",
+        [('', metrics_dict['loop_packets'])])
+    add_histogram('loop_dispatch_seconds', "Time taken to dispatch each LOOP packet or batch.",
+                  metrics_dict['loop_dispatch'])
+    add_histogram('archive_write_seconds', "Time taken to write each archive record.",
+                  metrics_dict['archive_write'])
+    add('restful_queue_depth', 'gauge', "Records waiting in each RESTful queue.",
+        [('{service="%s",queue="%s"}' % (name, kind), depth)
+         for name, queues in sorted(metrics_dict['restful_queues'].items())
+         for kind, depth in sorted(queues.items())])
+    report = metrics_dict['report']
+    if report:
+        add('report_running', 'gauge', "Whether the report thread is running.",
+            [('', int(report['running']))])
+        if report['start_ts'] and report['stop_ts']:
+            add('report_last_duration_seconds', 'gauge',
+                "How long the last completed run of the reports took.",
+                [('', report['stop_ts'] - report['start_ts'])])
+    gc_dict = metrics_dict['gc']
+    add('gc_runs_total', 'counter', "Scheduled garbage collections.",
+        [('', gc_dict['runs'])])
+    add('gc_collected_total', 'counter', "Objects collected by scheduled garbage collections.",
+        [('', gc_dict['collected'])])
+    add('gc_seconds_total', 'counter', "Time taken by scheduled garbage collections.",
+        [('', gc_dict['seconds'])])
+    db_stats = metrics_dict['db_statements']
+    add('db_statements_total', 'counter', "SQL statements executed, by kind.",
+        [('{statement="%s"}' % kind, db_stats[kind]['count']) for kind in sorted(db_stats)])
+    add('db_statement_seconds_total', 'counter', "Time taken to execute SQL statements.",
+        [('{statement="%s"}' % kind, db_stats[kind]['seconds']) for kind in sorted(db_stats)])
+    return '\n'.join(lines) + '\n'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class _HTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """HTTP server that handles each request in a thread of its own."""
+    daemon_threads = True
+
+
+class _UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    """HTTP server on a Unix domain socket."""
+    daemon_threads = True
+
+
+def _is_loopback(host):
+    """Return True if 'host' is an address that only this computer can reach."""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _make_handler(service):
+    """Return a request handler class that serves the metrics of a StdMetrics service."""
+
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            path = self.path.split('?', 1)[0]
+            if path in ('/', '/metrics'):
+                body = format_prometheus(service.get_metrics())
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            elif path == '/metrics.json':
+                body = json.dumps(service.get_metrics())
+                content_type = 'application/json'
+            else:
+                self.send_error(404)
+                return
+            data = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def address_string(self):
+            # A client on a Unix socket has no address
+            return self.client_address[0] if self.client_address else 'local'
+
+        def log_message(self, fmt, *args):
+            log.debug("%s - %s", self.address_string(), fmt % args)
+
+    return MetricsHandler
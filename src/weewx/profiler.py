@@ -0,0 +1,447 @@
+#
+#    Copyright (c) 2009-2024 Tom Keffer <tkeffer@gmail.com>
+#
+#    See the file LICENSE.txt for your full rights.
+#
+"""Classes for measuring how long the engine spends in each service callback, how long the
+reports take, and where it allocates memory."""
+
+# Python imports
+import bisect
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+import weeutil.weeutil
+import weewx
+
+log = logging.getLogger(__name__)
+
+# Holds the report profiler active in each thread
+_local = threading.local()
+
+# Upper bounds of the latency histogram buckets, in seconds. There is an implied final bucket
+# for anything longer.
+BUCKETS = (0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05,
+           0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+
+
+# ==============================================================================
+#                    Class Histogram
+# ==============================================================================
+
+class Histogram:
+    """Latency histogram, with fixed buckets. It can be added to in one thread, and read in
+    another, such as the thread serving the metrics."""
+
+    __slots__ = ('count', 'total', 'max', 'buckets', 'lock')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.lock = threading.Lock()
+
+    def add(self, elapsed):
+        with self.lock:
+            self.count += 1
+            self.total += elapsed
+            if elapsed > self.max:
+                self.max = elapsed
+            self.buckets[bisect.bisect_left(BUCKETS, elapsed)] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, pct):
+        """Return the upper bound of the bucket that holds the given percentile. Returns the
+        maximum latency if the percentile falls into the last, unbounded bucket."""
+        if not self.count:
+            return None
+        target = self.count * pct / 100.0
+        running = 0
+        for bound, n in zip(BUCKETS, self.buckets):
+            running += n
+            if running >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        """Return a consistent snapshot of the histogram."""
+        with self.lock:
+            return {'count': self.count,
+                    'total': self.total,
+                    'max': self.max,
+                    'buckets': list(self.buckets)}
+
+
+# ==============================================================================
+#                    Class DispatchProfiler
+# ==============================================================================
+
+class DispatchProfiler:
+    """Records the latency of each callback, and of each event as a whole.
+
+    It also flags any LOOP packet whose processing takes longer than a budget.
+    """
+
+    def __init__(self, log_interval=3600, loop_budget=1.0, profile_file=None):
+        """Initialize an instance of DispatchProfiler.
+
+        Args:
+            log_interval (float): How often to log a summary, in seconds. Zero means never.
+            loop_budget (float|None): How long processing a LOOP packet should take, in
+                seconds. Set to None to not check.
+            profile_file (str|None): Where to save the statistics when they are logged, so
+                they can be picked up by 'weectl debug'. Set to None to not save them.
+        """
+        self.log_interval = log_interval
+        self.loop_budget = loop_budget
+        self.profile_file = profile_file
+        self.start_ts = self.last_log_ts = time.time()
+        # Key is the name of an event type, value is a Histogram
+        self.events = {}
+        # Key is the name of an event type, value is a dictionary, with key the name of a
+        # callback and value a Histogram
+        self.callbacks = {}
+        # Number of times each callback took LOOP processing past the budget
+        self.over_budget = {}
+        # Cache of callback names
+        self._names = {}
+
+    def dispatch(self, event, callbacks):
+        """Call the callbacks for an event, timing each of them."""
+        event_name = event.event_type.__name__
+        histograms = self.callbacks.setdefault(event_name, {})
+        t0 = time.perf_counter()
+        t_last = t0
+        slowest = None
+        slowest_time = 0.0
+        try:
+            for callback in callbacks:
+                try:
+                    callback(event)
+                finally:
+                    t_now = time.perf_counter()
+                    elapsed = t_now - t_last
+                    t_last = t_now
+                    name = self.callback_name(callback)
+                    if name not in histograms:
+                        histograms[name] = Histogram()
+                    histograms[name].add(elapsed)
+                    if elapsed > slowest_time:
+                        slowest, slowest_time = name, elapsed
+        finally:
+            total = t_last - t0
+            if event_name not in self.events:
+                self.events[event_name] = Histogram()
+            self.events[event_name].add(total)
+            if self.loop_budget and event_name == 'NEW_LOOP_PACKET' \
+                    and total > self.loop_budget:
+                self.over_budget[slowest] = self.over_budget.get(slowest, 0) + 1
+                # Warn the first time. After that, the count appears in the summary.
+                log_fn = log.warning if self.over_budget[slowest] == 1 else log.debug
+                log_fn("Processing LOOP packet took %.3f seconds, over the budget of "
+                       "%.3f seconds. Slowest was %s (%.3f seconds)",
+                       total, self.loop_budget, slowest, slowest_time)
+
+        if self.log_interval and time.time() - self.last_log_ts >= self.log_interval:
+            self.log_summary()
+            self.save()
+
+    def callback_name(self, callback):
+        """Return the name of a callback, caching it."""
+        try:
+            return self._names[callback]
+        except KeyError:
+            name = self._names[callback] = callback_name(callback)
+            return name
+
+    def to_dict(self):
+        """Return the statistics as a dictionary, suitable for JSON."""
+        return {'start_ts': self.start_ts,
+                'stop_ts': time.time(),
+                'buckets': list(BUCKETS),
+                'loop_budget': self.loop_budget,
+                'events': {name: hist.to_dict() for name, hist in self.events.items()},
+                'callbacks': {event_name: {name: hist.to_dict()
+                                           for name, hist in histograms.items()}
+                              for event_name, histograms in self.callbacks.items()},
+                'over_budget': {str(name): n for name, n in self.over_budget.items()}}
+
+    def log_summary(self):
+        """Log the statistics of each event type and callback."""
+        self.last_log_ts = time.time()
+        log.info("Dispatch statistics over the last %d seconds:",
+                 self.last_log_ts - self.start_ts)
+        for line in format_profile(self.to_dict()):
+            log.info("  %s", line)
+
+    def save(self):
+        """Save the statistics to the profile file, if there is one."""
+        if not self.profile_file:
+            return
+        tmp_path = self.profile_file + '.tmp'
+        try:
+            with open(tmp_path, 'w') as fd:
+                json.dump(self.to_dict(), fd)
+            os.replace(tmp_path, self.profile_file)
+        except OSError as e:
+            log.error("Unable to save dispatch profile to %s: %s", self.profile_file, e)
+
+
+# ==============================================================================
+#                    Class StartupProfiler
+# ==============================================================================
+
+class StartupProfiler:
+    """Records how long each step of starting up the engine takes, up to the first LOOP
+    packet."""
+
+    def __init__(self):
+        self.start_ts = time.time()
+        # List of (step, name, elapsed time) tuples
+        self.steps = []
+
+    @contextlib.contextmanager
+    def timing(self, step, name):
+        """Context manager that times a step."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((step, name, time.perf_counter() - t0))
+
+    def dispatch(self, event, callbacks):
+        """Call the callbacks for an event, timing each of them."""
+        for callback in callbacks:
+            with self.timing(event.event_type.__name__, callback_name(callback)):
+                callback(event)
+
+    def log_summary(self):
+        log.info("Startup times (seconds):")
+        log.info("  %-12s %-60s %8.3f", 'launch', 'Python imports and configuration',
+                 self.start_ts - weewx.launchtime_ts)
+        # List the steps in the order they happened
+        for step, name, elapsed in self.steps:
+            log.info("  %-12s %-60s %8.3f", step, name[-60:], elapsed)
+        log.info("First LOOP packet %.3f seconds after launch", time.time() - weewx.launchtime_ts)
+
+
+# ==============================================================================
+#                    Class AllocationTracker
+# ==============================================================================
+
+class AllocationTracker:
+    """Uses tracemalloc to log the places where memory has grown the most over each
+    interval. This helps find leaks in services and report generators."""
+
+    def __init__(self, interval=3600, top=10, frames=1):
+        """Initialize an instance of AllocationTracker. This starts tracing allocations.
+
+        Args:
+            interval (float): How often to log the places that allocated the most, in seconds.
+            top (int): How many places to log.
+            frames (int): How many frames of the stack to record for each allocation. More
+                frames show where an allocation came from, at the cost of more overhead.
+        """
+        self.interval = interval
+        self.top = top
+        self.key_type = 'traceback' if frames > 1 else 'lineno'
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.last_ts = time.time()
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot(self):
+        # Leave out the allocations of tracemalloc itself, and of the import machinery
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def check(self):
+        """If the interval has passed, log the top allocation sites since the last time."""
+        if time.time() - self.last_ts >= self.interval:
+            self.log_summary()
+
+    def log_summary(self):
+        snapshot = self.take_snapshot()
+        stats = snapshot.compare_to(self.snapshot, self.key_type)
+        current, peak = tracemalloc.get_traced_memory()
+        log.info("Memory allocations over the last %d seconds. Traced: %.1f MiB, peak %.1f MiB",
+                 time.time() - self.last_ts, current / 1048576.0, peak / 1048576.0)
+        # Only the places where memory grew. The biggest come first.
+        stats = [stat for stat in stats if stat.size_diff > 0]
+        for stat in stats[:self.top]:
+            # Tracebacks are ordered from the oldest frame to the most recent
+            frames = list(reversed(stat.traceback))
+            log.info("  %+9.1f KiB %+8d blocks  %s:%d", stat.size_diff / 1024.0,
+                     stat.count_diff, frames[0].filename, frames[0].lineno)
+            for frame in frames[1:]:
+                log.info("  %29s %s:%d", 'from', frame.filename, frame.lineno)
+        self.snapshot = snapshot
+        self.last_ts = time.time()
+
+    def stop(self):
+        tracemalloc.stop()
+        self.snapshot = None
+
+
+# ==============================================================================
+#                    Class ReportProfiler
+# ==============================================================================
+
+class ReportProfiler:
+    """Records how long each report, generator, template and image takes. Within templates, it
+    also counts how often each tag is evaluated, and how long the queries it caused took.
+
+    Only what is run in a thread where the profiler is active is recorded.
+    """
+
+    def __init__(self):
+        self.start_ts = time.time()
+        # List of [depth, kind, name, elapsed time] lists, in the order they started
+        self.timings = []
+        # Key is the path of a tag, such as 'month.outTemp.max', value is a Histogram
+        self.tags = {}
+        self._depth = 0
+
+    @contextlib.contextmanager
+    def activate(self):
+        """Context manager within which the current thread records to this profiler."""
+        previous = getattr(_local, 'report_profiler', None)
+        _local.report_profiler = self
+        try:
+            yield self
+        finally:
+            _local.report_profiler = previous
+
+    @contextlib.contextmanager
+    def timing(self, kind, name):
+        """Context manager that times a step, such as a report, or a template."""
+        entry = [self._depth, kind, name, None]
+        self.timings.append(entry)
+        self._depth += 1
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry[3] = time.perf_counter() - t0
+            self._depth -= 1
+
+    def add_tag(self, path, elapsed):
+        if path not in self.tags:
+            self.tags[path] = Histogram()
+        self.tags[path].add(elapsed)
+
+    def to_dict(self):
+        """Return the statistics as a dictionary, suitable for JSON."""
+        return {'start_ts': self.start_ts,
+                'stop_ts': time.time(),
+                'timings': [list(entry) for entry in self.timings],
+                'tags': {path: hist.to_dict() for path, hist in self.tags.items()}}
+
+
+def get_report_profiler():
+    """Return the report profiler active in this thread, or None."""
+    return getattr(_local, 'report_profiler', None)
+
+
+def report_timing(kind, name):
+    """Return a context manager that times a step of running the reports, if they are being
+    profiled."""
+    profiler = getattr(_local, 'report_profiler', None)
+    if profiler is None:
+        return weeutil.weeutil.null_context()
+    return profiler.timing(kind, name)
+
+
+@contextlib.contextmanager
+def tag_timing(context, obs_type, attr):
+    """Context manager that times the queries caused by the tag $context.obs_type.attr, if the
+    reports are being profiled."""
+    profiler = getattr(_local, 'report_profiler', None)
+    if profiler is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.add_tag("%s.%s.%s" % (context, obs_type, attr), time.perf_counter() - t0)
+
+
+def callback_name(callback):
+    """Return a name for a callback. For bound methods, this includes the class name."""
+    obj = getattr(callback, '__self__', None)
+    if obj is not None:
+        return "%s.%s.%s" % (type(obj).__module__, type(obj).__name__, callback.__name__)
+    return "%s.%s" % (getattr(callback, '__module__', '?'),
+                      getattr(callback, '__qualname__', repr(callback)))
+
+
+def format_profile(profile_dict):
+    """Format the statistics returned by DispatchProfiler.to_dict() as lines of text.
+
+    Callbacks are listed under their event type, slowest first.
+    """
+    lines = ["%-52s %8s %10s %10s %10s %10s"
+             % ('Event / callback', 'Count', 'Total (s)', 'Mean (ms)', 'P95 (ms)', 'Max (ms)')]
+    for event_name in sorted(profile_dict['events']):
+        lines.append(_format_line(event_name, profile_dict['events'][event_name]))
+        callbacks = profile_dict['callbacks'].get(event_name, {})
+        for name in sorted(callbacks, key=lambda k: callbacks[k]['total'], reverse=True):
+            lines.append(_format_line('  ' + name, callbacks[name]))
+    for name, n in profile_dict.get('over_budget', {}).items():
+        lines.append("%s pushed LOOP processing over budget %d times" % (name, n))
+    return lines
+
+
+def _format_line(label, hist_dict):
+    hist = Histogram()
+    hist.count = hist_dict['count']
+    hist.total = hist_dict['total']
+    hist.max = hist_dict['max']
+    hist.buckets = hist_dict['buckets']
+    p95 = hist.percentile(95)
+    return "%-52s %8d %10.3f %10.3f %10.3f %10.3f" \
+        % (label[-52:], hist.count, hist.total, hist.mean * 1000.0 if hist.count else 0.0,
+           p95 * 1000.0 if p95 is not None else 0.0, hist.max * 1000.0)
+
+
+def format_report_profile(profile_dict, top=25):
+    """Format the statistics returned by ReportProfiler.to_dict() as lines of text.
+
+    Reports, generators, templates and images are listed in the order they ran, then the tags
+    whose queries took the most time.
+    """
+    lines = ["%-60s %10s" % ('Report / generator / file', 'Time (s)')]
+    for depth, kind, name, elapsed in profile_dict['timings']:
+        label = '  ' * depth + name
+        lines.append("%-60s %10.3f" % (label[:60], elapsed or 0.0))
+    tags = profile_dict['tags']
+    if tags:
+        lines.append('')
+        lines.append("%-44s %8s %10s %10s %10s"
+                     % ('Tag', 'Count', 'Query (s)', 'Mean (ms)', 'Max (ms)'))
+        for path in sorted(tags, key=lambda k: tags[k]['total'], reverse=True)[:top]:
+            hist_dict = tags[path]
+            lines.append("%-44s %8d %10.3f %10.3f %10.3f"
+                         % ('$' + path[-43:], hist_dict['count'], hist_dict['total'],
+                            hist_dict['total'] / hist_dict['count'] * 1000.0,
+                            hist_dict['max'] * 1000.0))
+        if len(tags) > top:
+            lines.append("... and %d more" % (len(tags) - top))
+        lines.append("%d tags evaluated, with %.3f seconds of queries"
+                     % (sum(hist_dict['count'] for hist_dict in tags.values()),
+                        sum(hist_dict['total'] for hist_dict in tags.values())))
+    return lines
@@ -46,27 +46,42 @@ class QC:
             self.mm_dict[obs_type][1] = to_float(self.mm_dict[obs_type][1])
 
         self.log_failure = log_failure
+        # The limits, converted to the unit system of the incoming data. Key is a unit system,
+        # value is a list of (obs_type, min, max) tuples.
+        self.limits = {}
 
     def apply_qc(self, data_dict, data_type=''):
         """Apply quality checks to the data in a record"""
 
-        converter = weewx.units.StdUnitConverters[data_dict['usUnits']]
+        try:
+            limits = self.limits[data_dict['usUnits']]
+        except KeyError:
+            limits = self.limits[data_dict['usUnits']] = self._convert_limits(data_dict['usUnits'])
 
-        for obs_type in self.mm_dict:
-            if obs_type in data_dict and data_dict[obs_type] is not None:
-                # Extract the minimum and maximum acceptable values
-                min_v, max_v = self.mm_dict[obs_type][0:2]
-                # If a unit has been specified, convert the min, max acceptable value to the same
-                # unit system as the incoming record:
-                if len(self.mm_dict[obs_type]) == 3:
-                    min_max_unit = self.mm_dict[obs_type][2]
-                    group = weewx.units.getUnitGroup(obs_type)
-                    min_v = converter.convert((min_v, min_max_unit, group))[0]
-                    max_v = converter.convert((max_v, min_max_unit, group))[0]
+        for obs_type, min_v, max_v in limits:
+            value = data_dict.get(obs_type)
+            if value is not None and not min_v <= value <= max_v:
+                if self.log_failure:
+                    log.warning("%s %s value '%s' %s outside limits (%s, %s)",
+                                weeutil.weeutil.timestamp_to_string(data_dict['dateTime']),
+                                data_type, obs_type, value, min_v, max_v)
+                data_dict[obs_type] = None
+
+    def _convert_limits(self, unit_system):
+        """Convert the min, max acceptable values to a unit system. This only needs to be done
+        once for each unit system."""
 
-                if not min_v <= data_dict[obs_type] <= max_v:
-                    if self.log_failure:
-                        log.warning("%s %s value '%s' %s outside limits (%s, %s)",
-                                    weeutil.weeutil.timestamp_to_string(data_dict['dateTime']),
-                                    data_type, obs_type, data_dict[obs_type], min_v, max_v)
-                    data_dict[obs_type] = None
+        converter = weewx.units.StdUnitConverters[unit_system]
+        limits = []
+        for obs_type in self.mm_dict:
+            # Extract the minimum and maximum acceptable values
+            min_v, max_v = self.mm_dict[obs_type][0:2]
+            # If a unit has been specified, convert the min, max acceptable value to the same
+            # unit system as the incoming record:
+            if len(self.mm_dict[obs_type]) == 3:
+                min_max_unit = self.mm_dict[obs_type][2]
+                group = weewx.units.getUnitGroup(obs_type)
+                min_v = converter.convert((min_v, min_max_unit, group))[0]
+                max_v = converter.convert((max_v, min_max_unit, group))[0]
+            limits.append((obs_type, min_v, max_v))
+        return limits
@@ -6,11 +6,17 @@
 """Engine for generating reports"""
 
 # System imports:
+import concurrent.futures
 import datetime
 import ftplib
+import importlib
+import json
 import locale
 import logging
+import multiprocessing
 import os
+import signal
+import sys
 import threading
 import time
 import traceback
@@ -26,6 +32,7 @@ import weeutil.logger
 import weeutil.weeutil
 import weewx.defaults
 import weewx.manager
+import weewx.profiler
 import weewx.units
 from weeutil.weeutil import to_bool, to_int
 
@@ -142,6 +149,9 @@ class StdReportEngine(threading.Thread):
         self.record = record
         self.gen_ts = gen_ts
         self.first_run = first_run
+        # When the reports started and finished running
+        self.start_ts = None
+        self.stop_ts = None
 
     def run(self, reports=None):
         """This is where the actual work gets done.
@@ -150,6 +160,7 @@ class StdReportEngine(threading.Thread):
             reports(list[str]|None): If None, run all enabled reports. If a list, run only the
                 reports in the list, whether they are enabled or not.
         """
+        self.start_ts = time.time()
 
         if self.gen_ts:
             log.debug("Running reports for time %s",
@@ -161,6 +172,19 @@ class StdReportEngine(threading.Thread):
         # all of them may be enabled).
         run_reports = reports or self.config_dict['StdReport'].sections
 
+        # If more than one worker was requested, generators run in a pool of processes, so
+        # that several can run at once. Not if they are being profiled, because the profiler
+        # only sees what runs in this thread.
+        workers = to_int(self.config_dict['StdReport'].get('report_workers', 1))
+        if workers > 1 and weewx.profiler.get_report_profiler() is None:
+            pool = get_report_pool(workers, self.config_dict)
+        else:
+            pool = None
+        # The pool the run started with. 'pool' is set to None if it breaks.
+        report_pool = pool
+        # Generators submitted to the pool
+        submitted = []
+
         # Iterate over each requested report
         for report in run_reports:
 
@@ -217,59 +241,411 @@ class StdReportEngine(threading.Thread):
                             skin_dict['SKIN_ROOT'],
                             skin_dict['skin'])
 
-            # We are using two "with" statements below:
-            # 1. Set the current working directory to the skin's location. This allows #include
-            # statements to work.
-            # 2. Set the locale to 'lang'. If 'lang' was not specified, set it to the user's
-            # default locale.
-            with set_cwd(skin_dir) as cwd, set_locale(skin_dict.get('lang', '')) as loc:
-                log.debug("Running generators for report '%s' in directory '%s' with locale '%s'",
-                          report, cwd, loc)
-
-                if 'Generators' in skin_dict and 'generator_list' in skin_dict['Generators']:
-                    for generator in weeutil.weeutil.option_as_list(
-                            skin_dict['Generators']['generator_list']):
-
-                        try:
-                            # Instantiate an instance of the class.
-                            obj = weeutil.weeutil.get_object(generator)(
-                                self.config_dict,
-                                skin_dict,
-                                self.gen_ts,
-                                self.first_run,
-                                self.stn_info,
-                                self.record)
-                        except Exception as e:
-                            log.error("Unable to instantiate generator '%s'", generator)
-                            log.error("        ****  %s", e)
-                            weeutil.logger.log_traceback(log.error, "        ****  ")
-                            log.error("        ****  Generator ignored")
-                            traceback.print_exc()
-                            continue
+            if 'Generators' not in skin_dict or 'generator_list' not in skin_dict['Generators']:
+                log.debug("No generators specified for report '%s'", report)
+                continue
 
-                        try:
-                            # Call its start() method
-                            obj.start()
-
-                        except Exception as e:
-                            # Caught unrecoverable error. Log it, continue on to the
-                            # next generator.
-                            log.error("Caught unrecoverable exception in generator '%s'",
-                                      generator)
-                            log.error("        ****  %s", e)
-                            weeutil.logger.log_traceback(log.error, "        ****  ")
-                            log.error("        ****  Generator terminated")
-                            traceback.print_exc()
-                            continue
+            # Generators of this report submitted to the pool
+            report_submitted = []
+            with weewx.profiler.report_timing('report', report):
+                for generator in weeutil.weeutil.option_as_list(
+                        skin_dict['Generators']['generator_list']):
+                    args = (generator, skin_dir, skin_dict.get('lang', ''), self.config_dict,
+                            skin_dict, self.gen_ts, self.first_run, self.stn_info, self.record)
+                    if not pool:
+                        run_generator(*args)
+                        continue
+                    waits_for = _waits_for(generator)
+                    if waits_for == 'report':
+                        concurrent.futures.wait(report_submitted)
+                    elif waits_for == 'all':
+                        concurrent.futures.wait(submitted)
+                    try:
+                        future = pool.submit(run_generator, *args)
+                    except concurrent.futures.process.BrokenProcessPool:
+                        log.error("Report pool is broken. Generators will run one at a time.")
+                        _drop_report_pool(pool)
+                        pool = None
+                        run_generator(*args)
+                        continue
+                    report_submitted.append(future)
+                    submitted.append(future)
 
-                        finally:
-                            obj.finalize()
+        concurrent.futures.wait(submitted)
+        for future in submitted:
+            if not _check_generator(future):
+                _drop_report_pool(report_pool)
+        self.stop_ts = time.time()
+
+
+def run_generator(generator, skin_dir, lang, config_dict, skin_dict, gen_ts, first_run,
+                  stn_info, record):
+    """Instantiate a generator, then run it.
+
+    This may be done in a process of the report pool, so it must not depend on anything but its
+    arguments. Any exceptions are logged, not raised.
+
+    Args:
+        generator(str): The name of the generator class, such as
+            'weewx.cheetahgenerator.CheetahGenerator'.
+        skin_dir(Path): The directory of the skin. The generator runs in this directory, which
+            allows #include statements to work.
+        lang(str): The locale to run the generator in. If empty, the user's default locale is
+            used.
+        config_dict(dict): The configuration dictionary.
+        skin_dict(dict): The skin dictionary of the report.
+        gen_ts(float|int|None): The timestamp for which the output is to be current.
+        first_run(bool): True if this is the first time the report engine has been run.
+        stn_info(StationInfo): Static station information.
+        record(dict|None): The current archive record.
+    """
+    with set_cwd(skin_dir) as cwd, set_locale(lang) as loc, \
+            weewx.profiler.report_timing('generator', generator):
+        log.debug("Running generator '%s' for report '%s' in directory '%s' with locale '%s'",
+                  generator, skin_dict['REPORT_NAME'], cwd, loc)
+
+        try:
+            # Instantiate an instance of the class.
+            obj = weeutil.weeutil.get_object(generator)(config_dict,
+                                                        skin_dict,
+                                                        gen_ts,
+                                                        first_run,
+                                                        stn_info,
+                                                        record)
+        except Exception as e:
+            log.error("Unable to instantiate generator '%s'", generator)
+            log.error("        ****  %s", e)
+            weeutil.logger.log_traceback(log.error, "        ****  ")
+            log.error("        ****  Generator ignored")
+            traceback.print_exc()
+            return
+
+        try:
+            # Call its start() method
+            obj.start()
+
+        except Exception as e:
+            # Caught unrecoverable error. Log it, continue on to the next generator.
+            log.error("Caught unrecoverable exception in generator '%s'", generator)
+            log.error("        ****  %s", e)
+            weeutil.logger.log_traceback(log.error, "        ****  ")
+            log.error("        ****  Generator terminated")
+            traceback.print_exc()
+
+        finally:
+            obj.finalize()
 
-                else:
-                    log.debug("No generators specified for report '%s'", report)
+
+def _waits_for(generator):
+    """Return what a generator must wait for, before it can run in the report pool."""
+    try:
+        return getattr(weeutil.weeutil.get_object(generator), 'waits_for', 'report')
+    except Exception:
+        # Let run_generator() deal with it
+        return 'report'
+
+
+# The pool of processes that run generators. It is kept from one run of the reports to the
+# next, so that each process holds on to the templates it has compiled.
+_report_pool = None
+# The number of workers, and the configuration dictionary, the pool was started with
+_report_pool_workers = None
+_report_pool_config = None
+_report_pool_lock = threading.Lock()
+
+
+def get_report_pool(workers, config_dict):
+    """Return a pool of 'workers' processes to run generators, or None if this version of
+    Python cannot start one that is safe to use."""
+    global _report_pool, _report_pool_workers, _report_pool_config
+    with _report_pool_lock:
+        if _report_pool is not None \
+                and (_report_pool_workers != workers or _report_pool_config is not config_dict):
+            _report_pool.shutdown(wait=True)
+            _report_pool = None
+        if _report_pool is None:
+            try:
+                _report_pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=_get_mp_context(),
+                    initializer=_init_report_process,
+                    initargs=_get_report_process_args(config_dict))
+            except TypeError:
+                # Before Python 3.7, the pool can only fork its processes, which is not safe
+                # once the engine has started other threads.
+                log.debug("Report pool not available. Generators will run one at a time.")
+                return None
+            _report_pool_workers = workers
+            _report_pool_config = config_dict
+            log.debug("Started pool of %d report workers", workers)
+        return _report_pool
+
+
+def _check_generator(future):
+    """Log any failure to run a generator in the report pool. Return False if the worker
+    died, which leaves the pool broken."""
+    try:
+        future.result()
+    except concurrent.futures.process.BrokenProcessPool as e:
+        log.error("Report worker died: %s", e)
+        return False
+    except Exception as e:
+        log.error("Unable to run generator in report worker: %s", e)
+    return True
+
+
+def _drop_report_pool(pool):
+    """Let go of a report pool that is broken, so the next run starts a new one."""
+    global _report_pool
+    with _report_pool_lock:
+        if _report_pool is pool:
+            _report_pool = None
+    pool.shutdown(wait=False)
+
+
+def _get_mp_context():
+    """Return the multiprocessing context used to start the processes that run reports.
+
+    By the time the reports run, the engine has started other threads. A process forked from it
+    could inherit locks held by those threads, which would then never be released. So the
+    processes are forked from a fork server, which has no other threads, or, where there is no
+    fork server, started from scratch.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def _get_report_process_args(config_dict):
+    """Return the arguments for _init_report_process()."""
+    return weeutil.logger.log_label or 'weewxd', config_dict, 'user.extensions' in sys.modules
+
+
+def _init_report_process(log_label, config_dict, user_extensions):
+    """Set up a process that runs reports.
+
+    It does not start as a copy of the engine, so it must set up for itself what the reports
+    expect: the logging, the user extensions, and the types that the xtype services add.
+
+    Args:
+        log_label(str): The label to use in the log.
+        config_dict(dict): The configuration dictionary.
+        user_extensions(bool): True to import the module user.extensions.
+    """
+    global _xtype_engine
+    import weewx.engine
+    weeutil.logger.setup(log_label, config_dict)
+    if user_extensions:
+        importlib.import_module('user.extensions')
+    if 'Station' in config_dict and 'Engine' in config_dict:
+        # Load only the xtype services
+        services = config_dict['Engine']['Services']
+        xtype_dict = weeutil.config.deep_copy(config_dict)
+        xtype_dict['Engine']['Services'] = {}
+        if 'xtype_services' in services:
+            xtype_dict['Engine']['Services']['xtype_services'] = services['xtype_services']
+        _xtype_engine = weewx.engine.DummyEngine(xtype_dict)
+
+
+# In a process that runs reports, the engine holding the xtype services
+_xtype_engine = None
+
+
+# =============================================================================
+#                    Class ReportProcess
+# =============================================================================
+
+class ReportProcess:
+    """Runs the reports in a long-lived process of their own.
+
+    The process is started once, then told over a pipe each time the reports are to run. Because
+    it lives on from one run to the next, it holds on to whatever it has built up, such as its
+    compiled templates, fonts, and what its templates asked of the database. And because the
+    reports run in another process, they do not compete with the main engine for the GIL.
+
+    It offers the same methods as the report thread it replaces, so StdReport can use either.
+
+    Args:
+        config_dict(dict): The configuration dictionary.
+        stn_info(StationInfo): Static station information.
+    """
+
+    def __init__(self, config_dict, stn_info):
+        # The process is not forked from the engine, so it sets itself up with
+        # _init_report_process()
+        mp_context = _get_mp_context()
+        self.conn, child_conn = mp_context.Pipe()
+        self.process = mp_context.Process(target=_report_process_main,
+                                          args=(child_conn, config_dict, stn_info,
+                                                _get_report_process_args(config_dict)),
+                                          name="ReportProcess",
+                                          daemon=True)
+        self.process.start()
+        child_conn.close()
+        # True while the process is running the reports
+        self.busy = False
+        # When the process last started and finished running the reports
+        self.start_ts = None
+        self.stop_ts = None
+        # Other threads, such as the one serving metrics, may ask whether the reports are
+        # running. Only one thread at a time can use the pipe.
+        self.lock = threading.Lock()
+        log.debug("Started report process %d", self.process.pid)
+
+    def start(self, record, first_run):
+        """Tell the process to run the reports."""
+        with self.lock:
+            self.conn.send((record, first_run))
+            self.busy = True
+
+    def is_alive(self):
+        """Return True if the process is still running the reports."""
+        # If another thread is using the pipe, it will bring 'busy' up to date.
+        if self.lock.acquire(blocking=False):
+            try:
+                self._receive(0)
+            finally:
+                self.lock.release()
+        return self.busy
+
+    def join(self, timeout=None):
+        """Wait up to 'timeout' seconds for the process to finish running the reports."""
+        with self.lock:
+            self._receive(timeout)
+
+    def _receive(self, timeout):
+        """Wait up to 'timeout' seconds to hear that the process has run the reports. The
+        caller must hold the lock."""
+        if not self.busy:
+            return
+        try:
+            if self.conn.poll(timeout):
+                self.start_ts, self.stop_ts = self.conn.recv()
+                self.busy = False
+                log.debug("Report process ran the reports in %.2f seconds",
+                          self.stop_ts - self.start_ts)
+        except (EOFError, OSError):
+            self.busy = False
+        if not self.process.is_alive():
+            self.busy = False
+
+    def is_running(self):
+        """Return True if the process is there to run the reports."""
+        return self.process.is_alive()
+
+    def close(self, timeout=20.0):
+        """Tell the process to stop, once it has finished any reports it is running."""
+        with self.lock:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            self.process.join(timeout)
+            if self.process.is_alive():
+                log.error("Unable to shut down report process. Terminating it.")
+                self.process.terminate()
+                self.process.join()
+            self.busy = False
+            self.conn.close()
+
+def _report_process_main(conn, config_dict, stn_info, init_args):
+    """Run the reports each time they are asked for, until told to stop."""
+    # The main engine handles the signals. This process stops when it is told to, or when the
+    # whole process group is terminated.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    # The engine started this process as a daemon, so that it does not outlive the engine. But
+    # a daemon cannot start the processes of the report pool, so it must not count as one itself.
+    multiprocessing.current_process().daemon = False
+    _init_report_process(*init_args)
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            # The main engine has gone away
+            break
+        if msg is None:
+            break
+        record, first_run = msg
+        engine = StdReportEngine(config_dict, stn_info, record, first_run=first_run)
+        try:
+            engine.run()
+        except Exception as e:
+            log.error("Caught unrecoverable exception in report process: %s", e)
+            weeutil.logger.log_traceback(log.error, "        ****  ")
+        conn.send((engine.start_ts, engine.stop_ts or time.time()))
+    conn.close()
+    with _report_pool_lock:
+        if _report_pool is not None:
+            _report_pool.shutdown(wait=True)
+    if _xtype_engine is not None:
+        _xtype_engine.shutDown()
+
+
+# Skin dictionaries already built. Key is a report name. Value is a tuple: what the skin
+# dictionary was built from, then the skin dictionary itself.
+_skin_dict_cache = {}
+_skin_dict_lock = threading.Lock()
 
 
 def build_skin_dict(config_dict, report):
+    """Return the skin_dict for the given report.
+
+    Building it means reading and merging several configuration files, so it is built once,
+    then copied, until the configuration, or any of the skin's configuration or language
+    files, change.
+    """
+    signature = _skin_dict_signature(config_dict, report)
+    with _skin_dict_lock:
+        cached = _skin_dict_cache.get(report)
+    if cached and cached[0] == signature:
+        skin_dict = cached[1]
+    else:
+        skin_dict = _build_skin_dict(config_dict, report)
+        with _skin_dict_lock:
+            _skin_dict_cache[report] = (signature, skin_dict)
+    # Whoever asked for it may modify it, so hand out a copy
+    return weeutil.config.deep_copy(skin_dict)
+
+
+def _skin_dict_signature(config_dict, report):
+    """Return something that changes if anything the skin_dict of a report is built from
+    changes."""
+    config_json = json.dumps({key: config_dict.get(key) for key in ('WEEWX_ROOT', 'log_success',
+                                                                    'log_failure', 'StdReport')},
+                             sort_keys=True, default=str)
+    skin_dir = Path(config_dict['WEEWX_ROOT'],
+                    config_dict['StdReport']['SKIN_ROOT'],
+                    config_dict['StdReport'][report].get('skin', ''))
+    stamps = [_mtime(skin_dir / 'skin.conf')]
+    # The language files, including those in the subdirectories added by extensions. A new
+    # file or subdirectory changes the modification time of its directory.
+    lang_dirs = [skin_dir / 'lang']
+    while lang_dirs:
+        lang_dir = lang_dirs.pop()
+        stamps.append(_mtime(lang_dir))
+        try:
+            entries = list(os.scandir(lang_dir))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir() and entry.name.startswith('lang'):
+                lang_dirs.append(Path(entry.path))
+            elif entry.name.endswith('.conf'):
+                stamps.append(_mtime(entry.path))
+    return config_json, tuple(stamps)
+
+
+def _mtime(path):
+    """Return the modification time of a path, or None if it does not exist."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _build_skin_dict(config_dict, report):
     """Find and build the skin_dict for the given report"""
 
     #######################################################################
@@ -469,6 +845,12 @@ def merge_lang(lang_spec, config_dict, report, skin_dict):
 class ReportGenerator:
     """Base class for all report generators."""
 
+    # What the generator must wait for, when generators run in the report pool: None, if
+    # nothing; 'report', if the other generators of its report; 'all', if all the generators
+    # before it. A generator may rely on what the generators before it have done, so only
+    # those that are known not to can run alongside them.
+    waits_for = 'report'
+
     def __init__(self, config_dict, skin_dict, gen_ts, first_run, stn_info, record=None):
         self.config_dict = config_dict
         self.skin_dict = skin_dict
@@ -497,6 +879,8 @@ class FtpGenerator(ReportGenerator):
 
     This will ftp everything in the public_html subdirectory to a webserver."""
 
+    waits_for = 'all'
+
     def run(self):
         import weeutil.ftpupload
 
@@ -556,6 +940,8 @@ class RsyncGenerator(ReportGenerator):
 
     This will rsync everything in the public_html subdirectory to a server."""
 
+    waits_for = 'all'
+
     def run(self):
         import weeutil.rsyncupload
         log_success = to_bool(weeutil.config.search_up(self.skin_dict, 'log_success', True))
@@ -600,6 +986,8 @@ class CopyGenerator(ReportGenerator):
     This will copy files from the skin subdirectory to the public_html
     subdirectory."""
 
+    waits_for = 'report'
+
     def run(self):
         copy_dict = self.skin_dict['CopyGenerator']
         # determine how much logging is desired
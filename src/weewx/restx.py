@@ -140,6 +140,8 @@ class StdRESTful(weewx.engine.StdService):
     
     Offers a few common bits of functionality."""
 
+    config_sections = ('StdRESTful',)
+
     def shutDown(self):
         """Shut down any threads"""
         if hasattr(self, 'loop_queue') and hasattr(self, 'loop_thread'):
@@ -6,6 +6,8 @@
 """Classes for implementing the weewx tag 'code' codes."""
 
 import weeutil.weeutil
+import weewx.dependencies
+import weewx.profiler
 import weewx.units
 import weewx.xtypes
 from weeutil.weeutil import to_int
@@ -380,7 +382,8 @@ class ObservationBinder:
     def has_data(self):
         """Check to see if there is any non-null data in the aggregation interval"""
         db_manager = self.db_lookup(self.data_binding)
-        val = weewx.xtypes.has_data(self.obs_type, self.timespan, db_manager)
+        with weewx.profiler.tag_timing(self.context, self.obs_type, 'has_data'):
+            val = weewx.xtypes.has_data(self.obs_type, self.timespan, db_manager)
         return val
 
     def series(self, aggregate_type=None,
@@ -415,10 +418,11 @@ class ObservationBinder:
         # error. Be prepared to catch it.
         try:
             # The returned values start_vt, stop_vt, and data_vt, will be ValueTuples.
-            start_vt, stop_vt, data_vt = weewx.xtypes.get_series(
-                self.obs_type, self.timespan, db_manager,
-                aggregate_type, aggregate_interval,
-                **option_dict)
+            with weewx.profiler.tag_timing(self.context, self.obs_type, 'series'):
+                start_vt, stop_vt, data_vt = weewx.xtypes.get_series(
+                    self.obs_type, self.timespan, db_manager,
+                    aggregate_type, aggregate_interval,
+                    **option_dict)
         except (weewx.UnknownType, weewx.UnknownAggregation):
             # Cannot calculate the series. Convert to AttributeError, which will signal to Cheetah
             # that this type of series is unknown.
@@ -495,9 +499,10 @@ class AggTypeBinder:
         try:
             # If we cannot perform the aggregation, we will get an UnknownType or
             # UnknownAggregation error. Be prepared to catch it.
-            result = weewx.xtypes.get_aggregate(self.obs_type, self.timespan,
-                                                self.aggregate_type,
-                                                db_manager, **self.option_dict)
+            with weewx.profiler.tag_timing(self.context, self.obs_type, self.aggregate_type):
+                result = weewx.xtypes.get_aggregate(self.obs_type, self.timespan,
+                                                    self.aggregate_type,
+                                                    db_manager, **self.option_dict)
         except (weewx.UnknownType, weewx.UnknownAggregation):
             # Signal Cheetah that we don't know how to do this by raising an AttributeError.
             raise AttributeError(self.obs_type)
@@ -579,6 +584,7 @@ class CurrentObj:
                 and self.record['dateTime'] == self.current_time:
             # Use the record given to us to form a ValueTuple
             vt = weewx.units.as_value_tuple(self.record, obs_type)
+            weewx.dependencies.add_point(None, self.current_time)
         else:
             # A binding has been specified, or we don't have a record, or the observation type
             # is not in the record, or the timestamp is wrong.
@@ -591,6 +597,7 @@ class CurrentObj:
 
             # Get the record for this timestamp from the database
             record = db_manager.getRecord(self.current_time, max_delta=self.max_delta)
+            weewx.dependencies.add_point(db_manager, self.current_time)
             # If there was no record at that timestamp, it will be None. If there was a record,
             # check to see if the type is in it.
             if not record or obs_type in record:
@@ -656,6 +663,7 @@ class TrendObj:
         # Get the current record, and one "time_delta" ago:        
         now_record = db_manager.getRecord(self.nowtime, self.time_grace_val)
         then_record = db_manager.getRecord(self.nowtime - self.time_delta_val, self.time_grace_val)
+        weewx.dependencies.add_point(db_manager, self.nowtime)
 
         # Extract the ValueTuples from the records.
         try:
@@ -4,8 +4,10 @@
 #    See the file LICENSE.txt for your full rights.
 #
 """Test module weewx.accum"""
+import json
 import math
 import time
+import tracemalloc
 import pytest
 
 import weewx.accum
@@ -194,6 +196,107 @@ class TestAccum:
         rec = accum.getRecord()
         assert rec['stringType'] == "AString%d" % (len(self.dataset) - 1)
 
+    def test_Accum_plan(self):
+        """Test that the plans used by addRecord() give the same results as resolving the add
+        function for each type."""
+        accum = weewx.accum.Accum(TimeSpan(start_ts, stop_ts))
+        expected = weewx.accum.Accum(TimeSpan(start_ts, stop_ts))
+        for i, record in enumerate(self.dataset):
+            # Every once in a while, change the shape of the record
+            if i % 7 == 0:
+                record = dict(record)
+                del record['outTemp']
+            accum.addRecord(record, add_hilo=bool(i % 3), weight=i)
+            for obs_type in record:
+                func = weewx.accum.get_add_function(obs_type)
+                func(expected, record, obs_type, bool(i % 3), i)
+
+        # There should be one plan per shape of record:
+        assert len(accum._plans) == 2
+        assert sorted(accum) == sorted(expected)
+        for obs_type in accum:
+            assert accum[obs_type].getStatsTuple() == expected[obs_type].getStatsTuple()
+        assert accum.getRecord() == expected.getRecord()
+
+    def test_Accum_addRecords(self):
+        """Test that adding a column-oriented batch gives the same results as adding the
+        records one at a time."""
+        for i, record in enumerate(self.dataset):
+            record['stringType'] = "AString%d" % i
+            # Every once in a while, insert a string or a NaN
+            if i % 17 == 0 and record['outTemp'] is not None:
+                record['outTemp'] = str(record['outTemp'])
+            if i % 23 == 5:
+                record['barometer'] = float('nan')
+        weights = [5 + i % 3 for i in range(len(self.dataset))]
+
+        expected = weewx.accum.Accum(TimeSpan(start_ts, stop_ts))
+        for record, weight in zip(self.dataset, weights):
+            expected.addRecord(record, weight=weight)
+
+        # Do it in two batches, to test merging a batch into existing stats
+        accum = weewx.accum.Accum(TimeSpan(start_ts, stop_ts))
+        n = len(self.dataset) // 2
+        for records, batch_weights in ((self.dataset[:n], weights[:n]),
+                                       (self.dataset[n:], weights[n:])):
+            columns = {obs_type: [record[obs_type] for record in records]
+                       for obs_type in records[0]}
+            accum.addRecords(columns, weights=batch_weights)
+
+        assert sorted(accum) == sorted(expected)
+        for obs_type in accum:
+            assert accum[obs_type].getStatsTuple() \
+                   == pytest.approx(expected[obs_type].getStatsTuple(), nan_ok=True)
+            assert getattr(accum[obs_type], 'first', None) \
+                   == getattr(expected[obs_type], 'first', None)
+            assert accum[obs_type].last == expected[obs_type].last
+            assert accum[obs_type].lasttime == expected[obs_type].lasttime
+        assert accum.getRecord() == pytest.approx(expected.getRecord())
+
+        # A batch that falls outside the timespan should be rejected
+        with pytest.raises(weewx.accum.OutOfSpan):
+            accum.addRecords({'dateTime': [start_ts, stop_ts + 5], 'usUnits': [weewx.US] * 2})
+
+    def test_Accum_addRecords_loop(self):
+        """Test adding a batch of LOOP packets, which all have weight one. Without None or
+        NaN, the results should be exactly the same as adding them one at a time."""
+        records = [record for record in self.dataset if record['outTemp'] is not None]
+        columns = {obs_type: [record[obs_type] for record in records]
+                   for obs_type in ('dateTime', 'usUnits', 'outTemp', 'barometer')}
+
+        expected = weewx.accum.Accum(TimeSpan(start_ts, stop_ts))
+        for values in zip(*columns.values()):
+            expected.addRecord(dict(zip(columns, values)))
+        accum = weewx.accum.Accum(TimeSpan(start_ts, stop_ts))
+        accum.addRecords(columns)
+
+        for obs_type in ('outTemp', 'barometer'):
+            assert accum[obs_type].getStatsTuple() == expected[obs_type].getStatsTuple()
+            assert accum[obs_type].first == expected[obs_type].first
+            assert accum[obs_type].last == expected[obs_type].last
+
+    def test_Accum_state(self):
+        """Test that an accumulator survives a round trip through JSON."""
+        for i, record in enumerate(self.dataset):
+            record['stringType'] = "AString%d" % i
+        weewx.accum.accum_dict.extend({'stringType': {'accumulator': 'firstlast',
+                                                      'extractor': 'last'}})
+        accum = weewx.accum.Accum(TimeSpan(start_ts, stop_ts))
+        n = len(self.dataset) // 2
+        for record in self.dataset[:n]:
+            accum.addRecord(record)
+
+        restored = weewx.accum.Accum.from_state(json.loads(json.dumps(accum.get_state())))
+        assert restored.timespan == accum.timespan
+        assert restored.unit_system == accum.unit_system
+        assert restored['wind'].last == accum['wind'].last
+
+        # Adding the rest of the data to both should give the same results
+        for record in self.dataset[n:]:
+            accum.addRecord(record)
+            restored.addRecord(record)
+        assert restored.getRecord() == accum.getRecord()
+
     def test_Accum_unit_change(self):
 
         # Change the units used by a record mid-stream
@@ -204,3 +307,55 @@ class TestAccum:
             for record in self.dataset:
                 accum.addRecord(record)
 
+
+class TestFootprint:
+    """Check the memory taken by the statistics of the accumulators, and benchmark the speed
+    of adding records. Run with -s to see the timing."""
+
+    N = 10000
+
+    class DictStats:
+        """Holds the same attributes as ScalarStats, but in a per-instance __dict__."""
+
+        def __init__(self):
+            (self.first, self.firsttime, self.last, self.lasttime) = (None, None, None, None)
+            (self.min, self.mintime,
+             self.max, self.maxtime,
+             self.sum, self.count,
+             self.wsum, self.sumtime) = weewx.accum.FirstLastAccum.default_init
+
+    @staticmethod
+    def _footprint(factory, n):
+        """Return the number of bytes allocated per object when creating n of them."""
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            objs = [factory() for _ in range(n)]
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        assert len(objs) == n
+        return (after - before) / n
+
+    def test_no_instance_dict(self):
+        for cls in (weewx.accum.FirstLastAccum, weewx.accum.ScalarStats, weewx.accum.VecStats):
+            assert not hasattr(cls(), '__dict__')
+
+    def test_memory(self):
+        slot_size = self._footprint(weewx.accum.ScalarStats, TestFootprint.N)
+        dict_size = self._footprint(TestFootprint.DictStats, TestFootprint.N)
+        # About three quarters, depending on the version of Python
+        assert slot_size / dict_size < 0.9
+
+    def test_speed(self):
+        # This is a benchmark. The timing depends on the computer, so it is only printed.
+        dataset = list(gen_fake_records(start_ts=start_ts + 5, stop_ts=stop_ts, interval=5))
+        t0 = time.perf_counter()
+        for _ in range(10):
+            accum = weewx.accum.Accum(TimeSpan(start_ts, stop_ts))
+            for record in dataset:
+                accum.addRecord(record)
+        elapsed = time.perf_counter() - t0
+        print("\nAdded %d records in %.3f seconds (%.1f us/record)"
+              % (10 * len(dataset), elapsed, 1.0e6 * elapsed / (10 * len(dataset))))
+        assert accum.getRecord()['dateTime'] == dataset[-1]['dateTime']
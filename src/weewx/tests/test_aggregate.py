@@ -11,8 +11,10 @@ import time
 import pytest
 
 import weedb
+import weeutil.weeutil
 import weewx
 import weewx.manager
+import weewx.schemas.wview_small
 import weewx.xtypes
 from parameters import synthetic_dict
 from weeutil.weeutil import TimeSpan
@@ -333,3 +335,128 @@ def test_last_wind(config_dict):
         assert value[0] == pytest.approx(expected)
         assert value[1] == 'mile_per_hour'
         assert value[2] == 'group_speed'
+
+
+def test_prefetch_days(config_dict):
+    """Aggregates calculated from prefetched daily summaries should be the same as those
+    calculated by the database."""
+    month_start_ts = time.mktime((2010, 5, 1, 0, 0, 0, 0, 0, -1))
+    month_stop_ts = time.mktime((2010, 6, 1, 0, 0, 0, 0, 0, -1))
+    timespans = list(weeutil.weeutil.genDaySpans(month_start_ts, month_stop_ts))
+    timespans.append(TimeSpan(month_start_ts, month_stop_ts))
+    timespans.append(TimeSpan(time.mktime((2010, 5, 5, 0, 0, 0, 0, 0, -1)),
+                              time.mktime((2010, 5, 20, 0, 0, 0, 0, 0, -1))))
+    vals = {'outTemp': ValueTuple(50, 'degree_F', 'group_temperature'),
+            'inTemp': ValueTuple(50, 'degree_F', 'group_temperature'),
+            'rain': ValueTuple(0.05, 'inch', 'group_rain'),
+            'wind': ValueTuple(10, 'mile_per_hour', 'group_speed')}
+    wind_only = {'gustdir', 'rms', 'vecavg', 'vecdir'}
+
+    def get_all(db_manager):
+        results = []
+        for timespan in timespans:
+            for obs_type in vals:
+                for aggregate_type in weewx.xtypes.DailySummaries.agg_sql_dict:
+                    if aggregate_type in wind_only and obs_type != 'wind':
+                        continue
+                    results.append(weewx.xtypes.DailySummaries.get_aggregate(
+                        obs_type, timespan, aggregate_type, db_manager, val=vals[obs_type]))
+            results.append(weewx.xtypes.WindVecDaily.get_aggregate('windvec', timespan, 'avg',
+                                                                   db_manager))
+            results.append(weewx.xtypes.AggregateHeatCool.get_aggregate('heatdeg', timespan,
+                                                                        'sum', db_manager))
+        return results
+
+    with weewx.manager.open_manager_with_config(config_dict, 'wx_binding') as db_manager:
+        expected = get_all(db_manager)
+        with weewx.xtypes.prefetch_days(TimeSpan(month_start_ts, month_stop_ts)) as prefetch:
+            results = get_all(db_manager)
+        assert len(prefetch.days) == len(vals)
+    # Nothing has been fetched outside the context
+    assert weewx.xtypes.get_prefetched_days(db_manager, 'outTemp',
+                                            month_start_ts, month_stop_ts) is None
+    for result, expect in zip(results, expected):
+        assert result == ValueTuple(pytest.approx(expect[0]), expect[1], expect[2])
+
+
+def test_batch_days(config_dict):
+    """Periods where several aggregates were asked for the last time are fetched at once."""
+    day = TimeSpan(time.mktime((2010, 5, 3, 0, 0, 0, 0, 0, -1)),
+                   time.mktime((2010, 5, 4, 0, 0, 0, 0, 0, -1)))
+    month = TimeSpan(time.mktime((2010, 5, 1, 0, 0, 0, 0, 0, -1)),
+                     time.mktime((2010, 6, 1, 0, 0, 0, 0, 0, -1)))
+    asks = [('outTemp', month, 'max'), ('outTemp', month, 'min'),
+            ('outTemp', day, 'max'), ('outTemp', day, 'min'), ('outTemp', day, 'maxtime'),
+            ('rain', month, 'sum'), ('barometer', day, 'avg')]
+
+    def evaluate(db_manager, plan=None):
+        with weewx.xtypes.batch_days(plan) as batch:
+            results = [weewx.xtypes.DailySummaries.get_aggregate(obs_type, timespan,
+                                                                 aggregate_type, db_manager)
+                       for obs_type, timespan, aggregate_type in asks]
+        return results, batch
+
+    with weewx.manager.open_manager_with_config(config_dict, 'wx_binding') as db_manager:
+        # The first time, there is no plan, so nothing is fetched
+        expected, batch = evaluate(db_manager)
+        assert not any(batch.days.values())
+        plan = batch.usage()
+        assert plan == {('outTemp', 86400): 3, ('outTemp', month.stop - month.start): 2,
+                        ('rain', month.stop - month.start): 1, ('barometer', 86400): 1}
+
+        # The next time, only the months of outTemp are fetched. The rows also serve the day.
+        results, batch = evaluate(db_manager, plan)
+        assert results == expected
+        assert [len(fetched) for fetched in batch.days.values() if fetched] == [1]
+        assert batch.days[(db_manager, 'outTemp')][0][:2] == (month.start, month.stop)
+        assert batch.usage() == plan
+
+
+def test_agg_row_dict(tmp_path):
+    """Every aggregate calculated from rows of the daily summaries matches its query,
+    including over days with only nulls, days with no rows, and empty spans."""
+    day = 86400
+    start = int(time.mktime((2024, 6, 1, 0, 0, 0, 0, 0, -1)))
+    records = []
+    for hour in range(72):
+        ts = start + 3600 * (hour + 1)
+        if hour < 24:
+            # Ties, so the times of the highs and lows have to be chosen
+            values = (60.0 + hour % 7, 0.01 * (hour % 3), 2.0 + hour % 5, 10.0 * hour)
+        elif hour < 48:
+            # A day of nulls
+            values = (None, None, None, None)
+        else:
+            # Some nulls, and the same high as the first day
+            values = (None if hour % 4 else 66.0 - hour % 5, 0.0, float(hour % 2), 180.0)
+        outTemp, rain, windSpeed, windDir = values
+        records.append({'dateTime': ts, 'usUnits': weewx.US, 'interval': 60,
+                        'outTemp': outTemp, 'rain': rain,
+                        'windSpeed': windSpeed, 'windDir': windDir,
+                        'windGust': windSpeed, 'windGustDir': windDir})
+    db_dict = {'database_name': str(tmp_path / 'test.sdb'), 'driver': 'weedb.sqlite'}
+    spans = [(start, start + 4 * day), (start, start + 2 * day),
+             (start + day, start + 2 * day), (start + 3 * day, start + 4 * day),
+             (start + 10 * day, start + 11 * day)]
+    # Only the vector summaries have the columns for these
+    vector_types = {'gustdir', 'rms', 'vecavg', 'vecdir'}
+
+    def norm(row):
+        if row is None:
+            return None
+        return tuple(round(x, 6) if isinstance(x, float) else x for x in row)
+
+    with weewx.manager.DaySummaryManager.open_with_create(
+            db_dict, schema=weewx.schemas.wview_small.schema) as db_manager:
+        db_manager.addRecord(records)
+        for obs_type, val in (('outTemp', 62.0), ('rain', 0.005), ('wind', 3.0)):
+            for span_start, span_stop in spans:
+                inter_dict = {'start': span_start, 'stop': span_stop, 'obs_key': obs_type,
+                              'val': val, 'table_name': db_manager.table_name}
+                _, rows = weewx.xtypes._fetch_days(db_manager, obs_type, span_start, span_stop)
+                for aggregate_type, row_fn in weewx.xtypes.DailySummaries.agg_row_dict.items():
+                    if aggregate_type in vector_types and obs_type != 'wind':
+                        continue
+                    sql = weewx.xtypes.DailySummaries.agg_sql_dict[aggregate_type] % inter_dict
+                    assert norm(row_fn(rows, val)) == norm(db_manager.getSql(sql)), \
+                        (obs_type, span_start, span_stop, aggregate_type)
@@ -9,6 +9,10 @@ Use pytest to run the tests.
 """
 
 import logging
+import os
+
+import Cheetah.Template
+import pytest
 
 import weeutil.logger
 import weeutil.weeutil
@@ -99,3 +103,117 @@ class TestHelpers:
         assert weewx.cheetahgenerator.JSONHelpers.to_int(-1.2345) == -1
         assert weewx.cheetahgenerator.JSONHelpers.to_int(None) is None
 
+
+
+class TestTemplateCache:
+    "Test the cache of compiled templates"
+
+    @staticmethod
+    def render(template_class, name):
+        return str(template_class(searchList=[{'name': name}],
+                                  filter='AssureUnicode',
+                                  filtersLib=weewx.cheetahgenerator))
+
+    def test_cache(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        template = tmp_path / 'hello.txt.tmpl'
+        template.write_text('Hello, $name!\n#include "footer.inc"\n')
+        footer = tmp_path / 'footer.inc'
+        footer.write_text('Bye, $name.\n')
+        cache_dir = str(tmp_path / 'cache')
+
+        cache = weewx.cheetahgenerator.TemplateCache()
+        template_class = cache.get_class(str(template), cache_dir)
+        assert self.render(template_class, 'Fred') == 'Hello, Fred!\nBye, Fred.\n'
+        # The second time, the same class is returned
+        assert cache.get_class(str(template), cache_dir) is template_class
+        # The template and the included file are both on disk
+        assert len(os.listdir(cache_dir)) == 2
+
+        # A modified file is compiled again
+        footer.write_text('So long, $name.\n')
+        os.utime(footer, (1700000000, 1700000000))
+        assert self.render(template_class, 'Fred') == 'Hello, Fred!\nSo long, Fred.\n'
+
+        # A new cache takes the compiled code from disk
+        def no_compile(*args, **kwargs):
+            raise AssertionError("Template was compiled")
+        monkeypatch.setattr(Cheetah.Template.Template, 'compile', no_compile)
+        cache = weewx.cheetahgenerator.TemplateCache()
+        template_class = cache.get_class(str(template), cache_dir)
+        assert self.render(template_class, 'Barney') == 'Hello, Barney!\nSo long, Barney.\n'
+
+        os.utime(template, (1700000000, 1700000000))
+        with pytest.raises(AssertionError):
+            cache.get_class(str(template), cache_dir)
+
+
+class TestSearchList:
+    "Test reusing search list extensions for more than one template"
+
+    class Counter(weewx.cheetahgenerator.SearchList):
+        def __init__(self, generator):
+            weewx.cheetahgenerator.SearchList.__init__(self, generator)
+            self.calls = 0
+
+        def get_extension_list(self, timespan, db_lookup):
+            self.calls += 1
+            return [{'stop': timespan.stop, 'binding': db_lookup()}]
+
+    class ByStop(Counter):
+        cacheable = True
+
+        def cache_key(self, timespan, default_binding):
+            return timespan.stop, default_binding
+
+    class Once(Counter):
+        cacheable = True
+
+    class FakeBinder:
+        @staticmethod
+        def bind_default(default_binding):
+            return lambda data_binding=None: data_binding or default_binding
+
+    def test_cache(self):
+        generator = weewx.cheetahgenerator.CheetahGenerator.__new__(
+            weewx.cheetahgenerator.CheetahGenerator)
+        generator.db_binder = self.FakeBinder()
+        generator.outputted_dict = {}
+        generator.extension_cache = {}
+        every, by_stop, once = self.Counter(generator), self.ByStop(generator), self.Once(generator)
+        generator.search_list_objs = [every, by_stop, once]
+
+        for start, stop, binding in [(0, 100, 'wx_binding'),
+                                     (50, 100, 'wx_binding'),
+                                     (0, 200, 'wx_binding'),
+                                     (0, 200, 'aux_binding')]:
+            timespan = weeutil.weeutil.TimeSpan(start, stop)
+            search_list = generator._getSearchList('utf8', timespan, binding, 'page', 'index.html')
+            assert search_list[2] == {'stop': stop, 'binding': binding}
+            assert search_list[3] == {'stop': stop, 'binding': binding}
+        assert every.calls == 4
+        assert by_stop.calls == 3
+        assert once.calls == 1
+
+        generator.teardown()
+        assert not generator.extension_cache
+
+
+class TestStreaming:
+    "Test writing the output of a template a piece at a time"
+
+    @pytest.mark.parametrize('encoding', ['utf8', 'html_entities', 'strict_ascii',
+                                          'normalized_ascii'])
+    def test_stream(self, tmp_path, encoding):
+        template = Cheetah.Template.Template(
+            source='#def greet($who)\nHej, $who!\n#end def\n'
+                   '#for $i in range(200)\n$i: $greet("Ångström")\n#end for\n',
+            filter='AssureUnicode',
+            filtersLib=weewx.cheetahgenerator)
+        encode = weewx.cheetahgenerator._get_encoder(encoding)
+        path = tmp_path / 'out.txt'
+        with open(path, 'wb') as fd:
+            stream = weewx.cheetahgenerator._StreamingTransaction(fd, encode, buffer_size=100)
+            assert template.respond(trans=stream) == ''
+            stream.flush()
+        assert path.read_bytes() == encode(template.respond())
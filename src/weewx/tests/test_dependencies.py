@@ -0,0 +1,168 @@
+#
+#    Copyright (c) 2009-2024 Tom Keffer <tkeffer@gmail.com>
+#
+#    See the file LICENSE.txt for your full rights.
+#
+"""Test module weewx.dependencies"""
+import os
+import time
+
+import pytest
+
+import weewx.dependencies
+
+# Noon, in local time
+NOON = time.mktime((2024, 6, 15, 12, 0, 0, 0, 0, -1))
+HOUR = 3600
+
+
+class FakeManager:
+
+    def __init__(self, data_binding, last_stamp):
+        self.data_binding = data_binding
+        self.last_stamp = last_stamp
+
+    def lastGoodStamp(self):
+        return self.last_stamp
+
+
+class FakeBinder:
+
+    def __init__(self, **last_stamps):
+        self.managers = {binding: FakeManager(binding, last_stamp)
+                         for binding, last_stamp in last_stamps.items()}
+
+    def get_manager(self, binding):
+        return self.managers[binding]
+
+
+@pytest.fixture
+def setup(tmp_path):
+    config_dict = {'WEEWX_ROOT': str(tmp_path)}
+    skin_dict = {'SKIN_ROOT': 'skins', 'skin': 'Test', 'REPORT_NAME': 'TestReport'}
+    skin_dir = tmp_path / 'skins' / 'Test'
+    skin_dir.mkdir(parents=True)
+    (skin_dir / 'skin.conf').write_text('')
+    output = tmp_path / 'index.html'
+    output.write_text('')
+    return config_dict, skin_dict, str(output), str(tmp_path / '#TestReport.depends')
+
+
+def render(dep_file, output, gen_span, reads):
+    """Pretend to render 'output', while reading the given data."""
+    with weewx.dependencies.track() as deps:
+        for binding, kind, ts in reads:
+            manager = dep_file.db_binder.get_manager(binding)
+            if kind == 'range':
+                weewx.dependencies.add_range(manager, (ts - HOUR, ts))
+            else:
+                weewx.dependencies.add_point(manager, ts)
+    dep_file.add(output, gen_span, deps)
+    dep_file.save()
+
+
+def reopen(config_dict, skin_dict, path, **last_stamps):
+    """Open the dependencies again, as on the next run."""
+    return weewx.dependencies.DependencyFile(path, config_dict, skin_dict,
+                                             FakeBinder(**last_stamps))
+
+
+def test_track():
+    manager = FakeManager('wx_binding', NOON)
+    # Nothing happens, if nothing is being tracked
+    weewx.dependencies.add_range(manager, (NOON - HOUR, NOON))
+    with weewx.dependencies.track() as outer:
+        weewx.dependencies.add_range(manager, (NOON - HOUR, NOON))
+        with weewx.dependencies.track() as inner:
+            weewx.dependencies.add_range(manager, (NOON - 2 * HOUR, NOON - HOUR))
+    assert outer.latest == {'wx_binding': NOON}
+    assert inner.latest == {'wx_binding': NOON - HOUR}
+    assert not outer.volatile
+    with weewx.dependencies.track() as deps:
+        weewx.dependencies.add_point(manager, NOON)
+    assert deps.volatile
+    with weewx.dependencies.track() as deps:
+        # A database not opened through a binding cannot be tracked
+        weewx.dependencies.add_range(object(), (NOON - HOUR, NOON))
+    assert deps.volatile
+
+
+def test_new_data(setup):
+    config_dict, skin_dict, output, path = setup
+    gen_span = (NOON - 24 * HOUR, NOON)
+    dep_file = reopen(config_dict, skin_dict, path, wx_binding=NOON, aux_binding=NOON)
+    assert not dep_file.is_current(output, gen_span)
+    render(dep_file, output, gen_span, [('wx_binding', 'range', NOON),
+                                        ('aux_binding', 'range', NOON - HOUR)])
+
+    # No new data
+    dep_file = reopen(config_dict, skin_dict, path, wx_binding=NOON, aux_binding=NOON)
+    assert dep_file.is_current(output, gen_span)
+    # New data, but after anything that was read
+    dep_file = reopen(config_dict, skin_dict, path, wx_binding=NOON, aux_binding=NOON + 300)
+    assert dep_file.is_current(output, gen_span)
+    # New data that were read
+    render(dep_file, output, gen_span, [('aux_binding', 'range', NOON + HOUR)])
+    dep_file = reopen(config_dict, skin_dict, path, wx_binding=NOON, aux_binding=NOON + 600)
+    assert not dep_file.is_current(output, gen_span)
+    # Data removed
+    dep_file = reopen(config_dict, skin_dict, path, wx_binding=NOON, aux_binding=NOON - 300)
+    assert not dep_file.is_current(output, gen_span)
+
+    # The skin changed
+    dep_file = reopen(config_dict, dict(skin_dict, unit_system='metric'), path,
+                      wx_binding=NOON, aux_binding=NOON + 300)
+    assert not dep_file.is_current(output, gen_span)
+
+    # The file is gone
+    os.remove(output)
+    dep_file = reopen(config_dict, skin_dict, path, wx_binding=NOON, aux_binding=NOON + 300)
+    assert not dep_file.is_current(output, gen_span)
+
+
+def test_new_time(setup):
+    config_dict, skin_dict, output, path = setup
+    gen_span = (NOON - 24 * HOUR, NOON)
+    new_span = (NOON - 24 * HOUR, NOON + 300)
+    yesterday = NOON - 13 * HOUR
+    dep_file = reopen(config_dict, skin_dict, path, wx_binding=NOON)
+    render(dep_file, output, gen_span, [('wx_binding', 'range', yesterday)])
+
+    # Only data from before today were read, so the file is good for the rest of the day
+    dep_file = reopen(config_dict, skin_dict, path, wx_binding=NOON + 300)
+    assert dep_file.is_current(output, new_span)
+    dep_file = reopen(config_dict, skin_dict, path, wx_binding=NOON + 24 * HOUR)
+    assert not dep_file.is_current(output, (NOON, NOON + 24 * HOUR))
+
+    # Anything read at the time of generation depends on that time
+    render(dep_file, output, gen_span, [('wx_binding', 'point', yesterday)])
+    dep_file = reopen(config_dict, skin_dict, path, wx_binding=NOON + 300)
+    assert not dep_file.is_current(output, new_span)
+    render(dep_file, output, gen_span, [('wx_binding', 'range', NOON)])
+    dep_file = reopen(config_dict, skin_dict, path, wx_binding=NOON + 300)
+    assert not dep_file.is_current(output, new_span)
+
+
+def test_nothing_read(setup):
+    config_dict, skin_dict, output, path = setup
+    gen_span = (NOON - 24 * HOUR, NOON)
+    dep_file = reopen(config_dict, skin_dict, path, wx_binding=NOON)
+    render(dep_file, output, gen_span, [])
+    # If nothing was read, there is no telling what the file depends on
+    dep_file = reopen(config_dict, skin_dict, path, wx_binding=NOON)
+    assert not dep_file.is_current(output, gen_span)
+
+
+def test_skin_signature(setup, monkeypatch):
+    config_dict, skin_dict, output, path = setup
+    signature = weewx.dependencies.skin_signature(config_dict, skin_dict)
+    # The other generators of the report do not look at the skin again
+    walks = []
+    monkeypatch.setattr(os, 'walk', lambda top: walks.append(top) or iter([]))
+    assert weewx.dependencies.skin_signature(config_dict, skin_dict) == signature
+    assert not walks
+    monkeypatch.undo()
+    # The next run of the report has a new skin dictionary, so changes are seen
+    skin_conf = os.path.join(config_dict['WEEWX_ROOT'], 'skins', 'Test', 'skin.conf')
+    os.utime(skin_conf, (NOON, NOON))
+    assert weewx.dependencies.skin_signature(config_dict, dict(skin_dict)) != signature
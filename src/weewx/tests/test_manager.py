@@ -26,6 +26,8 @@ import weewx.schemas.wview_small
 import weedb
 import weeutil.logger
 import weewx.manager
+import weewx.xtypes
+from weeutil.weeutil import TimeSpan
 
 log = logging.getLogger(__name__)
 
@@ -114,6 +116,16 @@ class TestSqliteWeights(CommonWeightTests):
     def setup_method(self):
         self.db_manager = setup_database(db_dict_sqlite)
 
+    def test_reweight_by_record(self):
+        """A weight function may look at more than the field 'interval'"""
+        self.db_manager.recalculate_weights(
+            weight_fn=lambda manager, record: 2.0 if record['dateTime'] % 7200 else 1.0,
+            progress_fn=None)
+        result1 = self.db_manager.getSql("SELECT SUM(CASE WHEN dateTime % 7200 THEN 2 ELSE 1 END) "
+                                         "FROM archive WHERE outTemp IS NOT NULL")
+        result2 = self.db_manager.getSql("SELECT SUM(sumtime) FROM archive_day_outTemp")
+        assert result1 == result2
+
     # The patch test is done with sqlite only, because it is so much faster
     def test_patch(self):
         # Sanity check that the original database is at V4.0
@@ -166,3 +178,86 @@ def setup_database(db_dict):
                                                         day_phase_offset=0.0))
 
     return db_manager
+
+
+def test_group_commit():
+    """Test that consecutive calls to addRecord() can share transactions."""
+    try:
+        weedb.drop(db_dict_sqlite)
+    except weedb.NoDatabaseError:
+        pass
+    with weewx.manager.DaySummaryManager.open_with_create(db_dict_sqlite,
+                                                          schema=schema) as db_manager:
+        records = list(gen_fake_data.gen_fake_records(start_ts, stop_ts, interval=interval_secs))
+        with db_manager.start_group_commit(max_records=100) as group:
+            for record in records[:150]:
+                db_manager.addRecord(record, log_success=False)
+            # One tranche of 100 should have been committed, leaving 50 in the open transaction
+            assert group.nrecs == 50
+            assert db_manager.group_commit is group
+        assert db_manager.group_commit is None
+        assert db_manager.getSql("SELECT COUNT(*) FROM archive")[0] == 150
+        assert db_manager.last_timestamp == records[149]['dateTime']
+
+        # If an exception occurs, records in the open transaction should be rolled back
+        with pytest.raises(ZeroDivisionError):
+            with db_manager.start_group_commit(max_records=100):
+                for record in records[150:200]:
+                    db_manager.addRecord(record, log_success=False)
+                1 / 0
+        assert db_manager.getSql("SELECT COUNT(*) FROM archive")[0] == 150
+        assert db_manager.last_timestamp == records[149]['dateTime']
+
+        # Group commits cannot be nested
+        with db_manager.start_group_commit():
+            with pytest.raises(weewx.ViolatedPrecondition):
+                with db_manager.start_group_commit():
+                    pass
+
+
+def test_backfill_pending():
+    """Test adding records while the daily summaries are being backfilled elsewhere."""
+    try:
+        weedb.drop(db_dict_sqlite)
+    except weedb.NoDatabaseError:
+        pass
+    with weewx.manager.DaySummaryManager.open_with_create(db_dict_sqlite,
+                                                          schema=schema) as db_manager:
+        db_manager.backfill_pending = True
+        db_manager.addRecord(gen_fake_data.gen_fake_records(start_ts, stop_ts,
+                                                            interval=interval_secs))
+        # Only the main archive table should have been updated
+        assert db_manager.getSql("SELECT COUNT(*) FROM archive")[0] > 0
+        assert db_manager.getSql("SELECT COUNT(*) FROM archive_day_outTemp")[0] == 0
+        assert db_manager.last_update is None
+        span = TimeSpan(int(time.mktime(start_d.timetuple())), mid_ts)
+        # If it is not known what the daily summaries include, they are assumed to be complete
+        weewx.xtypes.DailySummaries.check_eligibility('outTemp', span, db_manager, 'max')
+        # As StdArchive does before a background backfill, say that they include nothing yet
+        with weedb.Transaction(db_manager.connection) as cursor:
+            db_manager._write_metadata('lastUpdate', '0', cursor)
+        expected = weewx.xtypes.ArchiveTable.get_aggregate('outTemp', span, 'max', db_manager)
+        # The daily summaries cannot be used, so the archive table will be used instead
+        with pytest.raises(weewx.UnknownAggregation):
+            weewx.xtypes.DailySummaries.get_aggregate('outTemp', span, 'max', db_manager)
+        assert weewx.xtypes.get_aggregate('outTemp', span, 'max', db_manager) == expected
+
+        # Backfill part of the way, stopping after four transactions
+        calls = []
+        db_manager.backfill_day_summary(progress_fn=None, trans_days=2,
+                                        abort_fn=lambda: calls.append(1) or len(calls) > 4)
+        assert db_manager.last_update < db_manager.last_timestamp
+        # The daily summaries can now be used for the days they cover, but not beyond
+        assert weewx.xtypes.DailySummaries.get_aggregate('outTemp', span, 'max',
+                                                         db_manager) == expected
+        with pytest.raises(weewx.UnknownAggregation):
+            weewx.xtypes.DailySummaries.get_aggregate('outTemp',
+                                                      TimeSpan(span.start, stop_ts),
+                                                      'max', db_manager)
+
+        # Pick up where it left off
+        db_manager.backfill_pending = False
+        db_manager.backfill_day_summary(progress_fn=None)
+        assert db_manager.last_update == db_manager.last_timestamp
+        weewx.xtypes.DailySummaries.get_aggregate('outTemp', TimeSpan(span.start, stop_ts),
+                                                  'max', db_manager)
@@ -0,0 +1,160 @@
+#
+#    Copyright (c) 2009-2024 Tom Keffer <tkeffer@gmail.com>
+#
+#    See the file LICENSE.txt for your full rights.
+#
+"""Test module weewx.metrics"""
+import http.client
+import json
+import queue
+import socket
+
+import configobj
+
+import weedb
+import weewx
+import weewx.engine
+import weewx.metrics
+
+CONFIG = """
+[Station]
+    station_type = Simulator
+    altitude = 700, foot
+    latitude = 45.0
+    longitude = -122.0
+[Engine]
+    [[Services]]
+"""
+
+
+class Uploader(weewx.engine.StdService):
+    """Stands in for a RESTful service, with a backlog in its queue."""
+
+    def __init__(self, engine, config_dict):
+        super().__init__(engine, config_dict)
+        self.archive_queue = queue.Queue()
+        for i in range(3):
+            self.archive_queue.put({'dateTime': i})
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, path):
+        super().__init__('localhost')
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def get(path, url):
+    connection = UnixHTTPConnection(path)
+    try:
+        connection.request('GET', url)
+        response = connection.getresponse()
+        return response.status, response.read().decode('utf-8')
+    finally:
+        connection.close()
+
+
+def test_metrics(tmp_path, monkeypatch):
+    monkeypatch.setattr(weedb, 'statement_stats', None)
+    socket_path = str(tmp_path / 'metrics.sock')
+    config_dict = configobj.ConfigObj(CONFIG.splitlines())
+    config_dict['StdMetrics'] = {'socket': socket_path}
+    engine = weewx.engine.DummyEngine(config_dict)
+    assert engine.metrics is None
+    service = weewx.metrics.StdMetrics(engine, config_dict)
+    engine.service_obj = [service, Uploader(engine, config_dict)]
+    engine.dispatchEvent(weewx.Event(weewx.STARTUP))
+    try:
+        engine.metrics.add_loop(1, 0.0015)
+        engine.metrics.add_loop(10, 0.3)
+        engine.metrics.add_archive_write(0.01)
+        engine.metrics.add_gc(100, 0.5)
+        with weedb.connect({'driver': 'weedb.sqlite', 'database_name': ':memory:'}) as conn:
+            conn.execute("CREATE TABLE foo (x INTEGER)")
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO foo VALUES (?)", (1,))
+            cursor.execute("SELECT x FROM foo")
+            cursor.close()
+
+        status, body = get(socket_path, '/metrics.json')
+        assert status == 200
+        metrics_dict = json.loads(body)
+        assert metrics_dict['loop_packets'] == 11
+        assert metrics_dict['loop_dispatch']['count'] == 2
+        assert metrics_dict['archive_write']['count'] == 1
+        assert metrics_dict['gc']['collected'] == 100
+        assert metrics_dict['restful_queues'] == {'Uploader': {'archive': 3}}
+        assert {kind: stat['count'] for kind, stat in metrics_dict['db_statements'].items()} \
+               == {'create': 1, 'insert': 1, 'select': 1}
+
+        status, body = get(socket_path, '/metrics')
+        assert status == 200
+        lines = body.splitlines()
+        assert 'weewx_loop_packets_total 11' in lines
+        assert 'weewx_loop_dispatch_seconds_bucket{le="0.002"} 1' in lines
+        assert 'weewx_loop_dispatch_seconds_bucket{le="+Inf"} 2' in lines
+        assert 'weewx_restful_queue_depth{service="Uploader",queue="archive"} 3' in lines
+        assert 'weewx_db_statements_total{statement="select"} 1' in lines
+
+        status, _ = get(socket_path, '/foo')
+        assert status == 404
+    finally:
+        service.shutDown()
+    # Once shut down, nothing collects metrics any more
+    assert engine.metrics is None
+    assert weedb.statement_stats is None
+
+
+def test_take_over(tmp_path, monkeypatch):
+    monkeypatch.setattr(weedb, 'statement_stats', None)
+    config_dict = configobj.ConfigObj(CONFIG.splitlines())
+    config_dict['StdMetrics'] = {'socket': str(tmp_path / 'metrics.sock')}
+    engine = weewx.engine.DummyEngine(config_dict)
+    old = weewx.metrics.StdMetrics(engine, config_dict)
+    old.startup(None)
+    metrics, statement_stats = engine.metrics, weedb.statement_stats
+    # As after a reload: the new instance is created, then the old one is shut down
+    new = weewx.metrics.StdMetrics(engine, config_dict)
+    new.take_over(old)
+    old.shutDown()
+    try:
+        assert engine.metrics is metrics
+        assert weedb.statement_stats is statement_stats
+        assert new.server is not None
+    finally:
+        new.shutDown()
+    assert engine.metrics is None
+    assert weedb.statement_stats is None
+
+
+def test_loopback(monkeypatch):
+    monkeypatch.setattr(weedb, 'statement_stats', None)
+    # Find a free port
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    config_dict = configobj.ConfigObj(CONFIG.splitlines())
+    config_dict['StdMetrics'] = {'host': '0.0.0.0', 'port': str(port)}
+    engine = weewx.engine.DummyEngine(config_dict)
+
+    # Not served to other computers, unless asked for
+    service = weewx.metrics.StdMetrics(engine, config_dict)
+    service.startup(None)
+    assert service.server is None
+
+    config_dict['StdMetrics']['host'] = '127.0.0.1'
+    service = weewx.metrics.StdMetrics(engine, config_dict)
+    service.startup(None)
+    try:
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        connection.request('GET', '/metrics.json')
+        response = connection.getresponse()
+        assert response.status == 200
+        assert json.loads(response.read().decode('utf-8'))['loop_packets'] == 0
+        connection.close()
+    finally:
+        service.shutDown()
@@ -0,0 +1,162 @@
+#
+#    Copyright (c) 2009-2024 Tom Keffer <tkeffer@gmail.com>
+#
+#    See the file LICENSE.txt for your full rights.
+#
+"""Test module weewx.profiler"""
+import json
+import threading
+import time
+
+import pytest
+
+import weewx
+import weewx.profiler
+
+
+class Service:
+    """A service with one fast and one slow callback."""
+
+    def fast(self, event):
+        pass
+
+    def slow(self, event):
+        time.sleep(0.02)
+
+    def broken(self, event):
+        raise weewx.ViolatedPrecondition("Oops")
+
+
+def test_histogram():
+    hist = weewx.profiler.Histogram()
+    assert hist.mean is None
+    assert hist.percentile(95) is None
+    for i in range(100):
+        hist.add(0.0015 if i < 90 else 0.3)
+    assert hist.count == 100
+    assert hist.mean == pytest.approx(0.03135)
+    assert hist.max == 0.3
+    assert hist.buckets[4] == 90
+    assert hist.buckets[11] == 10
+    assert hist.percentile(50) == 0.002
+    # Never report more than the maximum
+    assert hist.percentile(95) == 0.3
+
+
+def test_histogram_snapshot():
+    hist = weewx.profiler.Histogram()
+    stop = threading.Event()
+
+    def add():
+        while not stop.is_set():
+            hist.add(0.0015)
+
+    thread = threading.Thread(target=add)
+    thread.start()
+    try:
+        for _ in range(1000):
+            hist_dict = hist.to_dict()
+            assert sum(hist_dict['buckets']) == hist_dict['count']
+    finally:
+        stop.set()
+        thread.join()
+
+
+def test_dispatch(tmp_path):
+    service = Service()
+    profile_file = str(tmp_path / 'profile.json')
+    profiler = weewx.profiler.DispatchProfiler(log_interval=0, loop_budget=0.01,
+                                               profile_file=profile_file)
+    event = weewx.Event(weewx.NEW_LOOP_PACKET, packet={})
+    for i in range(3):
+        profiler.dispatch(event, [service.fast, service.slow])
+
+    callbacks = profiler.callbacks['NEW_LOOP_PACKET']
+    assert callbacks['test_profiler.Service.fast'].count == 3
+    assert callbacks['test_profiler.Service.slow'].mean >= 0.02
+    assert profiler.events['NEW_LOOP_PACKET'].count == 3
+    # The slow callback should have been blamed each time
+    assert profiler.over_budget == {'test_profiler.Service.slow': 3}
+
+    # Exceptions are timed, then passed through
+    with pytest.raises(weewx.ViolatedPrecondition):
+        profiler.dispatch(weewx.Event(weewx.CHECK_LOOP), [service.broken])
+    assert profiler.callbacks['CHECK_LOOP']['test_profiler.Service.broken'].count == 1
+
+    profiler.save()
+    with open(profile_file) as fd:
+        profile_dict = json.load(fd)
+    lines = weewx.profiler.format_profile(profile_dict)
+    # Header, two event types, three callbacks, and one callback over budget
+    assert len(lines) == 7
+    # The slowest callback comes first
+    assert 'Service.slow' in lines[lines.index(next(l for l in lines
+                                                    if l.startswith('NEW_LOOP'))) + 1]
+
+
+def test_startup():
+    service = Service()
+    profiler = weewx.profiler.StartupProfiler()
+    with profiler.timing('import', 'test_profiler'):
+        pass
+    profiler.dispatch(weewx.Event(weewx.STARTUP), [service.fast, service.slow])
+    assert [step[:2] for step in profiler.steps] == [
+        ('import', 'test_profiler'),
+        ('STARTUP', 'test_profiler.Service.fast'),
+        ('STARTUP', 'test_profiler.Service.slow')]
+    assert profiler.steps[2][2] >= 0.02
+    # Make sure the summary can be logged
+    profiler.log_summary()
+
+
+def test_allocations(caplog):
+    tracker = weewx.profiler.AllocationTracker(interval=0, top=3)
+    try:
+        hoard = [str(i) * 10 for i in range(10000)]
+        with caplog.at_level('INFO', logger='weewx.profiler'):
+            tracker.check()
+    finally:
+        tracker.stop()
+    lines = [r.getMessage() for r in caplog.records]
+    assert lines[0].startswith('Memory allocations over the last')
+    # The biggest allocation was the hoard
+    assert 'test_profiler.py' in lines[1]
+    assert 1 < len(lines) <= 4
+    assert len(hoard) == 10000
+
+
+def test_report_profiler():
+    profiler = weewx.profiler.ReportProfiler()
+    # Nothing is recorded unless the profiler is active
+    with weewx.profiler.report_timing('report', 'Ignored'):
+        with weewx.profiler.tag_timing('day', 'outTemp', 'max'):
+            pass
+    assert weewx.profiler.get_report_profiler() is None
+
+    with profiler.activate():
+        assert weewx.profiler.get_report_profiler() is profiler
+        with weewx.profiler.report_timing('report', 'SeasonsReport'):
+            with weewx.profiler.report_timing('generator', 'CheetahGenerator'):
+                with weewx.profiler.report_timing('template', 'index.html'):
+                    for i in range(3):
+                        with weewx.profiler.tag_timing('day', 'outTemp', 'max'):
+                            time.sleep(0.001)
+                    with pytest.raises(AttributeError):
+                        with weewx.profiler.tag_timing('month', 'foo', 'min'):
+                            raise AttributeError('foo')
+    assert weewx.profiler.get_report_profiler() is None
+
+    profile_dict = json.loads(json.dumps(profiler.to_dict()))
+    assert [entry[:3] for entry in profile_dict['timings']] \
+           == [[0, 'report', 'SeasonsReport'],
+               [1, 'generator', 'CheetahGenerator'],
+               [2, 'template', 'index.html']]
+    assert profile_dict['timings'][0][3] >= profile_dict['timings'][2][3] >= 0.003
+    assert profile_dict['tags']['day.outTemp.max']['count'] == 3
+    assert profile_dict['tags']['month.foo.min']['count'] == 1
+
+    lines = weewx.profiler.format_report_profile(profile_dict, top=1)
+    assert lines[3].startswith('    index.html')
+    assert lines[6].startswith('$day.outTemp.max')
+    assert lines[7] == '... and 1 more'
+    assert lines[8].startswith('4 tags evaluated')
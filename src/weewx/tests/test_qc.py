@@ -0,0 +1,68 @@
+#
+#    Copyright (c) 2009-2024 Tom Keffer <tkeffer@gmail.com>
+#
+#    See the file LICENSE.txt for your full rights.
+#
+"""Test quality control and calibration"""
+import configobj
+import pytest
+
+import weewx
+import weewx.engine
+import weewx.qc
+
+MM_DICT = {'outTemp': ['-40', '120', 'degree_F'],
+           'outHumidity': ['0', '100']}
+
+CALIBRATE = """
+[StdCalibrate]
+    [[Corrections]]
+        outTemp = outTemp + 1.0
+        barometer = barometer * 2, loop
+        rain = rain / 2, archive
+        windDir = "math.fmod(windDir + 350, 360)"
+"""
+
+
+class FakeEngine:
+    def bind(self, event_type, callback):
+        pass
+
+
+def test_qc():
+    qc = weewx.qc.QC(MM_DICT, log_failure=False)
+    record = {'dateTime': 1, 'usUnits': weewx.US, 'outTemp': 121.0, 'outHumidity': 50.0}
+    qc.apply_qc(record)
+    assert record['outTemp'] is None
+    assert record['outHumidity'] == 50.0
+
+    # The limits should be converted to the unit system of the data. The upper limit of 120F
+    # is 48.9C.
+    record = {'dateTime': 1, 'usUnits': weewx.METRIC, 'outTemp': 48.5, 'outHumidity': None}
+    qc.apply_qc(record)
+    assert record['outTemp'] == 48.5
+    record = {'dateTime': 1, 'usUnits': weewx.METRIC, 'outTemp': 49.0, 'outHumidity': 101.0}
+    qc.apply_qc(record)
+    assert record == {'dateTime': 1, 'usUnits': weewx.METRIC, 'outTemp': None,
+                      'outHumidity': None}
+    # Each unit system should have been converted just once
+    assert sorted(qc.limits) == [weewx.US, weewx.METRIC]
+    assert dict((k, (lo, hi)) for k, lo, hi in qc.limits[weewx.METRIC])['outTemp'] \
+           == pytest.approx((-40.0, 48.8888888))
+
+
+@pytest.mark.parametrize("event_type, origin, expected", [
+    (weewx.NEW_LOOP_PACKET, None, (21.0, 2000.0, 1.0, 10.0)),
+    (weewx.NEW_ARCHIVE_RECORD, 'hardware', (21.0, 1000.0, 0.5, 10.0)),
+    (weewx.NEW_ARCHIVE_RECORD, 'software', (20.0, 1000.0, 0.5, 20.0))])
+def test_calibrate(event_type, origin, expected):
+    config_dict = configobj.ConfigObj(CALIBRATE.splitlines())
+    calibrate = weewx.engine.StdCalibrate(FakeEngine(), config_dict)
+    data = {'dateTime': 1, 'usUnits': weewx.US, 'outTemp': 20.0, 'barometer': 1000.0,
+            'rain': 1.0, 'windDir': 20.0}
+    if event_type == weewx.NEW_LOOP_PACKET:
+        calibrate.new_loop_packet(weewx.Event(event_type, packet=data))
+    else:
+        calibrate.new_archive_record(weewx.Event(event_type, record=data, origin=origin))
+    assert (data['outTemp'], data['barometer'], data['rain'],
+            data['windDir']) == pytest.approx(expected)
@@ -6,6 +6,9 @@
 """Test algorithms in the Report Engine"""
 
 import logging
+import os
+import threading
+import time
 from pathlib import Path
 
 import pytest
@@ -14,6 +17,7 @@ import weeutil.config
 import weeutil.logger
 import weeutil.weeutil
 import weewx
+import weewx.reportengine
 from weewx.reportengine import build_skin_dict
 
 log = logging.getLogger(__name__)
@@ -196,3 +200,210 @@ def test_global_override_log_specs(config_dict):
     config_dict['log_success'] = False
     skin_dict = build_skin_dict(config_dict, 'SeasonsReport')
     assert not skin_dict['log_success']
+
+
+class SlowGenerator(weewx.reportengine.ReportGenerator):
+    """Takes a while, then writes the process ID to a file"""
+    waits_for = None
+
+    def run(self):
+        time.sleep(0.2)
+        html_dir = Path(self.config_dict['WEEWX_ROOT'], self.skin_dict['HTML_ROOT'])
+        html_dir.mkdir(parents=True, exist_ok=True)
+        (html_dir / 'slow.txt').write_text(str(os.getpid()))
+
+
+class CheckGenerator(weewx.reportengine.ReportGenerator):
+    """Copies the file written by SlowGenerator, which must have finished. Generators wait
+    for the others of their report, unless they say otherwise."""
+
+    def run(self):
+        html_dir = Path(self.config_dict['WEEWX_ROOT'], self.skin_dict['HTML_ROOT'])
+        (html_dir / 'check.txt').write_text((html_dir / 'slow.txt').read_text())
+
+
+class FinalGenerator(weewx.reportengine.ReportGenerator):
+    """Lists the reports that CheckGenerator has finished. It waits for all the reports before
+    it, so its own, and those before it, are finished."""
+    waits_for = 'all'
+
+    def run(self):
+        html_dir = Path(self.config_dict['WEEWX_ROOT'], self.skin_dict['HTML_ROOT'])
+        (html_dir / 'final.txt').write_text(
+            ' '.join(sorted(p.parent.name for p in html_dir.parent.glob('*/check.txt'))))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_report_workers(tmp_path, workers):
+    config_dict = weeutil.config.config_from_str(f"""
+WEEWX_ROOT = {tmp_path}
+[StdReport]
+    SKIN_ROOT = skins
+    report_workers = {workers}
+    [[ReportA]]
+        skin = Test
+        HTML_ROOT = html/a
+    [[ReportB]]
+        skin = Test
+        HTML_ROOT = html/b
+""")
+    skin_dir = tmp_path / 'skins' / 'Test'
+    skin_dir.mkdir(parents=True)
+    (skin_dir / 'skin.conf').write_text("[Generators]\n"
+                                        "    generator_list = test_reportengine.SlowGenerator, "
+                                        "test_reportengine.CheckGenerator, "
+                                        "test_reportengine.FinalGenerator\n")
+
+    weewx.reportengine.StdReportEngine(config_dict, None).run()
+    for report in ('a', 'b'):
+        pid = int((tmp_path / 'html' / report / 'check.txt').read_text())
+        # With workers, the slow generators ran in other processes
+        assert (pid == os.getpid()) == (workers == 1)
+    assert (tmp_path / 'html' / 'a' / 'final.txt').read_text() == 'a'
+    assert (tmp_path / 'html' / 'b' / 'final.txt').read_text() == 'a b'
+
+
+class DyingGenerator(weewx.reportengine.ReportGenerator):
+    """Kills the report worker it runs in"""
+    waits_for = None
+
+    def run(self):
+        if os.getpid() != int(self.skin_dict['parent_pid']):
+            os._exit(1)
+
+
+def test_report_worker_dies(tmp_path):
+    config_dict = weeutil.config.config_from_str(f"""
+WEEWX_ROOT = {tmp_path}
+[StdReport]
+    SKIN_ROOT = skins
+    report_workers = 2
+    [[ReportA]]
+        skin = Dying
+        HTML_ROOT = html/a
+        parent_pid = {os.getpid()}
+""")
+    for skin, generators in (('Dying', 'DyingGenerator'), ('Test', 'CountGenerator')):
+        skin_dir = tmp_path / 'skins' / skin
+        skin_dir.mkdir(parents=True)
+        (skin_dir / 'skin.conf').write_text("[Generators]\n"
+                                            "    generator_list = test_reportengine.%s\n"
+                                            % generators)
+
+    weewx.reportengine.StdReportEngine(config_dict, None).run()
+    # The broken pool has been let go, so the next run starts a new one
+    assert weewx.reportengine._report_pool is None
+    config_dict['StdReport']['ReportA']['skin'] = 'Test'
+    weewx.reportengine.StdReportEngine(config_dict, None).run()
+    pid, runs = (int(x) for x in (tmp_path / 'html' / 'a' / 'count.txt').read_text().split())
+    assert pid != os.getpid()
+    weewx.reportengine._report_pool.shutdown()
+    weewx.reportengine._report_pool = None
+
+
+class CountGenerator(weewx.reportengine.ReportGenerator):
+    """Writes the process ID, and how many times it has run in that process"""
+    runs = 0
+
+    def run(self):
+        CountGenerator.runs += 1
+        html_dir = Path(self.config_dict['WEEWX_ROOT'], self.skin_dict['HTML_ROOT'])
+        html_dir.mkdir(parents=True, exist_ok=True)
+        (html_dir / 'count.txt').write_text("%d %d" % (os.getpid(), CountGenerator.runs))
+
+
+def test_report_process(tmp_path):
+    config_dict = weeutil.config.config_from_str(f"""
+WEEWX_ROOT = {tmp_path}
+[StdReport]
+    SKIN_ROOT = skins
+    [[ReportA]]
+        skin = Test
+        HTML_ROOT = html
+""")
+    skin_dir = tmp_path / 'skins' / 'Test'
+    skin_dir.mkdir(parents=True)
+    (skin_dir / 'skin.conf').write_text("[Generators]\n"
+                                        "    generator_list = test_reportengine.CountGenerator\n")
+
+    report_process = weewx.reportengine.ReportProcess(config_dict, None)
+    try:
+        for run in (1, 2):
+            report_process.start(None, first_run=run == 1)
+            # Another thread asks whether the reports are running, while this one waits
+            watcher = threading.Thread(target=lambda: [report_process.is_alive()
+                                                       for _ in range(1000)])
+            watcher.start()
+            report_process.join(30.0)
+            watcher.join(30.0)
+            assert not watcher.is_alive()
+            assert not report_process.is_alive()
+            assert report_process.start_ts <= report_process.stop_ts
+            pid, runs = (int(x) for x in (tmp_path / 'html' / 'count.txt').read_text().split())
+            # The reports ran in the same process each time, which kept its state
+            assert pid == report_process.process.pid != os.getpid()
+            assert runs == run
+    finally:
+        report_process.close()
+    assert not report_process.is_running()
+    assert CountGenerator.runs == 0
+
+
+def test_report_process_workers(tmp_path):
+    config_dict = weeutil.config.config_from_str(f"""
+WEEWX_ROOT = {tmp_path}
+[StdReport]
+    SKIN_ROOT = skins
+    report_workers = 2
+    [[ReportA]]
+        skin = Test
+        HTML_ROOT = html
+""")
+    skin_dir = tmp_path / 'skins' / 'Test'
+    skin_dir.mkdir(parents=True)
+    (skin_dir / 'skin.conf').write_text("[Generators]\n"
+                                        "    generator_list = test_reportengine.SlowGenerator, "
+                                        "test_reportengine.CheckGenerator\n")
+
+    report_process = weewx.reportengine.ReportProcess(config_dict, None)
+    try:
+        report_process.start(None, first_run=True)
+        report_process.join(30.0)
+        assert not report_process.is_alive()
+        # The report process ran the generators in a pool of its own
+        pid = int((tmp_path / 'html' / 'check.txt').read_text())
+        assert pid not in (os.getpid(), report_process.process.pid)
+    finally:
+        report_process.close()
+    assert not report_process.is_running()
+
+
+def test_skin_dict_cache(tmp_path):
+    config_dict = weeutil.config.config_from_str(f"""
+WEEWX_ROOT = {tmp_path}
+[StdReport]
+    SKIN_ROOT = skins
+    [[ReportA]]
+        skin = Test
+""")
+    skin_dir = tmp_path / 'skins' / 'Test'
+    (skin_dir / 'lang').mkdir(parents=True)
+    (skin_dir / 'skin.conf').write_text("lang = de\nmessage = one\n")
+    (skin_dir / 'lang' / 'de.conf').write_text("[Texts]\n    greeting = Hallo\n")
+
+    skin_dict = build_skin_dict(config_dict, 'ReportA')
+    assert skin_dict['message'] == 'one'
+    assert skin_dict['Texts']['greeting'] == 'Hallo'
+    # A copy is handed out, so changing it does not change the next one
+    skin_dict['message'] = 'changed'
+    assert build_skin_dict(config_dict, 'ReportA')['message'] == 'one'
+
+    # Changes to the skin configuration, the language files, or the configuration are seen
+    (skin_dir / 'skin.conf').write_text("lang = de\nmessage = two\n")
+    os.utime(skin_dir / 'skin.conf', (time.time() + 10, time.time() + 10))
+    assert build_skin_dict(config_dict, 'ReportA')['message'] == 'two'
+    (skin_dir / 'lang' / 'lang_ext').mkdir()
+    (skin_dir / 'lang' / 'lang_ext' / 'de.conf').write_text("[Texts]\n    farewell = Tschüss\n")
+    assert build_skin_dict(config_dict, 'ReportA')['Texts']['farewell'] == 'Tschüss'
+    config_dict['StdReport']['ReportA']['message'] = 'three'
+    assert build_skin_dict(config_dict, 'ReportA')['message'] == 'three'
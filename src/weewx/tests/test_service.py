@@ -0,0 +1,472 @@
+#
+#    Copyright (c) 2009-2024 Tom Keffer <tkeffer@gmail.com>
+#
+#    See the file LICENSE.txt for your full rights.
+#
+"""Test asynchronous services, services that take LOOP packets in batches, and reloading
+the configuration"""
+import threading
+
+import configobj
+import pytest
+
+import weedb
+import weeutil.config
+import weeutil.weeutil
+import weewx
+import weewx.accum
+import weewx.engine
+
+CONFIG = """
+[Station]
+    station_type = Simulator
+    altitude = 700, foot
+    latitude = 45.0
+    longitude = -122.0
+[Engine]
+    [[Services]]
+"""
+
+
+class Consumer(weewx.engine.StdService):
+    """A service that only looks at the data."""
+
+    asynchronous = True
+
+    def __init__(self, engine, config_dict):
+        super().__init__(engine, config_dict)
+        self.packets = []
+        self.threads = set()
+        # Set to hold up the worker thread
+        self.gate = threading.Event()
+        self.gate.set()
+        # Set once the worker thread has taken a packet
+        self.taken = threading.Event()
+        self.bind(weewx.NEW_LOOP_PACKET, self.new_loop_packet)
+        self.bind(weewx.CHECK_LOOP, self.check_loop)
+
+    def new_loop_packet(self, event):
+        self.taken.set()
+        self.gate.wait()
+        self.threads.add(threading.current_thread().name)
+        self.packets.append(event.packet)
+
+    def check_loop(self, event):
+        self.threads.add(threading.current_thread().name)
+
+
+def get_config():
+    return configobj.ConfigObj(CONFIG.splitlines())
+
+
+def test_async():
+    config_dict = get_config()
+    engine = weewx.engine.DummyEngine(config_dict)
+    consumer = Consumer(engine, config_dict)
+    packet = {'dateTime': 1, 'usUnits': 1, 'outTemp': 20.0}
+    engine.dispatchEvent(weewx.Event(weewx.NEW_LOOP_PACKET, packet=packet))
+    engine.dispatchEvent(weewx.Event(weewx.CHECK_LOOP, packet=packet))
+    # Changes made after the event was dispatched should not show through
+    packet['outTemp'] = 25.0
+    consumer.stop_worker()
+    assert consumer.packets == [{'dateTime': 1, 'usUnits': 1, 'outTemp': 20.0}]
+    # The LOOP packet was handled by the worker, CHECK_LOOP by the main thread
+    assert consumer.threads == {'Consumer-worker', threading.main_thread().name}
+
+
+@pytest.mark.parametrize("overflow, expected", [('drop_oldest', [0, 8, 9]),
+                                                ('drop_newest', [0, 1, 2])])
+def test_overflow(overflow, expected):
+    config_dict = get_config()
+    config_dict['Engine']['async_queue_size'] = '2'
+    config_dict['Engine']['async_overflow'] = overflow
+    engine = weewx.engine.DummyEngine(config_dict)
+    consumer = Consumer(engine, config_dict)
+    consumer.gate.clear()
+    engine.dispatchEvent(weewx.Event(weewx.NEW_LOOP_PACKET, packet={'dateTime': 0}))
+    # Wait for the worker to pick up the first packet, so the queue is empty
+    assert consumer.taken.wait(5.0)
+    for i in range(1, 10):
+        engine.dispatchEvent(weewx.Event(weewx.NEW_LOOP_PACKET, packet={'dateTime': i}))
+    assert consumer._worker.dropped == 7
+    consumer.gate.set()
+    consumer.stop_worker()
+    assert [p['dateTime'] for p in consumer.packets] == expected
+
+
+def test_overflow_stop():
+    config_dict = get_config()
+    config_dict['Engine']['async_queue_size'] = '2'
+    engine = weewx.engine.DummyEngine(config_dict)
+    consumer = Consumer(engine, config_dict)
+    worker = consumer._worker
+    consumer.gate.clear()
+    engine.dispatchEvent(weewx.Event(weewx.NEW_LOOP_PACKET, packet={'dateTime': 0}))
+    assert consumer.taken.wait(5.0)
+    # Stop the worker while it is busy, then keep on dispatching. The events that come in
+    # must not push out the signal to stop.
+    stopper = threading.Thread(target=consumer.stop_worker, kwargs={'timeout': 2})
+    stopper.start()
+    assert worker.stopping.wait(5.0)
+    for i in range(1, 10):
+        engine.dispatchEvent(weewx.Event(weewx.NEW_LOOP_PACKET, packet={'dateTime': i}))
+    consumer.gate.set()
+    stopper.join(5.0)
+    assert not worker.is_alive()
+    assert [p['dateTime'] for p in consumer.packets] == [0]
+
+
+def test_config(monkeypatch):
+    config_dict = get_config()
+    config_dict['Engine']['async_services'] = 'weewx.engine.StdPrint'
+    engine = weewx.engine.DummyEngine(config_dict)
+    # Class attribute set to False, but the configuration overrides it
+    monkeypatch.setattr(weewx.engine.StdPrint, 'asynchronous', False)
+    service = weewx.engine.StdPrint(engine, config_dict)
+    assert service.asynchronous
+    assert service._worker.is_alive()
+    service.stop_worker()
+    assert service._worker is None
+
+    with pytest.raises(ValueError):
+        weewx.engine.ServiceWorker('Bad', overflow='sometimes')
+
+
+class Doubler(weewx.engine.StdService):
+    """A service that takes one packet at a time, and replaces it."""
+
+    def __init__(self, engine, config_dict):
+        super().__init__(engine, config_dict)
+        self.bind(weewx.NEW_LOOP_PACKET, self.new_loop_packet)
+
+    def new_loop_packet(self, event):
+        event.packet = dict(event.packet, outTemp=event.packet['outTemp'] * 2)
+
+
+class BatchConsumer(weewx.engine.StdService):
+    """A service that takes packets in batches."""
+
+    def __init__(self, engine, config_dict):
+        super().__init__(engine, config_dict)
+        self.batches = []
+        self.checked = []
+        self.bind(weewx.NEW_LOOP_PACKET, self.new_loop_packet)
+        self.bind(weewx.CHECK_LOOP, self.check_loop)
+
+    def new_loop_packet(self, event):
+        raise AssertionError("Should have been given the whole batch")
+
+    def new_loop_packets(self, packets):
+        self.batches.append([p['outTemp'] for p in packets])
+
+    def check_loop(self, event):
+        self.checked.append(event.packet['outTemp'])
+        if event.packet['dateTime'] == 2:
+            raise weewx.engine.BreakLoop
+
+
+def test_loop_batch():
+    config_dict = get_config()
+    engine = weewx.engine.DummyEngine(config_dict)
+    doubler = Doubler(engine, config_dict)
+    consumer = BatchConsumer(engine, config_dict)
+    packets = [{'dateTime': i, 'usUnits': 1, 'outTemp': float(i)} for i in range(4)]
+    with pytest.raises(weewx.engine.BreakLoop):
+        engine.dispatchLoopBatch(packets)
+    # One call for the batch, which saw the packets replaced by the Doubler
+    assert consumer.batches == [[0.0, 2.0, 4.0, 6.0]]
+    # Each packet was checked, until the loop was broken
+    assert consumer.checked == [0.0, 2.0, 4.0]
+
+
+def test_archive_batch():
+    config_dict = get_config()
+    config_dict['StdArchive'] = {'archive_interval': '300'}
+    engine = weewx.engine.DummyEngine(config_dict)
+    # Every tenth packet lacks inTemp. The packets cross an archive interval.
+    packets = [{'dateTime': 1700000000 + 10 * i, 'usUnits': 1, 'outTemp': 20.0 + i % 7,
+                'windSpeed': 1.0 + i % 3, 'windDir': 10.0 * i, 'rain': 0.01}
+               for i in range(50)]
+    for i, packet in enumerate(packets):
+        if i % 10:
+            packet['inTemp'] = 70.0 + i % 5
+
+    one_at_a_time = weewx.engine.StdArchive(engine, config_dict)
+    for packet in packets:
+        one_at_a_time.new_loop_packet(weewx.Event(weewx.NEW_LOOP_PACKET, packet=packet))
+    batched = weewx.engine.StdArchive(engine, config_dict)
+    batched.new_loop_packets(packets)
+
+    assert batched.old_accumulator.getRecord() \
+           == pytest.approx(one_at_a_time.old_accumulator.getRecord())
+    assert batched.accumulator.getRecord() \
+           == pytest.approx(one_at_a_time.accumulator.getRecord())
+
+
+def test_archive_batch_periods():
+    config_dict = get_config()
+    config_dict['StdArchive'] = {'archive_interval': '300', 'record_generation': 'software'}
+    engine = weewx.engine.DummyEngine(config_dict)
+    archive = weewx.engine.StdArchive(engine, config_dict)
+    # Catch the archive records, rather than let them go to the database
+    records = []
+    engine.callbacks.clear()
+    engine.bind(weewx.NEW_ARCHIVE_RECORD, lambda event: records.append(event.record))
+    # Packets 20 seconds apart, covering three archive periods
+    archive.new_loop_packets([{'dateTime': 1699999800 + 20 * i, 'usUnits': 1, 'outTemp': i}
+                              for i in range(1, 40)])
+    archive.end_archive_period_ts = 1700000400
+    archive.post_loop(None)
+    # Both periods that ended should have been processed, in order
+    assert [(r['dateTime'], r['outTemp']) for r in records] == [(1700000100, 8.0),
+                                                                 (1700000400, 23.0)]
+    assert archive.pending_accumulators == []
+    assert archive.old_accumulator is None
+
+
+def get_archive_config(tmp_path):
+    config_dict = get_config()
+    config_dict['WEEWX_ROOT'] = str(tmp_path)
+    config_dict['StdArchive'] = {'archive_interval': '300'}
+    config_dict['DataBindings'] = {'wx_binding': {'database': 'archive_sqlite',
+                                                  'table_name': 'archive',
+                                                  'manager': 'weewx.manager.DaySummaryManager',
+                                                  'schema': 'schemas.wview_extended.schema'}}
+    config_dict['Databases'] = {'archive_sqlite': {'database_name': 'test.sdb',
+                                                   'driver': 'weedb.sqlite',
+                                                   'SQLITE_ROOT': str(tmp_path)}}
+    return config_dict
+
+
+class Failer(weewx.engine.StdService):
+    """Uses the database for each new archive record, then fails on the fourth."""
+
+    def __init__(self, engine, config_dict):
+        super().__init__(engine, config_dict)
+        self.nrecs = 0
+        self.bind(weewx.NEW_ARCHIVE_RECORD, self.new_archive_record)
+
+    def new_archive_record(self, event):
+        self.nrecs += 1
+        if self.nrecs == 4:
+            raise ValueError("Failed on record %d" % event.record['dateTime'])
+        dbmanager = self.engine.db_binder.get_manager('wx_binding')
+        with weedb.Transaction(dbmanager.connection) as cursor:
+            cursor.execute("SELECT COUNT(*) FROM archive")
+
+
+def test_catchup_failure(tmp_path, monkeypatch):
+    monkeypatch.setattr(weewx.engine.StdArchive, 'catchup_batch_size', 2)
+    config_dict = get_archive_config(tmp_path)
+    engine = weewx.engine.DummyEngine(config_dict)
+    archive = weewx.engine.StdArchive(engine, config_dict)
+    failer = Failer(engine, config_dict)
+    records = [{'dateTime': 1700000000 + 300 * i, 'usUnits': 1, 'interval': 5,
+                'outTemp': 20.0 + i} for i in range(6)]
+    dbmanager = engine.db_binder.get_manager('wx_binding', initialize=True)
+
+    with pytest.raises(ValueError):
+        archive._catchup(lambda since_ts: iter(records))
+    # The records that went through all the services are in the database, including the one
+    # that StdArchive had already seen when the failure happened
+    assert failer.nrecs == 4
+    assert archive.catchup_records is None
+    assert dbmanager.lastGoodStamp() == records[3]['dateTime']
+    assert dbmanager.getAggregate(weeutil.weeutil.TimeSpan(1699999900, 1700002000),
+                                  'outTemp', 'count')[0] == 4
+    engine.shutDown()
+
+
+def test_catchup_with_backfill(tmp_path):
+    config_dict = get_archive_config(tmp_path)
+    config_dict['StdArchive']['background_backfill'] = 'true'
+    engine = weewx.engine.DummyEngine(config_dict)
+    archive = weewx.engine.StdArchive(engine, config_dict)
+    records = [{'dateTime': 1700000000 + 300 * i, 'usUnits': 1, 'interval': 5,
+                'outTemp': 20.0 + i} for i in range(6)]
+    dbmanager = engine.db_binder.get_manager('wx_binding', initialize=True)
+    dbmanager.backfill_pending = True
+    for record in records[:3]:
+        dbmanager.addRecord(record)
+    archive.backfill_thread = weewx.engine.BackfillThread(config_dict, 'wx_binding',
+                                                          finish_fn=archive._finish_backfill)
+    # Records are added while the backfill is running
+    with archive.backfill_thread.lock:
+        archive.backfill_thread.start()
+        archive._catchup(lambda since_ts: (r for r in records if r['dateTime'] > since_ts))
+        assert dbmanager.backfill_pending
+    archive.backfill_thread.join()
+
+    # The backfill caught up with them, then handed the daily summaries back to the engine
+    assert not dbmanager.backfill_pending
+    assert dbmanager.last_update == records[-1]['dateTime']
+    assert dbmanager.getAggregate(weeutil.weeutil.TimeSpan(1699999900, 1700002000),
+                                  'outTemp', 'count')[0] == 6
+    archive.end_archive_period_ts = records[-1]['dateTime'] + 300
+    archive.post_loop(None)
+    assert archive.backfill_thread is None
+    engine.shutDown()
+
+
+RELOAD_CONFIG = """
+[Station]
+    station_type = Simulator
+    altitude = 700, foot
+    latitude = 45.0
+    longitude = -122.0
+[StdArchive]
+    archive_interval = 300
+[Recorder]
+    label = first
+[Engine]
+    [[Services]]
+        process_services = test_service.Recorder, test_service.Follower
+        xtype_services = ""
+        archive_services = weewx.engine.StdArchive
+"""
+
+
+# The services that have seen the last packet, in order
+SEEN = []
+
+
+class Recorder(weewx.engine.StdService):
+    """A service that uses only its own section of the configuration."""
+
+    config_sections = ('Recorder',)
+
+    def __init__(self, engine, config_dict):
+        super().__init__(engine, config_dict)
+        self.label = config_dict.get('Recorder', {}).get('label')
+        self.count = 0
+        self.started = False
+        self.stopped = False
+        self.bind(weewx.STARTUP, self.startup)
+        self.bind(weewx.NEW_LOOP_PACKET, self.new_loop_packet)
+
+    def startup(self, _event):
+        self.started = True
+
+    def new_loop_packet(self, event):
+        self.count += 1
+        SEEN.append(self.label)
+
+    def take_over(self, old):
+        self.count = old.count
+
+    def shutDown(self):
+        self.stopped = True
+
+
+class Follower(weewx.engine.StdService):
+    """A service that does not say which sections it uses."""
+
+    def __init__(self, engine, config_dict):
+        super().__init__(engine, config_dict)
+        self.bind(weewx.NEW_LOOP_PACKET, self.new_loop_packet)
+
+    def new_loop_packet(self, event):
+        SEEN.append('follower')
+
+
+def test_reload():
+    config_dict = configobj.ConfigObj(RELOAD_CONFIG.splitlines())
+    engine = weewx.engine.DummyEngine(config_dict)
+    recorder, follower, archive = engine.service_obj
+    SEEN.clear()
+    packet = {'dateTime': 1700000000, 'usUnits': 1, 'outTemp': 20.0}
+    engine.dispatchEvent(weewx.Event(weewx.NEW_LOOP_PACKET, packet=packet))
+    assert SEEN == ['first', 'follower']
+
+    # Change only an option that needs a restart. Nothing should be re-created.
+    new_dict = configobj.ConfigObj(RELOAD_CONFIG.splitlines())
+    new_dict['Station']['altitude'] = ['800', 'foot']
+    engine.reload(new_dict)
+    assert engine.service_obj == [recorder, follower, archive]
+
+    # Change the section of Recorder, and add a service to the front
+    new_dict = configobj.ConfigObj(RELOAD_CONFIG.splitlines())
+    new_dict['Recorder']['label'] = 'second'
+    new_dict['Engine']['Services']['prep_services'] = 'test_service.Recorder'
+    engine.reload(new_dict)
+    new_recorder, added, new_follower, new_archive = engine.service_obj
+    # StdArchive did not need to change. Nor did Follower, which does not say what it uses.
+    # Recorder did.
+    assert new_archive is archive and new_follower is follower
+    assert new_recorder is not recorder
+    assert recorder.stopped
+    # The first Recorder in the list took over from the old one. The second one is new.
+    assert new_recorder.count == 1 and not new_recorder.started
+    assert added.count == 0 and added.started
+
+    # The callbacks follow the new order of the services
+    SEEN.clear()
+    packet = {'dateTime': 1700000010, 'usUnits': 1, 'outTemp': 21.0}
+    engine.dispatchEvent(weewx.Event(weewx.NEW_LOOP_PACKET, packet=packet))
+    assert SEEN == ['second', 'second', 'follower']
+    assert archive.accumulator['outTemp'].count == 2
+
+    # Re-create StdArchive. It should carry on with the same accumulator.
+    new_dict = weeutil.config.deep_copy(new_dict)
+    new_dict['StdArchive']['archive_delay'] = '30'
+    engine.reload(new_dict)
+    assert engine.service_obj[3] is not archive
+    assert engine.service_obj[3].accumulator is archive.accumulator
+    assert engine.service_obj[3].archive_delay == 30
+
+    # Take the added service away again
+    new_dict = weeutil.config.deep_copy(new_dict)
+    del new_dict['Engine']['Services']['prep_services']
+    engine.reload(new_dict)
+    assert engine.service_obj[0] is new_recorder
+    assert added.stopped
+    assert len(engine.callbacks[weewx.NEW_LOOP_PACKET]) == 3
+    engine.shutDown()
+
+
+class Starter(weewx.engine.StdService):
+    """A service that sets itself up at startup, and does not take over from an old one."""
+
+    config_sections = ('Recorder',)
+
+    def __init__(self, engine, config_dict):
+        super().__init__(engine, config_dict)
+        self.label = None
+        self.bind(weewx.STARTUP, self.startup)
+
+    def startup(self, _event):
+        self.label = self.config_dict['Recorder']['label']
+
+
+def test_reload_startup():
+    config_dict = configobj.ConfigObj(RELOAD_CONFIG.splitlines())
+    config_dict['Engine']['Services']['process_services'] = 'test_service.Starter'
+    config_dict['Engine']['Services']['archive_services'] = ''
+    engine = weewx.engine.DummyEngine(config_dict)
+    engine.dispatchEvent(weewx.Event(weewx.STARTUP))
+    starter = engine.service_obj[0]
+    assert starter.label == 'first'
+
+    new_dict = weeutil.config.deep_copy(config_dict)
+    new_dict['Recorder']['label'] = 'second'
+    engine.reload(new_dict)
+    new_starter = engine.service_obj[0]
+    # The new instance was started, just as the old one was
+    assert new_starter is not starter
+    assert new_starter.label == 'second'
+    engine.shutDown()
+
+
+def test_reload_accumulator():
+    config_dict = configobj.ConfigObj(RELOAD_CONFIG.splitlines())
+    config_dict['Accumulator'] = {'outTemp': {'extractor': 'last'}}
+    engine = weewx.engine.DummyEngine(config_dict)
+    nmaps = len(weewx.accum.accum_dict.maps)
+    assert weewx.accum.accum_dict['outTemp']['extractor'] == 'last'
+
+    # Take the override away. The default should be back, and nothing should pile up.
+    new_dict = configobj.ConfigObj(RELOAD_CONFIG.splitlines())
+    engine.reload(new_dict)
+    assert 'outTemp' not in weewx.accum.accum_dict
+    assert len(weewx.accum.accum_dict.maps) == nmaps
+    engine.shutDown()
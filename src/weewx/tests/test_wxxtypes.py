@@ -5,6 +5,7 @@
 #
 """Test weather-related XTypes extensions."""
 
+import json
 import logging
 import math
 import pytest
@@ -367,6 +368,27 @@ class TestRainRater:
         assert rate[0] == pytest.approx(25.20, abs=1e-2)
         assert rate[1:] == ('inch_per_hour', 'group_rainrate')
 
+    def test_state(self):
+        """Test saving and restoring the rain events"""
+        rain_rater = weewx.wxxtypes.RainRater(TestRainRater.rain_period,
+                                              TestRainRater.retain_period)
+        # Add 20 minutes worth of rain
+        N = 20
+        for record in self.rain_generator:
+            rain_rater.add_loop_packet(record)
+            N -= 1
+            if not N:
+                break
+
+        state = json.loads(json.dumps(rain_rater.get_state()))
+        restored = weewx.wxxtypes.RainRater(TestRainRater.rain_period,
+                                            TestRainRater.retain_period)
+        # Restore as if ten minutes had passed. Only the last five minutes of events
+        # should be kept.
+        restored.set_state(state, record['dateTime'] + 10 * 60)
+        assert restored.unit_system == rain_rater.unit_system
+        assert restored.rain_events == rain_rater.rain_events[-6:]
+
 
 class TestDelta:
     """Test XTypes extension 'Delta'."""
@@ -549,6 +549,10 @@ class ValueTuple(tuple):
     def __new__(cls, *args):
         return tuple.__new__(cls, args)
 
+    def __getnewargs__(self):
+        # Needed to pickle a ValueTuple, such as when it is sent to another process
+        return tuple(self)
+
     @property
     def value(self):
         return self[0]
@@ -19,6 +19,8 @@ log = logging.getLogger(__name__)
 
 class StdWXCalculate(weewx.engine.StdService):
 
+    config_sections = ('StdWXCalculate', 'StdArchive')
+
     def __init__(self, engine, config_dict):
         """Initialize an instance of StdWXCalculate and determine the calculations to be done.
 
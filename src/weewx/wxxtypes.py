@@ -6,6 +6,7 @@
 """A set of XTypes extensions for calculating weather-related derived observation types."""
 import logging
 import threading
+import time
 
 import weedb
 import weeutil.config
@@ -547,6 +548,26 @@ class RainRater(weewx.xtypes.XType):
             u, g = weewx.units.getStandardUnitType(self.unit_system, 'rainRate')
             return ValueTuple(val, u, g)
 
+    def get_state(self):
+        """Return the recent rain events as a dictionary that can be serialized as JSON."""
+        with self.run_lock:
+            return {'unit_system': self.unit_system,
+                    'rain_events': list(self.rain_events)}
+
+    def set_state(self, state, now):
+        """Restore rain events saved by get_state(). Only events that still fall within the
+        rain period ending at time 'now' are used."""
+        with self.run_lock:
+            if self.unit_system is not None and self.unit_system != state['unit_system']:
+                log.info("Saved rain events use a different unit system. Ignored.")
+                return
+            have = {x[0] for x in self.rain_events}
+            events = [(time_ts, rain) for time_ts, rain in state['rain_events']
+                      if time_ts >= now - self.rain_period and time_ts not in have]
+            if events:
+                self.unit_system = state['unit_system']
+                self.rain_events = sorted(self.rain_events + events, key=lambda x: x[0])
+
     def _setup(self, stop_ts, db_manager):
         """Initialize the rain event list"""
 
@@ -636,6 +657,8 @@ class Delta(weewx.xtypes.XType):
 class StdWXXTypes(weewx.engine.StdService):
     """Instantiate and register the xtype extension WXXTypes."""
 
+    config_sections = ('StdWXCalculate',)
+
     def __init__(self, engine, config_dict):
         """Initialize an instance of StdWXXTypes"""
         super().__init__(engine, config_dict)
@@ -732,10 +755,16 @@ class StdWXXTypes(weewx.engine.StdService):
         weewx.xtypes.xtypes.remove(self.etxtype)
         weewx.xtypes.xtypes.remove(self.wxxtypes)
 
+    def take_over(self, old):
+        _take_place(self.wxxtypes, old.wxxtypes)
+        _take_place(self.etxtype, old.etxtype)
+
 
 class StdPressureCooker(weewx.engine.StdService):
     """Instantiate and register the XTypes extension PressureCooker"""
 
+    config_sections = ('StdWXCalculate',)
+
     def __init__(self, engine, config_dict):
         """Initialize the PressureCooker. """
         super().__init__(engine, config_dict)
@@ -763,10 +792,15 @@ class StdPressureCooker(weewx.engine.StdService):
         """Engine shutting down. """
         weewx.xtypes.xtypes.remove(self.pressure_cooker)
 
+    def take_over(self, old):
+        _take_place(self.pressure_cooker, old.pressure_cooker)
+
 
 class StdRainRater(weewx.engine.StdService):
     """"Instantiate and register the XTypes extension RainRater."""
 
+    config_sections = ('StdWXCalculate',)
+
     def __init__(self, engine, config_dict):
         """Initialize the RainRater."""
         super().__init__(engine, config_dict)
@@ -798,10 +832,25 @@ class StdRainRater(weewx.engine.StdService):
     def new_loop_packet(self, event):
         self.rain_rater.add_loop_packet(event.packet)
 
+    def get_checkpoint(self):
+        """Return the state to be saved in a checkpoint. See StdArchive."""
+        return self.rain_rater.get_state()
+
+    def set_checkpoint(self, state):
+        """Restore the state saved in a checkpoint."""
+        self.rain_rater.set_state(state, time.time())
+
+    def take_over(self, old):
+        """Carry on with the rain events of the old instance."""
+        _take_place(self.rain_rater, old.rain_rater)
+        self.set_checkpoint(old.get_checkpoint())
+
 
 class StdDelta(weewx.engine.StdService):
     """Instantiate and register the XTypes extension Delta."""
 
+    config_sections = ('StdWXCalculate',)
+
     def __init__(self, engine, config_dict):
         super().__init__(engine, config_dict)
 
@@ -820,3 +869,13 @@ class StdDelta(weewx.engine.StdService):
 
     def shutDown(self):
         weewx.xtypes.xtypes.remove(self.delta)
+
+    def take_over(self, old):
+        _take_place(self.delta, old.delta)
+
+
+def _take_place(new_xtype, old_xtype):
+    """Move a new XType extension to where an old one is in the XTypes system, so the order
+    of the extensions does not change when a service is re-created."""
+    weewx.xtypes.xtypes.remove(new_xtype)
+    weewx.xtypes.xtypes.insert(weewx.xtypes.xtypes.index(old_xtype), new_xtype)
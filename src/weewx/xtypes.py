@@ -5,13 +5,17 @@
 #
 """User-defined extensions to the WeeWX type system"""
 
+import bisect
 import datetime
+import threading
 import time
 import math
+from contextlib import contextmanager
 
 import weedb
 import weeutil.weeutil
 import weewx
+import weewx.dependencies
 import weewx.units
 import weewx.wxformulas
 from weeutil.weeutil import isStartOfDay, to_float
@@ -98,6 +102,7 @@ def get_scalar(obs_type, record, db_manager=None, **option_dict):
 def get_series(obs_type, timespan, db_manager, aggregate_type=None, aggregate_interval=None,
                **option_dict):
     """Return a series (aka vector) of, possibly aggregated, values."""
+    weewx.dependencies.add_range(db_manager, timespan)
 
     # Search the list, looking for a get_series() method that does not raise an UnknownType or
     # UnknownAggregation exception
@@ -127,6 +132,7 @@ def get_series(obs_type, timespan, db_manager, aggregate_type=None, aggregate_in
 
 def get_aggregate(obs_type, timespan, aggregate_type, db_manager, **option_dict):
     """Calculate an aggregation over a timespan"""
+    weewx.dependencies.add_range(db_manager, timespan)
     # Search the list, looking for a get_aggregate() method that does not raise an
     # UnknownAggregation exception
     for xtype in xtypes:
@@ -149,6 +155,7 @@ def has_data(obs_type, timespan, db_manager):
     Returns:
         bool: True if there is non-null xtype data in the timespan. False otherwise.
     """
+    weewx.dependencies.add_range(db_manager, timespan)
     for xtype in xtypes:
         try:
             # Try this function. It will raise an exception if it doesn't know about the type of
@@ -596,8 +603,13 @@ class DailySummaries(XType):
             'table_name': db_manager.table_name
         }
 
-        # Run the query against the database:
-        row = db_manager.getSql(DailySummaries.agg_sql_dict[aggregate_type] % inter_dict)
+        # If the daily summaries for the period have already been fetched, calculate from them.
+        # Otherwise, run the query against the database:
+        rows = get_prefetched_days(db_manager, obs_type, inter_dict['start'], inter_dict['stop'])
+        if rows is not None:
+            row = DailySummaries.agg_row_dict[aggregate_type](rows, target_val)
+        else:
+            row = db_manager.getSql(DailySummaries.agg_sql_dict[aggregate_type] % inter_dict)
 
         # Each aggregation type requires a slightly different calculation.
         if not row or None in row:
@@ -642,6 +654,53 @@ class DailySummaries(XType):
         # Form the ValueTuple and return it:
         return weewx.units.ValueTuple(value, t, g)
 
+    # The same aggregates as in agg_sql_dict, calculated from rows of the daily summaries already
+    # in memory. Each returns what the SQL statement would.
+    agg_row_dict = {
+        'avg': lambda rows, val: (_sum(rows, 'wsum'), _sum(rows, 'sumtime')),
+        'avg_ge': lambda rows, val: _count_if(
+            [r for r in rows if r['sumtime']],
+            lambda r: r['wsum'] is not None and _ge(r['wsum'] / r['sumtime'], val)),
+        'avg_le': lambda rows, val: _count_if(
+            [r for r in rows if r['sumtime']],
+            lambda r: r['wsum'] is not None and _ge(val, r['wsum'] / r['sumtime'])),
+        'count': lambda rows, val: (_sum(rows, 'count'),),
+        'gustdir': lambda rows, val: _first(rows, 'max_dir', ('max', True), ('maxtime', False)),
+        'max': lambda rows, val: (_max(rows, 'max'),),
+        'max_ge': lambda rows, val: _count_if(rows, lambda r: _ge(r['max'], val)),
+        'max_le': lambda rows, val: _count_if(rows, lambda r: _ge(val, r['max'])),
+        'maxmin': lambda rows, val: (_max(rows, 'min'),),
+        'maxmintime': lambda rows, val: _first([r for r in rows if r['mintime'] is not None],
+                                               'mintime', ('min', True), ('mintime', False)),
+        'maxsum': lambda rows, val: (_max(rows, 'sum'),),
+        'maxsumtime': lambda rows, val: _first(rows, 'dateTime',
+                                               ('sum', True), ('dateTime', False)),
+        'maxtime': lambda rows, val: _first([r for r in rows if r['maxtime'] is not None],
+                                            'maxtime', ('max', True), ('maxtime', False)),
+        'meanmax': lambda rows, val: (_mean(rows, 'max'),),
+        'meanmin': lambda rows, val: (_mean(rows, 'min'),),
+        'min': lambda rows, val: (_min(rows, 'min'),),
+        'min_ge': lambda rows, val: _count_if(rows, lambda r: _ge(r['min'], val)),
+        'min_le': lambda rows, val: _count_if(rows, lambda r: _ge(val, r['min'])),
+        'minmax': lambda rows, val: (_min(rows, 'max'),),
+        'minmaxtime': lambda rows, val: _first([r for r in rows if r['maxtime'] is not None],
+                                               'maxtime', ('max', False), ('maxtime', False)),
+        'minsum': lambda rows, val: (_min(rows, 'sum'),),
+        'minsumtime': lambda rows, val: _first(rows, 'dateTime',
+                                               ('sum', False), ('dateTime', False)),
+        'mintime': lambda rows, val: _first([r for r in rows if r['mintime'] is not None],
+                                            'mintime', ('min', False), ('mintime', False)),
+        'not_null': lambda rows, val: (_max([{'c': r['count'] > 0} for r in rows
+                                             if r['count'] is not None], 'c'),) if rows else None,
+        'rms': lambda rows, val: (_sum(rows, 'wsquaresum'), _sum(rows, 'sumtime')),
+        'sum': lambda rows, val: (_sum(rows, 'sum'),),
+        'sum_ge': lambda rows, val: _count_if(rows, lambda r: _ge(r['sum'], val)),
+        'sum_le': lambda rows, val: _count_if(rows, lambda r: _ge(val, r['sum'])),
+        'vecavg': lambda rows, val: (_sum(rows, 'xsum'), _sum(rows, 'ysum'),
+                                     _sum(rows, 'sumtime')),
+        'vecdir': lambda rows, val: (_sum(rows, 'xsum'), _sum(rows, 'ysum')),
+    }
+
     # These are SQL statements used for calculating series from the daily summaries.
     # They include "group_def", which will be replaced with a database-specific GROUP BY clause
     common = {
@@ -755,6 +814,190 @@ class DailySummaries(XType):
                 or not (isStartOfDay(timespan.stop) or timespan.stop == db_manager.last_timestamp):
             raise weewx.UnknownAggregation(aggregate_type)
 
+        # Nor can we use them if the interval reaches past the last record they include, and that
+        # is not the last record in the database, such as while they are being backfilled. The
+        # archive table will be used instead. If it is not known what they include, they are
+        # assumed to be complete.
+        last_update = getattr(db_manager, 'last_update', None)
+        if last_update is not None and last_update < db_manager.last_timestamp \
+                and timespan.stop > last_update:
+            raise weewx.UnknownAggregation(aggregate_type)
+
+
+#
+# ######################## Prefetching the daily summaries ##############################
+#
+
+_local = threading.local()
+
+
+class DayPrefetch:
+    """Rows of the daily summaries over a timespan. The rows of each observation type are
+    fetched with a single query, the first time they are needed."""
+
+    def __init__(self, timespan):
+        self.start = weeutil.weeutil.startOfDay(timespan[0])
+        self.stop = timespan[1]
+        # Key is (database manager, observation type). Value is a tuple (times, rows).
+        self.days = {}
+
+    def get_rows(self, db_manager, obs_type, start, stop):
+        """Return the rows with start <= dateTime < stop, each as a dictionary, or None if
+        they are not all within the timespan."""
+        if start < self.start or stop > self.stop:
+            return None
+        key = (db_manager, obs_type)
+        if key not in self.days:
+            self.days[key] = _fetch_days(db_manager, obs_type, self.start, self.stop)
+        times, rows = self.days[key]
+        return rows[bisect.bisect_left(times, start):bisect.bisect_left(times, stop)]
+
+
+# Reading a row of the daily summaries into memory costs roughly 1/40 of what a query for an
+# aggregate does.
+ROWS_PER_QUERY = 40
+
+
+class DayBatch:
+    """Fetches the rows of the daily summaries over a period with a single query, for periods
+    where the last evaluation of the same template asked for several aggregates. The rows then
+    serve every aggregate over that period, or any period within it.
+
+    Args:
+        plan (dict|None): What the template asked for the last time, as returned by usage().
+    """
+
+    def __init__(self, plan=None):
+        self.plan = plan or {}
+        # Key is (observation type, length of the period). Value is a tuple (number of
+        # aggregates asked for, set of the start times of the periods).
+        self.used = {}
+        # Key is (database manager, observation type). Value is a list of tuples (start, stop,
+        # times, rows).
+        self.days = {}
+
+    def get_rows(self, db_manager, obs_type, start, stop):
+        """Return the rows with start <= dateTime < stop, each as a dictionary, or None if
+        they have not been, and are not worth, fetching."""
+        key = (obs_type, stop - start)
+        count, starts = self.used.get(key, (0, set()))
+        starts.add(start)
+        self.used[key] = (count + 1, starts)
+
+        fetched = self.days.setdefault((db_manager, obs_type), [])
+        for fetched_start, fetched_stop, times, rows in fetched:
+            if fetched_start <= start and stop <= fetched_stop:
+                return rows[bisect.bisect_left(times, start):bisect.bisect_left(times, stop)]
+
+        # Is it worth fetching the rows? Only if the aggregates asked for over the period
+        # would take more queries than reading the rows costs.
+        per_period = self.plan.get(key, 0)
+        if per_period < 2 or (stop - start) / 86400 > per_period * ROWS_PER_QUERY:
+            return None
+        times, rows = _fetch_days(db_manager, obs_type, start, stop)
+        fetched.append((start, stop, times, rows))
+        return rows
+
+    def usage(self):
+        """Return how many aggregates were asked for, on average, over each period of each
+        length. Key is (observation type, length of the period)."""
+        return {key: count / len(starts) for key, (count, starts) in self.used.items()}
+
+
+def _fetch_days(db_manager, obs_type, start, stop):
+    """Fetch the rows of the daily summaries with start <= dateTime < stop. Returns a tuple
+    (list of times, list of rows), each row as a dictionary."""
+    table_name = '%s_day_%s' % (db_manager.table_name, obs_type)
+    columns = db_manager.connection.columnsOf(table_name)
+    rows = [dict(zip(columns, row)) for row in db_manager.genSql(
+        "SELECT * FROM %s WHERE dateTime >= ? AND dateTime < ? ORDER BY dateTime"
+        % table_name, (start, stop))]
+    return [row['dateTime'] for row in rows], rows
+
+
+@contextmanager
+def _days_from(source):
+    stack = _local.__dict__.setdefault('stack', [])
+    stack.append(source)
+    try:
+        yield source
+    finally:
+        stack.pop()
+
+
+def prefetch_days(timespan):
+    """Context manager within which aggregates calculated from the daily summaries, for any
+    period within 'timespan', use rows fetched once for the whole timespan, rather than a
+    query for each aggregate. The NOAA reports, for example, ask for several aggregates for each
+    day of a month or year.
+
+    The rows are fetched once, so any changes made to the database within the context are not
+    seen.
+    """
+    return _days_from(DayPrefetch(timespan))
+
+
+def batch_days(plan=None):
+    """Context manager within which aggregates calculated from the daily summaries are
+    batched, according to 'plan'. It yields a DayBatch, whose usage() is the plan for the next
+    time."""
+    return _days_from(DayBatch(plan))
+
+
+def get_prefetched_days(db_manager, obs_type, start, stop):
+    """Return the rows of the daily summaries fetched by prefetch_days() or batch_days() for
+    start <= dateTime < stop, or None if there are none."""
+    stack = getattr(_local, 'stack', None)
+    if not stack:
+        return None
+    return stack[-1].get_rows(db_manager, obs_type, start, stop)
+
+
+def _sum(rows, column):
+    values = [row[column] for row in rows if row[column] is not None]
+    return sum(values) if values else None
+
+
+def _min(rows, column):
+    values = [row[column] for row in rows if row[column] is not None]
+    return min(values) if values else None
+
+
+def _max(rows, column):
+    values = [row[column] for row in rows if row[column] is not None]
+    return max(values) if values else None
+
+
+def _mean(rows, column):
+    values = [row[column] for row in rows if row[column] is not None]
+    return sum(values) / len(values) if values else None
+
+
+def _ge(a, b):
+    return a is not None and b is not None and a >= b
+
+
+def _count_if(rows, condition):
+    """Like SUM(CASE WHEN condition THEN 1 ELSE 0 END)"""
+    return (sum(1 for row in rows if condition(row)) if rows else None,)
+
+
+def _first(rows, column, *order_by):
+    """Like SELECT column ... ORDER BY ... LIMIT 1. Each member of 'order_by' is a tuple
+    (column, descending). As in SQL, nulls come first in ascending order."""
+
+    def key(row):
+        k = []
+        for name, descending in order_by:
+            value = row[name]
+            if descending:
+                k.extend((value is None, -value if value is not None else 0))
+            else:
+                k.extend((value is not None, value if value is not None else 0))
+        return k
+
+    return (min(rows, key=key)[column],) if rows else None
+
 
 #
 # ######################## Class AggregateHeatCool ##############################
@@ -1194,10 +1437,13 @@ class WindVecDaily(XType):
             return DailySummaries.get_aggregate('wind', timespan, 'not_null', db_manager,
                                                 **option_dict)
 
-        sql = 'SELECT SUM(xsum), SUM(ysum), SUM(dirsumtime) ' \
-              'FROM %s_day_wind WHERE dateTime>=? AND dateTime<?;' % db_manager.table_name
-
-        row = db_manager.getSql(sql, timespan)
+        rows = get_prefetched_days(db_manager, 'wind', timespan.start, timespan.stop)
+        if rows is not None:
+            row = (_sum(rows, 'xsum'), _sum(rows, 'ysum'), _sum(rows, 'dirsumtime'))
+        else:
+            sql = 'SELECT SUM(xsum), SUM(ysum), SUM(dirsumtime) ' \
+                  'FROM %s_day_wind WHERE dateTime>=? AND dateTime<?;' % db_manager.table_name
+            row = db_manager.getSql(sql, timespan)
 
         if not row or None in row or not row[2]:
             # If no row was returned, or if it contains any nulls (meaning that not
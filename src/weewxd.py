@@ -6,6 +6,7 @@
 """Entry point to the weewx weather system."""
 
 import argparse
+import functools
 import logging
 import os
 import os.path
@@ -17,6 +18,7 @@ import weedb
 import weeutil.logger
 import weeutil.startup
 import weewx.engine
+import weewx.profiler
 from weeutil.weeutil import to_bool, to_float
 from weewx import daemon
 
@@ -31,6 +33,7 @@ usagestr = """%(prog)s --help
                  [--exit]
                  [--loop-on-init]
                  [--log-label=LABEL]
+                 [--profile-startup]
 """
 
 epilog = "Specify either the positional argument FILENAME, " \
@@ -58,6 +61,8 @@ def main():
                         help="Retry forever if device is not ready on startup")
     parser.add_argument("-n", "--log-label", dest="log_label", metavar="LABEL", default="weewxd",
                         help="Label to use in syslog entries")
+    parser.add_argument("--profile-startup", action="store_true", dest="profile_startup",
+                        help="Log how long each step of starting up takes")
     parser.add_argument("config_arg", nargs='?', metavar="FILENAME")
 
     # Get the command line options and arguments:
@@ -118,7 +123,14 @@ def main():
             log.debug("Initializing engine")
 
             # Create and initialize the engine
-            engine = weewx.engine.StdEngine(config_dict)
+            if namespace.profile_startup:
+                startup_profiler = weewx.profiler.StartupProfiler()
+            else:
+                startup_profiler = None
+            engine = weewx.engine.StdEngine(config_dict, startup_profiler=startup_profiler)
+
+            # Reload the configuration when signal HUP is received
+            signal.signal(signal.SIGHUP, functools.partial(sigHUPhandler, engine))
 
             log.info("Starting up weewx version %s", weewx.__version__)
 
@@ -221,6 +233,12 @@ def sigTERMhandler(signum, _frame):
     raise Terminate
 
 
+def sigHUPhandler(engine, signum, _frame):
+    log = logging.getLogger(__name__)
+    log.info("Received signal HUP (%s). Configuration will be reloaded.", signum)
+    engine.request_reload()
+
+
 if __name__ == "__main__":
     # Start up the program
     main()